@@ -0,0 +1,162 @@
+"""Accès aux données, liste des OF, exports et rendu des pages à l'échelle.
+
+Les données viennent de benchmarks.datagen (base SQLite embarquée en
+substitut du client Supabase). Chaque cas rapporte p50/p95/p99 et le pic
+mémoire Python ; ``--save`` enregistre une baseline, comparée aux exécutions
+suivantes de même nom.
+
+Usage : python -m benchmarks.bench_app --sizes 1000,10000,100000 --save
+        python -m benchmarks.bench_app --sizes 1000000 --skip-render
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.datagen import make_repository
+from benchmarks.harness import compare_baseline, format_table, measure, save_baseline
+from exports import export_table
+from maintenance import MaintenanceLog
+from of_queries import fetch_distinct_values, fetch_of_page
+from of_sync import DeltaSync
+from quality import QualityEngine
+from schemas import typed_frame
+from staffing import OperatorIndex
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PAGES = ["Tableau de bord", "Ordres de fabrication", "Ressources humaines", "Qualité", "Équipements", "Analyses"]
+
+
+def data_cases(repo):
+    client = repo.client
+    sync = DeltaSync(client, "ordres_fabrication", tombstone_table="ordres_fabrication_suppressions")
+    sync.refresh()
+    counter = iter(range(10**9))
+
+    def delta():
+        # 10 OF modifiés puis relus par delta
+        start = next(counter) * 10 % 1000 + 1
+        client.table("ordres_fabrication").update({"progression": 50.0}).gte("id", start).lt("id", start + 10).execute()
+        sync.refresh()
+
+    def filter_in_memory():
+        df = sync.frame
+        selection = df[df["statut"].isin(["Planifié", "En cours"]) & df["poste"].isin(["Assemblage", "Usinage"])]
+        return selection.sort_values(["priorite", "id"], ascending=False).head(50)
+
+    # Tables typées, comme dans le cache de l'application
+    defects = typed_frame(repo.fetch_table("defauts"), "defauts")
+    ofs = typed_frame(sync.frame, "ordres_fabrication")
+    quality = QualityEngine()
+    quality.update(defects, ofs)
+
+    def quality_page():
+        # Relecture sans changement puis lecture des agrégats, comme à chaque rendu
+        quality.update(defects, ofs)
+        start, end = pd.Timestamp("2025-01-01"), pd.Timestamp("2027-01-01")
+        quality.pareto("type_defaut", start, end)
+        quality.control_chart("u", start, end, "W-MON")
+
+    maintenance_log = MaintenanceLog(typed_frame(repo.fetch_table("maintenances"), "maintenances"))
+
+    def equipment_page():
+        # Fiabilité de toutes les machines puis historique d'une machine sur un an
+        maintenance_log.reliability(pd.Timestamp("2026-06-01"))
+        maintenance_log.history("Machine3", pd.Timestamp("2025-06-01"), pd.Timestamp("2026-06-01"))
+
+    operator_index = OperatorIndex.from_frames(
+        typed_frame(repo.fetch_table("ressources_humaines"), "ressources_humaines"),
+        typed_frame(repo.fetch_table("absences"), "absences"),
+    )
+
+    def operator_selector():
+        # Liste d'un sélecteur d'opérateur : qualifiés et présents sur une semaine
+        operator_index.available("Peinture", pd.Timestamp("2025-03-03"), pd.Timestamp("2025-03-07"))
+
+    def export(fmt):
+        def run():
+            export_table(client, "ordres_fabrication", fmt).close()
+        return run
+
+    return {
+        "accès : table OF complète": lambda: repo.fetch_table("ordres_fabrication"),
+        "accès : DeltaSync chargement complet": lambda: DeltaSync(client, "ordres_fabrication").refresh(),
+        "accès : écriture de 10 OF + delta": delta,
+        "of_page : page filtrée et triée (base)": lambda: fetch_of_page(
+            client, ["Planifié", "En cours"], ["Assemblage", "Usinage"], page=3, page_size=50),
+        "of_page : filtre et tri en mémoire": filter_in_memory,
+        "of_page : valeurs distinctes": lambda: fetch_distinct_values(client, "statut"),
+        "qualité : Pareto et carte u": quality_page,
+        "équipements : MTBF/MTTR et historique": equipment_page,
+        "rh : opérateurs disponibles pour un poste": operator_selector,
+        "export : CSV gzip des OF": export("CSV compressé (gzip)"),
+        "export : Parquet des OF": export("Parquet"),
+    }
+
+
+def render_cases(db_path):
+    # Rendu des pages avec le harnais de test de Streamlit, sur la base locale
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["MES_STORAGE"] = "local"
+    os.environ["MES_LOCAL_DB"] = db_path
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    app = AppTest.from_file(APP_PATH, default_timeout=600)
+    app.session_state["logged_in"] = True
+    app.run()
+
+    def render(page):
+        def run():
+            app.sidebar.selectbox[0].set_value(page).run()
+            if app.exception:
+                raise RuntimeError(f"{page} : {app.exception}")
+        return run
+
+    return {f"rendu : {page}": render(page) for page in PAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="nombres d'OF, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--render-repeat", type=int, default=3)
+    parser.add_argument("--skip-render", action="store_true")
+    parser.add_argument("--baseline", default="bench_app", help="nom de la baseline")
+    parser.add_argument("--save", action="store_true", help="enregistrer les résultats comme baseline")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            db_path = os.path.join(tmp, f"atelier_{size}.db")
+            repo = make_repository(size, path=db_path)
+            for case, fn in data_cases(repo).items():
+                results[(case, size)] = measure(fn, repeat=args.repeat)
+                print(f"{case} ({size:,}) : p50 {results[(case, size)]['p50_ms']:.2f} ms", file=sys.stderr)
+            if not args.skip_render:
+                for case, fn in render_cases(db_path).items():
+                    results[(case, size)] = measure(fn, repeat=args.render_repeat)
+                    print(f"{case} ({size:,}) : p50 {results[(case, size)]['p50_ms']:.2f} ms", file=sys.stderr)
+            repo.client.connection.close()
+
+    print(format_table(results))
+    regressions = compare_baseline(args.baseline, results)
+    if regressions is None:
+        print(f"\nAucune baseline « {args.baseline} » : relancer avec --save pour en créer une.")
+    elif regressions:
+        print("\nRégressions (p50) :")
+        for case, size, before, after, ratio in regressions:
+            print(f"  {case} ({size:,}) : {before:.2f} -> {after:.2f} ms (+{ratio:.0%})")
+    else:
+        print(f"\nPas de régression par rapport à la baseline « {args.baseline} ».")
+    if args.save:
+        save_baseline(args.baseline, results)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Débit soutenu du pipeline d'ingestion d'événements.
+
+Usage : python -m benchmarks.bench_ingestion --events 200000 --latency 0.05
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from events import EVENT_COLUMNS, EventIngestor, validate_frame
+
+
+def make_events_csv(n, duplicate_ratio=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2026-01-05 06:00:00")
+    timestamps = start + pd.to_timedelta(np.sort(rng.integers(0, 8 * 3600 * 1000, n)), unit="ms")
+    df = pd.DataFrame({
+        "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "OF": [f"OF{i:05d}" for i in rng.integers(0, 2000, n)],
+        "evenement": rng.choice(["debut", "fin", "arret", "reprise", "production"], n),
+        "type_arret": rng.choice(["", "panne", "reglage", "manque matiere"], n),
+        "commentaire": "",
+        "quantite": rng.integers(0, 50, n).astype(str),
+    })[EVENT_COLUMNS]
+    n_dup = int(n * duplicate_ratio)
+    if n_dup:
+        df = pd.concat([df, df.sample(n_dup, random_state=seed)], ignore_index=True)
+    return df.to_csv(index=False)
+
+
+def slow_sink(latency):
+    # Simule un aller-retour réseau par lot
+    def write(batch):
+        time.sleep(latency)
+    return write
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence par lot (s)")
+    args = parser.parse_args()
+
+    csv_text = make_events_csv(args.events)
+
+    t0 = time.perf_counter()
+    events, rejected = validate_frame(pd.read_csv(io.StringIO(csv_text), dtype=str, keep_default_na=False))
+    t_validate = time.perf_counter() - t0
+    print(f"validation : {len(events) / t_validate:,.0f} événements/s ({len(rejected)} rejetés)")
+
+    ingestor = EventIngestor(slow_sink(args.latency), batch_size=args.batch_size,
+                             max_queue=len(events) + 1)
+    t0 = time.perf_counter()
+    accepted, _ = ingestor.ingest_file(io.StringIO(csv_text))
+    t_submit = time.perf_counter() - t0
+    ingestor.flush()
+    t_total = time.perf_counter() - t0
+    ingestor.close()
+
+    print(f"mise en file : {accepted / t_submit:,.0f} événements/s (thread appelant)")
+    print(f"débit soutenu : {ingestor.stats['written'] / t_total:,.0f} événements/s "
+          f"({ingestor.stats['batches']} lots, {ingestor.stats['duplicates']} doublons)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Empreinte mémoire des tables en cache : frames brutes contre frames typées.
+
+Pour chaque taille, compare la table OF telle que renvoyée par le client
+(colonnes object) et sa forme compacte (schemas.typed_frame), puis la
+mémoire allouée pour servir N sessions : une copie profonde par session
+(ancien TableCache) ou un instantané partagé (copie superficielle).
+
+Usage : python -m benchmarks.bench_memory --sizes 10000,100000 --sessions 30
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from benchmarks.datagen import make_repository
+from schemas import frame_memory, typed_frame
+
+TABLE = "ordres_fabrication"
+
+
+def allocated_mb(fn):
+    # Mémoire encore allouée après fn (objets conservés), en Mo
+    tracemalloc.start()
+    try:
+        kept = fn()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current / 2**20
+
+
+def run(size, sessions):
+    repo = make_repository(size)
+    raw = repo.fetch_table(TABLE)
+    t0 = time.perf_counter()
+    typed = typed_frame(raw, TABLE)
+    convert_ms = (time.perf_counter() - t0) * 1000
+
+    # Une session typique : filtre et tri sur le statut et le poste
+    def filtered(df):
+        selection = df[df["statut"].isin(["Planifié", "En cours"]) & df["poste"].isin(["Assemblage", "Usinage"])]
+        return selection.sort_values(["priorite", "id"], ascending=False).head(50)
+
+    def filter_ms(df, repeat=10):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            filtered(df)
+        return (time.perf_counter() - t0) * 1000 / repeat
+
+    row = {
+        "taille": size,
+        "brute Mo": frame_memory(raw) / 2**20,
+        "typée Mo": frame_memory(typed) / 2**20,
+        "conversion ms": convert_ms,
+        "filtre brute ms": filter_ms(raw),
+        "filtre typée ms": filter_ms(typed),
+        "copies profondes Mo": allocated_mb(lambda: [raw.copy() for _ in range(sessions)]),
+        "instantanés Mo": allocated_mb(lambda: [typed.copy(deep=False) for _ in range(sessions)]),
+    }
+    repo.client.connection.close()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="nombres d'OF, séparés par des virgules")
+    parser.add_argument("--sessions", type=int, default=30, help="sessions servies par le cache")
+    args = parser.parse_args()
+
+    rows = [run(int(size), args.sessions) for size in args.sizes.split(",")]
+    columns = list(rows[0])
+    print(" ".join(f"{c:>19}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]:>19,}" if c == "taille" else f"{row[c]:>19.2f}" for c in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
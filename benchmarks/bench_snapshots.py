@@ -0,0 +1,94 @@
+"""Chargement de la table OF par processus : lecture en base contre instantané partagé.
+
+Pour chaque taille, compare ce que paie chaque processus Streamlit :
+- base : requête complète puis conversion (schemas.typed_frame), mémoire
+  entièrement privée ;
+- instantané : lecture mmap du fichier Arrow publié par snapshots.py, dont
+  seules les parties converties (catégories, valeurs manquantes) sont
+  copiées dans le processus.
+Le coût de publication n'est payé qu'une fois, par le processus de
+rafraîchissement ; une lecture sans changement de version ne coûte qu'un stat.
+
+Usage : python -m benchmarks.bench_snapshots --sizes 10000,100000 --workers 4
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+
+from benchmarks.datagen import make_repository
+from schemas import typed_frame
+from snapshots import SnapshotStore
+
+TABLE = "ordres_fabrication"
+
+
+def private_mb(fn):
+    # Mémoire allouée par fn et conservée (tas Python et pool Arrow), en Mo
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    try:
+        kept = fn()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    arrow = pa.total_allocated_bytes() - arrow_before
+    del kept
+    return (current + arrow) / 2**20
+
+
+def timed_ms(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def run(size, workers, directory):
+    repo = make_repository(size)
+    load = lambda: typed_frame(repo.fetch_table(TABLE), TABLE)
+
+    store = SnapshotStore(directory)
+    publish_ms = timed_ms(lambda: store.publish(TABLE, load()))
+    # Chaque processus a son propre SnapshotStore : nouvelle instance = premier accès
+    read = lambda: SnapshotStore(directory).read(TABLE)
+    unchanged_us = timed_ms(lambda: [store.read(TABLE) for _ in range(1000)])
+
+    base_mb = private_mb(load)
+    snapshot_mb = private_mb(read)
+    row = {
+        "taille": size,
+        "base ms": timed_ms(load),
+        "base Mo": base_mb,
+        "publication ms": publish_ms,
+        "instantané ms": timed_ms(read),
+        "instantané Mo": snapshot_mb,
+        "inchangé µs": unchanged_us,
+        f"{workers} proc. base Mo": base_mb * workers,
+        f"{workers} proc. inst. Mo": snapshot_mb * workers,
+    }
+    repo.client.connection.close()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="nombres d'OF, séparés par des virgules")
+    parser.add_argument("--workers", type=int, default=4, help="processus Streamlit derrière le répartiteur")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes.split(","):
+        with tempfile.TemporaryDirectory() as directory:
+            rows.append(run(int(size), args.workers, directory))
+    columns = list(rows[0])
+    print(" ".join(f"{c:>19}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]:>19,}" if c == "taille" else f"{row[c]:>19.2f}" for c in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
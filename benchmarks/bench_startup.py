@@ -0,0 +1,130 @@
+"""Démarrage à froid : temps d'import par module et délai jusqu'au premier rendu.
+
+Chaque exécution a lieu dans un processus neuf (imports non mis en cache).
+Le détail des imports est lu dans la sortie de ``python -X importtime`` ;
+streamlit est importé d'abord car le serveur l'a déjà chargé avant le script.
+Le premier rendu de chaque écran est mesuré avec le harnais de test de
+Streamlit, sur la base locale remplie par benchmarks.datagen.
+
+Usage : python -m benchmarks.bench_startup --runs 5 --save
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.datagen import make_repository
+from benchmarks.harness import compare_baseline, format_table, save_baseline, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules chargés par l'application après la connexion
+APP_MODULES = [
+    "services", "views.sidebar", "views.dashboard", "views.ordres",
+    "views.rh", "views.qualite", "views.equipements", "views.analyses",
+]
+
+FIRST_RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+timings = {}
+t0 = time.perf_counter()
+app.run()
+timings["Connexion"] = time.perf_counter() - t0
+app.session_state["logged_in"] = True
+t0 = time.perf_counter()
+app.run()
+timings[app.sidebar.selectbox[0].value] = time.perf_counter() - t0
+for page in app.sidebar.selectbox[0].options[1:]:
+    t0 = time.perf_counter()
+    app.sidebar.selectbox[0].set_value(page).run()
+    timings[page] = time.perf_counter() - t0
+print(json.dumps({page: seconds * 1000 for page, seconds in timings.items()}))
+"""
+
+
+def import_breakdown(modules=APP_MODULES, min_ms=1.0):
+    """Temps cumulé (ms) des imports faits après streamlit.
+
+    Chaque module de premier niveau est suivi de ses imports directs les
+    plus lents (« services > pandas »), seul niveau utile pour savoir quoi
+    différer.
+    """
+    code = "import streamlit\n" + "\n".join(f"import {m}" for m in modules)
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    timings = {}
+    children = []
+    after_streamlit = False
+    # -X importtime écrit les enfants avant leur parent
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        ms = int(cumulative) / 1000
+        if depth == 1:
+            children.append((name.strip(), ms))
+        elif depth == 0:
+            name = name.strip()
+            if after_streamlit:
+                timings[name] = ms
+                for child, child_ms in children:
+                    if child_ms >= min_ms:
+                        timings[f"{name} > {child}"] = child_ms
+            after_streamlit = after_streamlit or name == "streamlit"
+            children = []
+    return timings
+
+
+def first_render(db_path):
+    env = dict(os.environ, MES_STORAGE="local", MES_LOCAL_DB=db_path)
+    stdout = subprocess.run(
+        [sys.executable, "-c", FIRST_RENDER, os.path.join(ROOT, "app.py")],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, default=1000, help="nombre d'OF de la base locale")
+    parser.add_argument("--baseline", default="bench_startup", help="nom de la baseline")
+    parser.add_argument("--save", action="store_true", help="enregistrer les résultats comme baseline")
+    args = parser.parse_args()
+
+    imports, renders = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "atelier.db")
+        make_repository(args.size, path=db_path).client.connection.close()
+        for _ in range(args.runs):
+            for name, ms in import_breakdown().items():
+                imports.setdefault(name, []).append(ms)
+            for page, ms in first_render(db_path).items():
+                renders.setdefault(page, []).append(ms)
+
+    results = {}
+    for name, timings in imports.items():
+        results[(f"import : {name}", 0)] = summarize(timings)
+    for page, timings in renders.items():
+        results[(f"premier rendu : {page}", args.size)] = summarize(timings)
+
+    print(format_table(results))
+    regressions = compare_baseline(args.baseline, results)
+    if regressions:
+        print("\nRégressions (p50) :")
+        for case, size, before, after, ratio in regressions:
+            print(f"  {case} ({size:,}) : {before:.2f} -> {after:.2f} ms (+{ratio:.0%})")
+    if args.save:
+        save_baseline(args.baseline, results)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
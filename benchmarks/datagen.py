@@ -0,0 +1,150 @@
+"""Générateur déterministe d'un atelier synthétique (OF, opérateurs, défauts,
+équipements, événements) aux colonnes des tables Supabase.
+
+Les tailles sont proportionnelles au nombre d'OF : ``generate_workshop(100_000)``
+produit 100 000 OF, 500 opérateurs (et leurs absences), 20 000 défauts,
+200 machines (et leur historique de pannes) et 500 000 événements.
+"""
+import numpy as np
+import pandas as pd
+
+from capacity import POSTES
+from events import EVENT_COLUMNS
+from storage import LocalRepository
+
+STATUTS = ["Planifié", "En cours", "Terminé"]
+GRAVITES = ["Mineure", "Moyenne", "Majeure"]
+TYPES_DEFAUT = ["Rayure", "Cote hors tolérance", "Défaut peinture", "Soudure", "Pièce manquante"]
+STATUTS_MACHINE = ["En production", "En maintenance", "Arrêtée"]
+TYPES_ARRET = ["", "panne", "reglage", "manque matiere"]
+
+START = pd.Timestamp("2025-01-01")
+DAYS = 730
+
+
+def _iso_dates(days):
+    return (START + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d")
+
+
+def generate_ofs(n, n_operators, n_machines, rng):
+    debut = rng.integers(0, DAYS, n)
+    duree = rng.integers(1, 15, n)
+    statut = rng.choice(STATUTS, n, p=[0.3, 0.2, 0.5])
+    temps_standard = rng.integers(2, 80, n).astype(float)
+    progression = np.where(statut == "Terminé", 100, np.where(statut == "Planifié", 0, rng.integers(0, 100, n)))
+    return pd.DataFrame({
+        "numero_of": [f"OF{i:07d}" for i in range(n)],
+        "description": rng.choice(["Pièce A", "Pièce B", "Sous-ensemble C", "Carter D"], n),
+        "poste": rng.choice(POSTES, n),
+        "machine": [f"Machine{m}" for m in rng.integers(1, n_machines + 1, n)],
+        "id_operateur": [f"Opérateur {o:04d}" for o in rng.integers(0, n_operators, n)],
+        "statut": statut,
+        "priorite": rng.integers(1, 6, n),
+        "progression": progression.astype(float),
+        "date_debut": _iso_dates(debut),
+        "date_fin": np.where(statut == "Terminé", _iso_dates(debut + duree), None),
+        "temps_standard": temps_standard,
+        "temps_reel": np.round(temps_standard * rng.lognormal(0.05, 0.2, n) * progression / 100, 1),
+        "quantite": rng.integers(10, 500, n),
+        "quantite_realisee": 0,
+    })
+
+
+def generate_operators(n, rng):
+    levels = rng.integers(0, 4, (n, len(POSTES)))
+    levels[np.arange(n), rng.integers(0, len(POSTES), n)] = 3
+    operators = pd.DataFrame(levels, columns=POSTES)
+    operators.insert(0, "nom", [f"Opérateur {o:04d}" for o in range(n)])
+    operators.insert(1, "poste", np.array(POSTES)[levels.argmax(axis=1)])
+    return operators
+
+
+def generate_defects(n, n_ofs, rng):
+    return pd.DataFrame({
+        "date": _iso_dates(rng.integers(0, DAYS, n)),
+        "numero_of": [f"OF{i:07d}" for i in rng.integers(0, n_ofs, n)],
+        "poste": rng.choice(POSTES, n),
+        "type_defaut": rng.choice(TYPES_DEFAUT, n),
+        "gravite": rng.choice(GRAVITES, n, p=[0.6, 0.3, 0.1]),
+        "description": "",
+        "action_corrective": "",
+    })
+
+
+def generate_absences(n_operators, rng, per_operator=6):
+    n = n_operators * per_operator
+    debut = rng.integers(0, DAYS, n)
+    return pd.DataFrame({
+        "operateur": [f"Opérateur {o:04d}" for o in np.repeat(np.arange(n_operators), per_operator)],
+        "debut": _iso_dates(debut),
+        "fin": _iso_dates(debut + rng.integers(0, 10, n)),
+        "motif": rng.choice(["Maladie", "Congé", "Formation", "Autre"], n, p=[0.3, 0.5, 0.15, 0.05]),
+    })
+
+
+def generate_equipment(n, rng):
+    return pd.DataFrame({
+        "nom": [f"Machine{m}" for m in range(1, n + 1)],
+        "poste": rng.choice(POSTES, n),
+        "statut": rng.choice(STATUTS_MACHINE, n, p=[0.8, 0.1, 0.1]),
+    })
+
+
+def generate_maintenance(n_machines, rng, failures_per_machine=12):
+    # Pannes à intervalles exponentiels (MTBF propre à chaque machine), réparations log-normales
+    n = n_machines * failures_per_machine
+    machine = np.repeat(np.arange(1, n_machines + 1), failures_per_machine)
+    mtbf_h = np.repeat(rng.uniform(200, 1500, n_machines), failures_per_machine)
+    repair_h = rng.lognormal(1.0, 0.6, n)
+    gaps = rng.exponential(mtbf_h).reshape(n_machines, failures_per_machine)
+    debut_h = (gaps + repair_h.reshape(n_machines, failures_per_machine)).cumsum(axis=1).ravel()
+    debut = START + pd.to_timedelta(debut_h, unit="h")
+    fin = debut + pd.to_timedelta(repair_h, unit="h")
+    keep = debut < START + pd.Timedelta(days=DAYS)
+    return pd.DataFrame({
+        "machine": [f"Machine{m}" for m in machine[keep]],
+        "type": "panne",
+        "debut": debut[keep].strftime("%Y-%m-%dT%H:%M:%S"),
+        "fin": fin[keep].strftime("%Y-%m-%dT%H:%M:%S"),
+        "commentaire": "",
+    })
+
+
+def generate_events(n, n_ofs, rng):
+    timestamps = START + pd.to_timedelta(np.sort(rng.integers(0, DAYS * 86_400_000, n)), unit="ms")
+    return pd.DataFrame({
+        "timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "OF": [f"OF{i:07d}" for i in rng.integers(0, n_ofs, n)],
+        "evenement": rng.choice(["debut", "fin", "arret", "reprise", "production", "rebut"], n),
+        "type_arret": rng.choice(TYPES_ARRET, n),
+        "commentaire": "",
+        "quantite": rng.integers(0, 50, n),
+    })[EVENT_COLUMNS]
+
+
+def generate_workshop(n_ofs, seed=0):
+    """Renvoie {table: DataFrame} pour n_ofs ordres de fabrication."""
+    rng = np.random.default_rng(seed)
+    n_operators = max(n_ofs // 200, 4)
+    n_machines = max(n_ofs // 500, 5)
+    return {
+        "ordres_fabrication": generate_ofs(n_ofs, n_operators, n_machines, rng),
+        "ressources_humaines": generate_operators(n_operators, rng),
+        "defauts": generate_defects(n_ofs // 5, n_ofs, rng),
+        "equipements": generate_equipment(n_machines, rng),
+        "evenements": generate_events(n_ofs * 5, n_ofs, rng),
+        "maintenances": generate_maintenance(n_machines, rng),
+        "absences": generate_absences(n_operators, rng),
+    }
+
+
+def make_repository(n_ofs, seed=0, path=":memory:"):
+    """Base SQLite embarquée remplie avec l'atelier synthétique.
+
+    Sert de substitut en mémoire au client Supabase : même interface de
+    requêtes, sans réseau.
+    """
+    repo = LocalRepository(path, seed=False)
+    for table, df in generate_workshop(n_ofs, seed).items():
+        repo.load_frame(table, df)
+    return repo
@@ -0,0 +1,92 @@
+"""Mesure de latence (percentiles) et de mémoire, baselines JSON."""
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+# Baselines propres à chaque machine, non versionnées (voir .gitignore)
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Écart toléré sur le p50 avant de signaler une régression
+REGRESSION_THRESHOLD = 0.25
+
+
+def measure(fn, repeat=10, warmup=1):
+    """Exécute fn et renvoie les percentiles de latence (ms) et le pic mémoire (Mo).
+
+    Le pic mémoire est mesuré par tracemalloc sur une exécution séparée, pour
+    ne pas fausser les temps.
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return summarize(timings, peak / 2**20)
+
+
+def summarize(timings, peak_mb=None):
+    """Percentiles (ms) d'une série de durées en ms."""
+    timings = np.array(timings)
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "p99_ms": round(float(np.percentile(timings, 99)), 3),
+        "max_ms": round(float(timings.max()), 3),
+        "peak_mb": None if peak_mb is None else round(peak_mb, 2),
+        "repeat": len(timings),
+    }
+
+
+def format_table(results):
+    lines = [f"{'cas':<42} {'taille':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'pic Mo':>8}"]
+    for (case, size), r in results.items():
+        lines.append(f"{case:<42} {size:>9,} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} {'-' if r['peak_mb'] is None else format(r['peak_mb'], '.1f'):>8}")
+    return "\n".join(lines)
+
+
+def _baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name, results):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    payload = {
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {f"{case}|{size}": r for (case, size), r in results.items()},
+    }
+    with open(_baseline_path(name), "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+
+
+def compare_baseline(name, results, threshold=REGRESSION_THRESHOLD):
+    """Renvoie les lignes (cas, taille, avant, après, écart) dont le p50 a régressé."""
+    path = _baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for (case, size), r in results.items():
+        before = baseline.get(f"{case}|{size}")
+        if before is None or before["p50_ms"] <= 0:
+            continue
+        ratio = r["p50_ms"] / before["p50_ms"] - 1
+        if ratio > threshold:
+            regressions.append((case, size, before["p50_ms"], r["p50_ms"], ratio))
+    return regressions
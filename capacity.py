@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dates import to_datetime
+from kpi import HOURS_PER_DAY
+from table_cache import diff_rows
+
+POSTES = ["Assemblage", "Peinture", "Usinage", "Contrôle", "Emballage"]
+
+# Tableau de polyvalence de démonstration (niveaux 0 à 3), utilisé tant que
+# la table ressources_humaines ne renseigne pas les compétences
+DEFAULT_POLYVALENCE = pd.DataFrame({
+    'Opérateur': ['Martin Dubois', 'Julie Bernard', 'Thomas Petit', 'Sophie Grand'],
+    'Assemblage': [3, 2, 1, 3],
+    'Peinture': [1, 3, 0, 2],
+    'Usinage': [2, 1, 3, 0],
+    'Contrôle': [2, 2, 2, 3],
+    'Emballage': [3, 3, 1, 2]
+})
+
+
+def skill_matrix(operators, postes=POSTES):
+    """Renvoie (noms des opérateurs, matrice des niveaux opérateur × poste).
+
+    Les niveaux sont lus dans les colonnes portant le nom d'un poste ; à
+    défaut, un opérateur a le niveau 3 sur son poste (colonne ``poste``).
+    """
+    if operators.empty:
+        operators = DEFAULT_POLYVALENCE.rename(columns={'Opérateur': 'nom'})
+    if "nom" in operators.columns:
+        names = operators["nom"].astype(str).tolist()
+    else:
+        names = operators.get("id", pd.Series(range(len(operators)))).astype(str).tolist()
+
+    skill_columns = [p for p in postes if p in operators.columns]
+    if skill_columns:
+        levels = operators.reindex(columns=postes).apply(pd.to_numeric, errors="coerce")
+        return names, levels.fillna(0).clip(0, 3).to_numpy(np.int8)
+
+    levels = np.zeros((len(operators), len(postes)), dtype=np.int8)
+    if "poste" in operators.columns:
+        codes = pd.Categorical(operators["poste"], categories=postes).codes
+        known = codes >= 0
+        levels[np.flatnonzero(known), codes[known]] = 3
+    return names, levels
+
+
+def capacity_per_poste(operators, equipment, postes, hours_per_day=HOURS_PER_DAY):
+    """Heures disponibles par jour et par poste.
+
+    La capacité d'un poste est limitée par la ressource la plus rare :
+    min(opérateurs, machines) × heures par jour, ou la seule ressource
+    connue si l'autre table ne renseigne pas de poste. Un poste sans
+    information compte pour une ressource.
+    """
+    def count(df):
+        if df.empty or "poste" not in df.columns:
+            return None
+        return df["poste"].value_counts().reindex(postes, fill_value=0).to_numpy()
+
+    n_operators, n_equipment = count(operators), count(equipment)
+    if n_operators is not None and n_equipment is not None:
+        resources = np.minimum(n_operators, n_equipment)
+    elif n_operators is not None or n_equipment is not None:
+        resources = n_operators if n_operators is not None else n_equipment
+    else:
+        resources = np.ones(len(postes))
+    return resources.astype(float) * hours_per_day
+
+
+def spread(poste_idx, start_day, remaining, horizon, n_postes, hours_per_day=HOURS_PER_DAY):
+    """Répartit les heures restantes de chaque OF sur des jours consécutifs.
+
+    Chaque OF consomme au plus hours_per_day par jour à partir de start_day
+    (indice de jour dans l'horizon). Renvoie la matrice de charge
+    (n_postes × horizon).
+    """
+    n_days = np.ceil(remaining / hours_per_day).astype(np.int64)
+    keep = n_days > 0
+    poste_idx, start_day, remaining, n_days = poste_idx[keep], start_day[keep], remaining[keep], n_days[keep]
+
+    # Une entrée par (OF, jour) : rang du jour dans l'OF via un cumsum
+    of_rep = np.repeat(np.arange(len(n_days)), n_days)
+    offsets = np.arange(len(of_rep)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+    hours = np.minimum(hours_per_day, remaining[of_rep] - offsets * hours_per_day)
+    day = start_day[of_rep] + offsets
+
+    inside = (day >= 0) & (day < horizon)
+    flat = poste_idx[of_rep[inside]] * horizon + day[inside]
+    load = np.bincount(flat, weights=hours[inside], minlength=n_postes * horizon)
+    # bincount d'un tableau vide renvoie des entiers
+    return load.astype(float, copy=False).reshape(n_postes, horizon)
+
+
+class ChargeModel:
+    """Charge par poste et par jour sur un horizon glissant.
+
+    La contribution de chaque OF (poste, jour de départ, heures restantes)
+    est mémorisée : quand un OF change, seuls les jours qu'il couvrait et
+    ceux qu'il couvre désormais sont recalculés.
+    """
+
+    def __init__(self, start, horizon_days=365, postes=POSTES, hours_per_day=HOURS_PER_DAY):
+        self.start = pd.Timestamp(start).normalize()
+        self.horizon = horizon_days
+        self.postes = list(postes)
+        self.hours_per_day = hours_per_day
+        self.load = np.zeros((len(self.postes), self.horizon))
+        self.capacity = np.full(len(self.postes), float(hours_per_day))
+        self._params = pd.DataFrame(columns=["poste_idx", "start_day", "remaining"])
+        self._hashes = pd.Series(dtype="uint64")
+        self._lock = threading.Lock()
+
+    def _of_params(self, ofs):
+        if ofs.empty:
+            return pd.DataFrame({"poste_idx": [], "start_day": [], "remaining": []}, index=ofs.index)
+        temps_standard = pd.to_numeric(ofs.get("temps_standard"), errors="coerce").fillna(0.0).to_numpy()
+        progression = pd.to_numeric(ofs.get("progression"), errors="coerce").fillna(0.0).clip(0, 100).to_numpy()
+        remaining = temps_standard * (1 - progression / 100)
+        if "statut" in ofs.columns:
+            remaining = np.where(ofs["statut"].eq("Terminé"), 0.0, remaining)
+
+        # Le reste à faire d'un OF démarré avant l'horizon commence au premier jour
+        date_debut = to_datetime(ofs["date_debut"]).dt.normalize() if "date_debut" in ofs.columns else pd.Series(pd.NaT, index=ofs.index)
+        start_day = ((date_debut - self.start).dt.days.fillna(0).to_numpy()).clip(min=0).astype(np.int64)
+
+        postes = pd.Categorical(ofs["poste"] if "poste" in ofs.columns else None, categories=self.postes)
+        poste_idx = postes.codes.astype(np.int64)
+        return pd.DataFrame({
+            "poste_idx": poste_idx,
+            "start_day": start_day,
+            # Les OF sur un poste inconnu ne sont pas comptés
+            "remaining": np.where(poste_idx >= 0, remaining, 0.0),
+        }, index=ofs.index)
+
+    def _spread(self, params):
+        return spread(
+            params["poste_idx"].to_numpy(np.int64).clip(min=0),
+            params["start_day"].to_numpy(np.int64),
+            params["remaining"].to_numpy(float),
+            self.horizon, len(self.postes), self.hours_per_day,
+        )
+
+    def sync(self, ofs):
+        """Met la charge à jour d'après la liste des OF (seules les lignes modifiées sont recalculées)."""
+        with self._lock:
+            if ofs.empty or "id" not in ofs.columns:
+                self._params = self._of_params(ofs)
+                self.load = self._spread(self._params)
+                # Charge recalculée en entier : plus d'empreinte de référence
+                self._hashes = pd.Series(dtype="uint64")
+                return
+            ofs = ofs.drop_duplicates("id", keep="last")
+            hashes, changed_ids, stale_ids = diff_rows(ofs, self._hashes)
+            if self._hashes.empty:
+                # Pas de référence (premier appel, ou liste précédente sans id) : tout recalculer
+                self._params = self._of_params(ofs.set_index("id"))
+                self.load = self._spread(self._params)
+                self._hashes = hashes
+                return
+            if changed_ids.empty and stale_ids.empty:
+                return
+            stale_ids = self._params.index.intersection(stale_ids.union(changed_ids))
+            old = self._params.loc[stale_ids]
+            new = self._of_params(ofs.set_index("id").loc[changed_ids])
+            self.load += self._spread(new) - self._spread(old) if not old.empty else self._spread(new)
+            self._params = pd.concat([self._params[~self._params.index.isin(stale_ids)], new])
+            self._hashes = hashes
+
+    def set_capacity(self, capacity):
+        self.capacity = np.asarray(capacity, dtype=float)
+
+    def dates(self, days=None):
+        return pd.date_range(self.start, periods=days or self.horizon, freq="D")
+
+    def series(self, days=None, poste=None, freq="D"):
+        """Charge et capacité (h) sur les `days` premiers jours, par jour ou par semaine."""
+        days = min(days or self.horizon, self.horizon)
+        if poste is None:
+            load = self.load[:, :days].sum(axis=0)
+            capacity = np.full(days, self.capacity.sum())
+        else:
+            idx = self.postes.index(poste)
+            load = self.load[idx, :days].copy()
+            capacity = np.full(days, self.capacity[idx])
+        dates = self.dates(days)
+        if freq == "W":
+            n_weeks = -(-days // 7)
+            pad = n_weeks * 7 - days
+            load = np.pad(load, (0, pad)).reshape(n_weeks, 7).sum(axis=1)
+            capacity = np.pad(capacity, (0, pad)).reshape(n_weeks, 7).sum(axis=1)
+            dates = dates[::7]
+        return dates, load, capacity
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import Counter, deque
+
+from connection import is_missing_relation
+from of_sync import LOOKBACK_SECONDS, fetch_by_ids
+
+CHANGE_LOG_TABLE = "change_log"
+# Tables suivies par le journal des modifications (triggers, voir sql/change_log.sql)
+WATCHED_TABLES = ("ordres_fabrication", "defauts", "equipements", "maintenances", "absences")
+
+
+class ChangeFeed:
+    """Flux des modifications de la base, partagé par toutes les sessions.
+
+    Les triggers de la base ajoutent une ligne au journal ``change_log`` à
+    chaque insertion, modification ou suppression (table, id de ligne,
+    opération). Un thread lit les nouvelles lignes toutes les ``interval``
+    secondes à partir du dernier id vu, prévient les abonnés puis
+    incrémente la version de chaque table touchée : c'est le substitut,
+    commun à Supabase et à la base locale, d'un canal temps réel.
+
+    Les ids sont attribués à l'insertion, pas à la validation : une
+    transaction validée en retard laisse un trou sous le curseur. Les trous
+    sont relus à chaque tour pendant ``lookback`` secondes (au-delà, la
+    transaction a été annulée). Le curseur n'avance qu'une fois les abonnés
+    prévenus sans erreur ; sinon le lot est relu au tour suivant.
+
+    Sans journal (sql/change_log.sql non appliqué), le flux est désactivé
+    et les tables ne sont rafraîchies qu'à l'expiration de leur TTL ; si
+    la base est injoignable au démarrage, le thread réessaie à chaque tour.
+    """
+
+    def __init__(self, client, interval=1.0, table=CHANGE_LOG_TABLE, batch_size=1000, history=5000,
+                 lookback=LOOKBACK_SECONDS, max_holes=10000):
+        self.client = client
+        self.interval = interval
+        self.table = table
+        self.batch_size = batch_size
+        self.lookback = lookback
+        self.max_holes = max_holes
+        self.versions = Counter()
+        # (position, modification) : position = rang de réception, croissant
+        # même pour les modifications reçues en retard
+        self.recent = deque(maxlen=history)
+        self.position = 0
+        # Ids manquants sous le curseur -> instant où le trou a été vu
+        self._holes = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.cursor = None
+        self.enabled = True
+        self._stop = threading.Event()
+        try:
+            self._start_cursor()
+        except Exception as e:
+            self._failed(e)
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        if self.enabled:
+            self._thread.start()
+
+    def _start_cursor(self):
+        # Le flux part de la dernière entrée du journal : l'historique antérieur
+        # est déjà dans les tables chargées
+        latest = self.client.table(self.table).select("id").order("id", desc=True).limit(1).execute().data
+        self.cursor = latest[0]["id"] if latest else 0
+
+    def _failed(self, exc):
+        if is_missing_relation(exc):
+            self.enabled = False
+
+    def subscribe(self, listener):
+        """listener(changes) est appelé depuis le thread du flux à chaque lot de modifications."""
+        self._listeners.append(listener)
+
+    def poll(self):
+        # Lit le journal jusqu'au bout (et les trous encore ouverts) ;
+        # renvoie les modifications lues
+        if self.cursor is None:
+            self._start_cursor()
+            return []
+        late = []
+        if self._holes:
+            late = fetch_by_ids(lambda: self.client.table(self.table).select("*"), sorted(self._holes))
+        changes, cursor = [], self.cursor
+        while True:
+            rows = (self.client.table(self.table).select("*").gt("id", cursor)
+                    .order("id").limit(self.batch_size).execute().data)
+            if not rows:
+                break
+            changes.extend(rows)
+            cursor = rows[-1]["id"]
+            if len(rows) < self.batch_size:
+                break
+        changes = late + changes
+        # Abonnés d'abord : une erreur laisse curseur et trous inchangés
+        if changes:
+            for listener in self._listeners:
+                listener(changes)
+        self._advance(changes, cursor)
+        return changes
+
+    def _advance(self, changes, cursor):
+        now = time.monotonic()
+        received = {change["id"] for change in changes}
+        for row_id in received:
+            self._holes.pop(row_id, None)
+        ids = sorted(row_id for row_id in received if row_id > self.cursor)
+        previous = self.cursor
+        for row_id in ids:
+            self._holes.update((missing, now) for missing in range(max(previous + 1, row_id - self.max_holes), row_id))
+            previous = row_id
+        self._holes = {
+            row_id: seen for row_id, seen in self._holes.items() if now - seen < self.lookback
+        }
+        if len(self._holes) > self.max_holes:
+            # Trous en trop (séquence à cache, etc.) : les plus anciens abandonnés
+            self._holes = dict(sorted(self._holes.items())[-self.max_holes:])
+        self.cursor = cursor
+        if changes:
+            with self._lock:
+                for change in changes:
+                    self.position += 1
+                    self.recent.append((self.position, change))
+                self.versions.update(change["table_name"] for change in changes)
+
+    def version(self, table):
+        return self.versions[table]
+
+    def changed_ids(self, table, since):
+        """Ids des lignes de table reçues après la position ``since``."""
+        if since is None:
+            return set()
+        with self._lock:
+            return {c["row_id"] for position, c in self.recent if position > since and c["table_name"] == table}
+
+    def _run(self):
+        while self.enabled and not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # Base momentanément injoignable : nouvel essai au tour suivant
+                self._failed(e)
+                time.sleep(self.interval)
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
@@ -0,0 +1,96 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import record_response_size
+
+# Réglages du pool, surchargeables par variables d'environnement
+POOL_SIZE = int(os.environ.get("MES_POOL_SIZE", 10))
+REQUEST_TIMEOUT = float(os.environ.get("MES_REQUEST_TIMEOUT", 10))
+CONNECT_TIMEOUT = float(os.environ.get("MES_CONNECT_TIMEOUT", 5))
+MAX_RETRIES = int(os.environ.get("MES_MAX_RETRIES", 3))
+RETRY_BACKOFF = float(os.environ.get("MES_RETRY_BACKOFF", 0.3))
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+TRANSIENT_STATUS = {"408", "429", "500", "502", "503", "504"}
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="supabase-fetch")
+
+
+def create_pooled_client(url, key, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+    """Client Supabase partageant un pool de connexions HTTP/2 keep-alive."""
+    # Import différé : le client n'est chargé qu'à la première requête
+    import httpx
+    from supabase import ClientOptions, create_client
+
+    http_client = httpx.Client(
+        http2=True,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        # Taille des réponses, relevée par les mesures de requêtes
+        event_hooks={"response": [record_response_size]},
+    )
+    options = ClientOptions(httpx_client=http_client, postgrest_client_timeout=timeout)
+    return create_client(url, key, options=options)
+
+
+def is_transient(exc):
+    import httpx
+    from postgrest import APIError
+
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code) in TRANSIENT_STATUS
+    if isinstance(exc, APIError):
+        return str(exc.code) in TRANSIENT_STATUS
+    return False
+
+
+# Table ou fonction SQL absente : migration de sql/ non appliquée
+# (codes PostgreSQL et PostgREST)
+MISSING_RELATION_CODES = {"42P01", "42883", "PGRST202", "PGRST205"}
+
+
+def is_missing_relation(exc):
+    import sqlite3
+
+    from postgrest import APIError
+
+    if isinstance(exc, APIError):
+        return str(exc.code) in MISSING_RELATION_CODES
+    if isinstance(exc, sqlite3.OperationalError):
+        return str(exc).startswith(("no such table", "no such function"))
+    return False
+
+
+def with_retry(fn, retries=MAX_RETRIES, backoff=RETRY_BACKOFF):
+    """Exécute fn (lecture idempotente) avec reprise exponentielle sur erreur transitoire."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            # Gigue pour éviter que toutes les sessions reviennent en même temps
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def fetch_concurrently(loaders):
+    """Lance les chargeurs {nom: fonction} en parallèle et renvoie {nom: résultat}.
+
+    La durée totale est celle du chargeur le plus lent ; la première
+    erreur est relancée une fois tous les chargeurs terminés.
+    """
+    futures = {name: _executor.submit(loader) for name, loader in loaders.items()}
+    results, error = {}, None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,12 @@
+import pandas as pd
+
+
+def to_datetime(values):
+    # Supabase renvoie des chaînes ISO avec ou sans fuseau : tout est ramené en heure naïve UTC
+    parsed = pd.to_datetime(values, errors="coerce", utc=True, format="mixed")
+    return parsed.dt.tz_localize(None)
+
+
+def utc_now():
+    # Instant courant dans la même convention (naïf UTC)
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
@@ -0,0 +1,281 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from schemas import clean_text
+
+logger = logging.getLogger(__name__)
+
+# Schéma de data/events.csv
+EVENT_COLUMNS = ["timestamp", "OF", "evenement", "type_arret", "commentaire", "quantite"]
+EVENT_TABLE = "evenements"
+DEDUP_KEY = ("timestamp", "OF", "evenement")
+
+
+class Event(NamedTuple):
+    timestamp: str
+    OF: str
+    evenement: str
+    type_arret: Optional[str] = None
+    commentaire: Optional[str] = None
+    quantite: Optional[int] = None
+
+    def key(self):
+        return (self.timestamp, self.OF, self.evenement)
+
+
+def parse_event(record):
+    """Valide un événement unique (dict) et le renvoie sous forme d'Event."""
+    try:
+        timestamp = pd.Timestamp(record.get("timestamp"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Horodatage invalide: {record.get('timestamp')!r}")
+    if pd.isna(timestamp):
+        raise ValueError("Horodatage manquant")
+    of = clean_text(record.get("OF"))
+    evenement = clean_text(record.get("evenement"))
+    if not of:
+        raise ValueError("Numéro d'OF manquant")
+    if not evenement:
+        raise ValueError("Type d'événement manquant")
+    quantite = record.get("quantite")
+    if quantite is None or (isinstance(quantite, float) and pd.isna(quantite)) or quantite == "":
+        quantite = None
+    else:
+        try:
+            quantite = int(quantite)
+        except (TypeError, ValueError):
+            raise ValueError(f"Quantité invalide: {quantite!r}")
+        if quantite < 0:
+            raise ValueError("Quantité négative")
+    return Event(
+        timestamp.isoformat(),
+        of,
+        evenement,
+        clean_text(record.get("type_arret")),
+        clean_text(record.get("commentaire")),
+        quantite,
+    )
+
+
+def validate_frame(df):
+    """Validation vectorisée d'un lot : renvoie (événements valides, lignes rejetées)."""
+    missing = [c for c in EVENT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+    df = df[EVENT_COLUMNS]
+    timestamps = pd.to_datetime(df["timestamp"], errors="coerce")
+    of = df["OF"].astype("string").str.strip()
+    evenement = df["evenement"].astype("string").str.strip()
+    quantite = pd.to_numeric(df["quantite"], errors="coerce")
+
+    errors = pd.Series(pd.NA, index=df.index, dtype="string")
+    errors = errors.mask(timestamps.isna(), "Horodatage invalide")
+    errors = errors.mask(errors.isna() & (of.isna() | (of == "")), "Numéro d'OF manquant")
+    errors = errors.mask(errors.isna() & (evenement.isna() | (evenement == "")), "Type d'événement manquant")
+    bad_quantity = (df["quantite"].notna() & (df["quantite"].astype("string").str.strip() != "")
+                    & (quantite.isna() | (quantite < 0) | (quantite % 1 != 0)))
+    errors = errors.mask(errors.isna() & bad_quantity, "Quantité invalide")
+
+    ok = errors.isna()
+    valid = pd.DataFrame({
+        "timestamp": timestamps[ok].map(pd.Timestamp.isoformat),
+        "OF": of[ok],
+        "evenement": evenement[ok],
+        "type_arret": df["type_arret"][ok].astype("string").str.strip().replace("", pd.NA),
+        "commentaire": df["commentaire"][ok].astype("string").str.strip().replace("", pd.NA),
+        "quantite": quantite[ok].astype("Int64"),
+    })
+    events = [
+        Event(*(None if pd.isna(value) else value for value in row))
+        for row in valid.itertuples(index=False, name=None)
+    ]
+    rejected = df[~ok].assign(erreur=errors[~ok])
+    return events, rejected
+
+
+def read_events_file(fileobj, chunksize=50_000):
+    # Lecture par tranches pour les gros fichiers de fin de poste
+    for chunk in pd.read_csv(fileobj, dtype=str, keep_default_na=False, chunksize=chunksize):
+        yield chunk
+
+
+def supabase_sink(client, table=EVENT_TABLE):
+    # L'index unique sur (timestamp, OF, evenement) rend les doublons inoffensifs
+    def write(events):
+        rows = [
+            {k: (int(v) if k == "quantite" and v is not None else v) for k, v in event._asdict().items()}
+            for event in events
+        ]
+        client.table(table).upsert(
+            rows, on_conflict=",".join(DEDUP_KEY), ignore_duplicates=True
+        ).execute()
+    return write
+
+
+class EventIngestor:
+    """File d'écriture différée pour les événements atelier.
+
+    ``submit`` n'attend jamais : l'événement est dédupliqué puis déposé dans
+    une file bornée, vidée par un thread qui écrit par lots de ``batch_size``
+    (ou toutes les ``flush_interval`` secondes). Si la file est pleine,
+    l'événement est refusé et compté dans ``stats["dropped"]``. Un lot encore
+    en échec après ``max_retries`` tentatives est conservé dans ``failed``
+    (``retry_failed`` le remet en file) et ses clés sont oubliées, pour
+    qu'une nouvelle soumission ne soit pas prise pour un doublon. Au-delà de
+    ``max_queue`` événements en échec, les plus anciens sont abandonnés :
+    comptés dans ``stats["lost"]`` et journalisés.
+    ``parse`` valide les dicts soumis ; toute autre ligne (défauts, etc.) peut
+    passer par la même file avec son propre parseur, pourvu qu'elle ait ``key()``.
+    """
+
+    def __init__(self, sink, batch_size=500, flush_interval=1.0, max_queue=50_000,
+                 dedup_window=200_000, max_retries=3, parse=parse_event):
+        self.sink = sink
+        self.parse = parse
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._seen = OrderedDict()
+        self._dedup_window = dedup_window
+        self._seen_lock = threading.Lock()
+        self.stats = {"accepted": 0, "duplicates": 0, "rejected": 0, "dropped": 0,
+                      "written": 0, "failed": 0, "lost": 0, "batches": 0}
+        # Compteurs mis à jour par les sessions et par le thread d'écriture
+        self._stats_lock = threading.Lock()
+        self.failed = deque()
+        self._max_failed = max_queue
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-ingestor", daemon=True)
+        self._thread.start()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _forget(self, events):
+        with self._seen_lock:
+            for event in events:
+                self._seen.pop(event.key(), None)
+
+    def _is_duplicate(self, key):
+        with self._seen_lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return True
+            self._seen[key] = None
+            if len(self._seen) > self._dedup_window:
+                self._seen.popitem(last=False)
+            return False
+
+    def submit(self, event):
+        if isinstance(event, dict):
+            try:
+                event = self.parse(event)
+            except ValueError:
+                self._count("rejected")
+                raise
+        if self._is_duplicate(event.key()):
+            self._count("duplicates")
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._forget([event])
+            self._count("dropped")
+            return False
+        self._count("accepted")
+        return True
+
+    def submit_many(self, events):
+        return sum(self.submit(event) for event in events)
+
+    def ingest_file(self, fileobj):
+        """Valide et met en file un fichier au format data/events.csv."""
+        accepted = 0
+        rejected = []
+        for chunk in read_events_file(fileobj):
+            events, bad = validate_frame(chunk)
+            self._count("rejected", len(bad))
+            accepted += self.submit_many(events)
+            rejected.append(bad)
+        rejected = pd.concat(rejected) if rejected else pd.DataFrame(columns=EVENT_COLUMNS + ["erreur"])
+        return accepted, rejected
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def retry_failed(self):
+        """Remet en file les événements des lots en échec ; renvoie le nombre acceptés."""
+        events = []
+        while self.failed:
+            events.append(self.failed.popleft())
+        # Refusés comme doublons : déjà remis en file par une autre soumission
+        self._count("failed", -len(events))
+        return self.submit_many(events)
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink(batch)
+                self._count("written", len(batch))
+                self._count("batches")
+                return
+            except Exception:
+                if attempt == self.max_retries:
+                    self._forget(batch)
+                    self._keep_failed(batch)
+                    return
+                time.sleep(min(2 ** attempt * 0.5, 10))
+
+    def _keep_failed(self, batch):
+        self.failed.extend(batch)
+        self._count("failed", len(batch))
+        lost = []
+        while len(self.failed) > self._max_failed:
+            lost.append(self.failed.popleft())
+        if lost:
+            self._count("failed", -len(lost))
+            self._count("lost", len(lost))
+            logger.error("%d événement(s) en échec abandonnés (plus de %d en attente de reprise), premier : %r",
+                         len(lost), self._max_failed, lost[0])
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        # Attend que tous les événements en file soient écrits (tests, benchmarks)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
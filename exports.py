@@ -0,0 +1,117 @@
+import datetime
+import gzip
+import io
+import tempfile
+
+import pandas as pd
+
+from schemas import arrow_schema, export_frame
+
+# Table Supabase et nom de fichier par type d'export
+EXPORT_TABLES = {
+    "Ordres de fabrication": ("ordres_fabrication", "ordres_fabrication"),
+    "Ressources humaines": ("ressources_humaines", "ressources_humaines"),
+    "Qualité": ("defauts", "qualite"),
+    "Équipements": ("equipements", "equipements"),
+}
+
+# Format -> (extension, type MIME)
+EXPORT_FORMATS = {
+    "CSV compressé (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# Colonne filtrée par la période choisie, par table (les autres tables sont exportées en entier)
+DATE_COLUMNS = {
+    "ordres_fabrication": "date_debut",
+    "defauts": "date",
+}
+CHUNK_SIZE = 1000
+
+
+def iter_chunks(client, table, date_range=None, chunk_size=CHUNK_SIZE):
+    """Lit la table par tranches de chunk_size lignes, filtre de dates appliqué par la base."""
+    sample = client.table(table).select("*").limit(1).execute().data
+    if not sample:
+        return
+    columns = sample[0].keys()
+    date_column = DATE_COLUMNS.get(table)
+
+    def make_query():
+        query = client.table(table).select("*")
+        if date_range and date_column in columns:
+            start_date, end_date = date_range
+            query = query.gte(date_column, start_date.isoformat())
+            query = query.lt(date_column, (end_date + datetime.timedelta(days=1)).isoformat())
+        # Un ordre stable est indispensable pour paginer sans doublon
+        if "id" in columns:
+            query = query.order("id")
+        return query
+
+    # Pagination par clé (id > dernier id lu) : une écriture concurrente ne
+    # décale pas les pages suivantes, contrairement à un décalage range()
+    start, last_id = 0, None
+    while True:
+        if "id" in columns:
+            query = make_query()
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            data = query.limit(chunk_size).execute().data
+        else:
+            data = make_query().range(start, start + chunk_size - 1).execute().data
+        if data:
+            yield pd.DataFrame(data)
+        if len(data) < chunk_size:
+            return
+        start += chunk_size
+        last_id = data[-1].get("id")
+
+
+def write_csv_gz(chunks, fileobj):
+    with gzip.GzipFile(fileobj=fileobj, mode="wb") as gz:
+        with io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(text, index=False, header=header)
+                header = False
+
+
+def write_parquet(chunks, fileobj, table):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                # Schéma déclaré de la table (schemas.py), pas celui déduit de la
+                # première tranche : une colonne vide ou aux valeurs entières
+                # n'y fixe pas un type que les tranches suivantes contrediraient
+                writer = pq.ParquetWriter(fileobj, arrow_schema(table, chunk.columns), compression="zstd")
+            data = pa.Table.from_pandas(export_frame(chunk, table)[writer.schema.names], schema=writer.schema,
+                                        preserve_index=False, safe=True)
+            writer.write_table(data)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_table(client, table, export_format, date_range=None):
+    """Écrit l'export (par tranches) dans un fichier temporaire et renvoie ce fichier.
+
+    Le fichier est rendu tel quel (non bufferisé, que st.download_button
+    accepte) : il n'est lu qu'une fois, par Streamlit, et supprimé à sa
+    fermeture.
+    """
+    output = tempfile.TemporaryFile(buffering=0)
+    try:
+        chunks = iter_chunks(client, table, date_range)
+        if export_format == "Parquet":
+            write_parquet(chunks, output, table)
+        else:
+            write_csv_gz(chunks, output)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
@@ -0,0 +1,305 @@
+import atexit
+import bisect
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes de durée (secondes, convention Prometheus)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nombre de mesures récentes conservées pour les percentiles du panneau admin
+RING_SIZE = int(os.environ.get("MES_METRICS_RING", 5000))
+
+# Taille du dernier corps de réponse HTTP lu par ce thread (voir record_response_size)
+_last_response = threading.local()
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes : nombre, somme, comptes par borne."""
+
+    __slots__ = ("counts", "count", "sum", "rows", "bytes")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def observe(self, seconds, rows=0, size=0):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.rows += rows
+        self.bytes += size
+
+
+class Metrics:
+    """Mesures des requêtes et du rendu des pages, partagées par les sessions.
+
+    Chaque mesure alimente un histogramme par série (type, libellés) et un
+    tampon circulaire des dernières mesures ; le coût d'une mesure est de
+    quelques microsecondes (un verrou, un bisect, un append).
+    """
+
+    def __init__(self, ring_size=RING_SIZE, process=None):
+        # process : libellé ajouté à toutes les séries exportées, pour que
+        # les fichiers de plusieurs processus ne se contredisent pas
+        self.process = process
+        self.histograms = {}
+        self.recent = deque(maxlen=ring_size)
+        self._lock = threading.Lock()
+
+    def observe(self, kind, labels, seconds, rows=0, size=0):
+        key = (kind, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds, rows, size)
+            self.recent.append((time.time(), kind, labels, seconds, rows, size))
+
+    @contextmanager
+    def timed(self, kind, labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(kind, labels, time.perf_counter() - t0)
+
+    def summary(self, kind):
+        """Tableau par série : appels, percentiles récents (ms), lignes et octets."""
+        import numpy as np
+
+        with self._lock:
+            recent = [r for r in self.recent if r[1] == kind]
+            totals = {labels: (h.count, h.sum, h.rows, h.bytes) for (k, labels), h in self.histograms.items() if k == kind}
+        durations = {}
+        for _, _, labels, seconds, _, _ in recent:
+            durations.setdefault(labels, []).append(seconds)
+        rows = []
+        for labels, (count, total, n_rows, n_bytes) in totals.items():
+            sample = np.array(durations.get(labels, [np.nan])) * 1000
+            rows.append({
+                "série": " / ".join(value for _, value in labels),
+                "appels": count,
+                "moyenne ms": total / count * 1000,
+                "p50 ms": np.nanpercentile(sample, 50) if len(sample) else np.nan,
+                "p95 ms": np.nanpercentile(sample, 95) if len(sample) else np.nan,
+                "lignes": n_rows,
+                "octets": n_bytes,
+            })
+        return sorted(rows, key=lambda r: -r["moyenne ms"] * r["appels"])
+
+    def slowest(self, n=10):
+        with self._lock:
+            recent = list(self.recent)
+        recent.sort(key=lambda r: -r[3])
+        return [
+            {
+                "heure": time.strftime("%H:%M:%S", time.localtime(ts)),
+                "type": kind,
+                "série": " / ".join(value for _, value in labels),
+                "durée ms": seconds * 1000,
+                "lignes": rows,
+            }
+            for ts, kind, labels, seconds, rows, _ in recent[:n]
+        ]
+
+    def to_prometheus(self):
+        """Export au format texte Prometheus (histogrammes et compteurs)."""
+        with self._lock:
+            items = [(k, labels, list(h.counts), h.count, h.sum, h.rows, h.bytes) for (k, labels), h in self.histograms.items()]
+        lines = []
+        seen = set()
+        # Compteurs des appels Supabase : une famille contiguë chacun, après les histogrammes
+        counters = {"mes_supabase_rows_total": [], "mes_supabase_response_bytes_total": []}
+        for kind, labels, counts, count, total, n_rows, n_bytes in sorted(items):
+            if self.process is not None:
+                labels = labels + (("process", self.process),)
+            name = f"mes_{kind}_duration_seconds"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{label_text}{"," if label_text else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label_text}}} {total:.6f}")
+            lines.append(f"{name}_count{{{label_text}}} {count}")
+            if kind == "supabase":
+                counters["mes_supabase_rows_total"].append(f"mes_supabase_rows_total{{{label_text}}} {n_rows}")
+                counters["mes_supabase_response_bytes_total"].append(
+                    f"mes_supabase_response_bytes_total{{{label_text}}} {n_bytes}"
+                )
+        for name, samples in counters.items():
+            if samples:
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Écriture atomique, pour le collecteur textfile de node_exporter
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Mesures du processus, créées au premier appel.
+
+    Les exports Prometheus démarrent selon l'environnement : fichier
+    MES_METRICS_FILE et/ou endpoint /metrics sur MES_METRICS_PORT (écoute
+    sur MES_METRICS_HOST, 127.0.0.1 par défaut). Avec plusieurs processus
+    Streamlit, chacun écrit son propre fichier (suffixé par son pid, séries
+    libellées process=<pid>) et seul le premier obtient le port.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            path = os.environ.get("MES_METRICS_FILE")
+            _metrics = Metrics(process=str(os.getpid()) if path else None)
+            if path:
+                root, extension = os.path.splitext(path)
+                start_file_exporter(_metrics, f"{root}-{os.getpid()}{extension}")
+            if os.environ.get("MES_METRICS_PORT"):
+                try:
+                    start_http_exporter(_metrics, int(os.environ["MES_METRICS_PORT"]),
+                                        os.environ.get("MES_METRICS_HOST", "127.0.0.1"))
+                except OSError as e:
+                    # Port déjà pris par un autre processus : pas d'endpoint ici
+                    logger.warning("Export /metrics désactivé : %s", e)
+        return _metrics
+
+
+# Mesure des appels au client Supabase
+def record_response_size(response):
+    """Hook de réponse httpx : mémorise la taille du corps pour la mesure en cours."""
+    response.read()
+    _last_response.size = len(response.content)
+
+
+class _InstrumentedQuery:
+    # Enveloppe un constructeur de requêtes : les méthodes chaînées renvoient
+    # l'enveloppe, execute() est chronométré
+    __slots__ = ("_query", "_metrics", "_table", "_operation")
+
+    def __init__(self, query, metrics, table, operation="select"):
+        self._query = query
+        self._metrics = metrics
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+        operation = name if name in ("select", "insert", "update", "upsert", "delete") else self._operation
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._metrics, self._table, operation)
+            return result
+        return call
+
+    def execute(self):
+        # Les échecs (délais, erreurs) sont mesurés aussi, sous status="error"
+        _last_response.size = 0
+        t0 = time.perf_counter()
+        status, rows = "error", 0
+        try:
+            response = self._query.execute()
+            data = getattr(response, "data", None)
+            status, rows = "ok", len(data) if isinstance(data, list) else 0
+            return response
+        finally:
+            self._metrics.observe(
+                "supabase",
+                (("table", self._table), ("operation", self._operation), ("status", status)),
+                time.perf_counter() - t0,
+                rows=rows,
+                size=_last_response.size,
+            )
+
+
+class InstrumentedClient:
+    """Client Supabase (ou LocalClient) dont chaque requête est mesurée."""
+
+    def __init__(self, client, metrics):
+        self._client = client
+        self._metrics = metrics
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), self._metrics, name)
+
+    def rpc(self, name, params=None):
+        return _InstrumentedQuery(self._client.rpc(name, params), self._metrics, name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# Exposition des mesures
+def start_file_exporter(metrics, path, interval=15.0):
+    """Réécrit périodiquement le fichier Prometheus (thread démon), supprimé à la sortie."""
+    atexit.register(_remove_file, path)
+
+    def loop():
+        while True:
+            try:
+                metrics.write_prometheus(path)
+            except OSError:
+                pass
+            time.sleep(interval)
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def start_http_exporter(metrics, port, host="127.0.0.1"):
+    """Sert /metrics au format Prometheus sur le port donné (thread démon)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,177 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dates import to_datetime
+from table_cache import diff_rows, fill_category
+
+HOURS_PER_DAY = 8
+ROLLUP_COLUMNS = ["n_termines", "temps_standard", "temps_reel", "n_a_l_heure", "n_defauts"]
+# Colonnes de date possibles pour la table defauts, par ordre de préférence
+DEFECT_DATE_COLUMNS = ["date", "date_declaration", "created_at"]
+PERIODS = {"Jour": 1, "Semaine": 7, "Mois": 30}
+
+
+def _empty_rollups():
+    index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=object)], names=["jour", "poste"])
+    return pd.DataFrame(0.0, index=index, columns=ROLLUP_COLUMNS)
+
+
+def of_contributions(ofs):
+    """Contribution de chaque OF terminé aux agrégats (jour de fin, poste)."""
+    if ofs.empty or not {"statut", "date_fin"}.issubset(ofs.columns):
+        return pd.DataFrame(columns=["jour", "poste"] + ROLLUP_COLUMNS)
+    date_fin = to_datetime(ofs["date_fin"])
+    done = ofs["statut"].eq("Terminé").to_numpy() & date_fin.notna().to_numpy()
+    ofs, date_fin = ofs[done], date_fin[done]
+
+    temps_standard = pd.to_numeric(ofs.get("temps_standard"), errors="coerce").fillna(0.0)
+    temps_reel = pd.to_numeric(ofs.get("temps_reel"), errors="coerce").fillna(0.0)
+    # Fin prévue : date de début + temps standard réparti en journées de HOURS_PER_DAY
+    date_debut = to_datetime(ofs["date_debut"]) if "date_debut" in ofs.columns else pd.Series(pd.NaT, index=ofs.index)
+    plan_days = np.ceil(temps_standard.to_numpy() / HOURS_PER_DAY).clip(min=1)
+    plan_fin = date_debut.dt.normalize() + pd.to_timedelta(plan_days, unit="D")
+
+    return pd.DataFrame({
+        "jour": date_fin.dt.normalize(),
+        "poste": fill_category(ofs["poste"], "Non spécifié") if "poste" in ofs.columns else "Non spécifié",
+        "n_termines": 1.0,
+        # Seuls les OF avec un temps réel comptent dans la productivité
+        "temps_standard": temps_standard.where(temps_reel > 0, 0.0),
+        "temps_reel": temps_reel,
+        "n_a_l_heure": (date_fin < plan_fin).astype(float),
+        "n_defauts": 0.0,
+    }, index=ofs.index)
+
+
+def defect_contributions(defects):
+    date_column = next((c for c in DEFECT_DATE_COLUMNS if c in defects.columns), None)
+    if defects.empty or date_column is None:
+        return pd.DataFrame(columns=["jour", "poste"] + ROLLUP_COLUMNS)
+    jour = to_datetime(defects[date_column]).dt.normalize()
+    contrib = pd.DataFrame(0.0, index=defects.index, columns=ROLLUP_COLUMNS)
+    contrib["n_defauts"] = 1.0
+    contrib.insert(0, "poste", fill_category(defects["poste"], "Non spécifié") if "poste" in defects.columns else "Non spécifié")
+    contrib.insert(0, "jour", jour)
+    return contrib[jour.notna()]
+
+
+def _rollup(contrib):
+    if contrib.empty:
+        return _empty_rollups()
+    return contrib.groupby(["jour", "poste"], sort=False)[ROLLUP_COLUMNS].sum()
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator * 100 if denominator else None
+
+
+class KPIEngine:
+    """Agrégats journaliers par poste, tenus à jour incrémentalement.
+
+    ``update`` compare l'empreinte de chaque ligne (par id) à celle du
+    dernier passage : seules les lignes ajoutées, modifiées ou supprimées
+    sont retirées puis réinjectées dans les agrégats. Le tableau de bord
+    ne lit ensuite que ``rollups``.
+
+    ``revision`` identifie les données passées (révisions des entrées du
+    cache, TableCache.revision) : tant qu'elle ne change pas, ``update``
+    ne recalcule même pas les empreintes.
+    """
+
+    def __init__(self):
+        self.rollups = _empty_rollups()
+        self._sources = {}
+        self._revision = None
+        self._lock = threading.Lock()
+
+    def update(self, ofs, defects, revision=None):
+        with self._lock:
+            if revision is not None and None not in revision and revision == self._revision:
+                return
+            self._apply("ordres_fabrication", ofs, of_contributions)
+            self._apply("defauts", defects, defect_contributions)
+            self._revision = revision
+
+    def _apply(self, name, df, contributions):
+        if df.empty or "id" not in df.columns:
+            # Sans identifiant, pas de suivi ligne à ligne : on reconstruit
+            # (empreintes None : contributions indexées par position de ligne)
+            _, old_contrib = self._sources.get(name, (None, None))
+            if old_contrib is not None:
+                self.rollups = self.rollups.sub(_rollup(old_contrib), fill_value=0)
+            contrib = contributions(df)
+            self.rollups = self.rollups.add(_rollup(contrib), fill_value=0)
+            self._sources[name] = (None, contrib)
+            self._prune()
+            return
+
+        df = df.drop_duplicates("id", keep="last")
+        old_hashes, old_contrib = self._sources.get(name, (pd.Series(dtype="uint64"), None))
+        if old_hashes is None:
+            # Le passage précédent était sans id : ses contributions ne se
+            # rapprochent pas des ids, on les retire toutes
+            if old_contrib is not None:
+                self.rollups = self.rollups.sub(_rollup(old_contrib), fill_value=0)
+            old_hashes, old_contrib = pd.Series(dtype="uint64"), None
+        hashes, changed_ids, stale_ids = diff_rows(df, old_hashes)
+        if changed_ids.empty and stale_ids.empty:
+            return
+
+        new_contrib = contributions(df.set_index("id").loc[changed_ids])
+        if old_contrib is not None and not stale_ids.empty:
+            removed = old_contrib[old_contrib.index.isin(stale_ids)]
+            self.rollups = self.rollups.sub(_rollup(removed), fill_value=0)
+            old_contrib = old_contrib[~old_contrib.index.isin(stale_ids)]
+        self.rollups = self.rollups.add(_rollup(new_contrib), fill_value=0)
+        contrib = new_contrib if old_contrib is None else pd.concat([old_contrib, new_contrib])
+        self._sources[name] = (hashes, contrib)
+        self._prune()
+
+    def _prune(self):
+        # Supprime les cellules revenues à zéro (OF supprimés ou déplacés)
+        self.rollups = self.rollups[self.rollups.abs().sum(axis=1) > 1e-9]
+
+    def totals(self, start, end, poste=None):
+        jours = self.rollups.index.get_level_values("jour")
+        mask = (jours >= start) & (jours < end)
+        if poste is not None:
+            mask &= self.rollups.index.get_level_values("poste") == poste
+        return self.rollups[mask].sum()
+
+    def period_kpis(self, start, end, capacity_hours_per_day=None):
+        t = self.totals(start, end)
+        days = max((end - start).days, 1)
+        capacity = capacity_hours_per_day * days if capacity_hours_per_day else 0
+        return {
+            "productivite": _ratio(t["temps_standard"], t["temps_reel"]),
+            "respect_delais": _ratio(t["n_a_l_heure"], t["n_termines"]),
+            "taux_retouche": _ratio(t["n_defauts"], t["n_termines"]),
+            "taux_occupation": _ratio(t["temps_reel"], capacity),
+        }
+
+    def compare(self, end, days, capacity_hours_per_day=None):
+        """KPI de la période [end - days, end) et de la période précédente."""
+        start = end - pd.Timedelta(days=days)
+        current = self.period_kpis(start, end, capacity_hours_per_day)
+        previous = self.period_kpis(start - pd.Timedelta(days=days), start, capacity_hours_per_day)
+        return current, previous
+
+    def productivity_by_poste(self, start, end):
+        jours = self.rollups.index.get_level_values("jour")
+        by_poste = self.rollups[(jours >= start) & (jours < end)].groupby(level="poste").sum()
+        by_poste = by_poste[by_poste["temps_reel"] > 0]
+        return (by_poste["temps_standard"] / by_poste["temps_reel"] * 100).round(1)
+
+
+def overrun_alerts(ofs, threshold=1.25):
+    # OF non terminés dont le temps réel dépasse threshold × temps standard
+    if ofs.empty or not {"temps_reel", "temps_standard"}.issubset(ofs.columns):
+        return ofs.iloc[0:0]
+    temps_reel = pd.to_numeric(ofs["temps_reel"], errors="coerce")
+    temps_standard = pd.to_numeric(ofs["temps_standard"], errors="coerce")
+    open_ofs = ofs["statut"].ne("Terminé") if "statut" in ofs.columns else True
+    overrun = open_ofs & (temps_reel > threshold * temps_standard)
+    # Plus gros dépassements d'abord
+    return ofs[overrun].assign(depassement=(temps_reel / temps_standard)[overrun]).sort_values("depassement", ascending=False)
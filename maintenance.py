@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from dates import to_datetime, utc_now
+
+MAINTENANCE_TABLE = "maintenances"
+FAILURE = "panne"
+MAINTENANCE = "maintenance"
+MAINTENANCE_COLUMNS = ["id", "machine", "type", "debut", "fin", "commentaire"]
+
+# La maintenance préventive est prévue à cette fraction du MTBF après la
+# dernière remise en service, pour intervenir avant la panne suivante
+PREVENTIVE_RATIO = 0.8
+
+NS_PER_HOUR = 3_600_000_000_000
+
+
+class MaintenanceLog:
+    """Pannes et maintenances triées par (machine, début).
+
+    Chaque machine occupe une tranche contiguë du tableau trié : l'historique
+    d'une machine sur une plage de dates est une recherche dichotomique
+    dans sa tranche, sans parcourir le journal.
+    """
+
+    def __init__(self, df):
+        if df.empty:
+            df = pd.DataFrame(columns=MAINTENANCE_COLUMNS)
+        df = df.assign(
+            machine=df["machine"].astype(str),
+            debut=to_datetime(df["debut"]),
+            fin=to_datetime(df["fin"]),
+        )
+        self.frame = df[df["debut"].notna()].sort_values(["machine", "debut"], kind="stable", ignore_index=True)
+        machine = self.frame["machine"].to_numpy()
+        self._debut = self.frame["debut"].to_numpy()
+        bounds = np.flatnonzero(np.r_[True, machine[1:] != machine[:-1], True]) if len(machine) else np.array([0])
+        self._slices = {machine[lo]: (lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])}
+
+    def machines(self):
+        return list(self._slices)
+
+    def history(self, machine, start=None, end=None):
+        """Événements de la machine dont le début est dans [start, end)."""
+        lo, hi = self._slices.get(machine, (0, 0))
+        debut = self._debut[lo:hi]
+        first = lo if start is None else lo + np.searchsorted(debut, np.datetime64(start), "left")
+        last = hi if end is None else lo + np.searchsorted(debut, np.datetime64(end), "left")
+        return self.frame.iloc[first:last]
+
+    def open_failures(self):
+        """Pannes en cours (sans date de fin), par machine."""
+        frame = self.frame
+        return frame[(frame["type"] == FAILURE) & frame["fin"].isna()].drop_duplicates("machine", keep="last").set_index("machine")
+
+    def reliability(self, now=None):
+        """MTBF, MTTR et prochaine maintenance par machine.
+
+        Calcul vectorisé sur les pannes consécutives d'une même machine :
+        le temps de bon fonctionnement est l'écart entre la remise en
+        service et la panne suivante. La prochaine maintenance est la
+        maintenance planifiée la plus proche, ou à défaut la date prévue
+        par l'historique (dernière remise en service, après panne ou
+        maintenance, + PREVENTIVE_RATIO × MTBF) ;
+        une machine dont la dernière panne est en cours n'a pas de prévision.
+        Les dates sont en heure naïve UTC (dates.to_datetime).
+        """
+        now = utc_now() if now is None else pd.Timestamp(now)
+        frame = self.frame
+        failures = frame[frame["type"] == FAILURE]
+        machine = failures["machine"].to_numpy()
+        debut = failures["debut"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        fin = failures["fin"].fillna(now).to_numpy().astype("datetime64[ns]").astype(np.int64)
+
+        same_next = np.r_[machine[1:] == machine[:-1], False]
+        next_debut = np.r_[debut[1:], 0]
+        uptime = np.where(same_next, (next_debut - fin) / NS_PER_HOUR, np.nan)
+        repair = np.where(failures["fin"].notna().to_numpy(), (fin - debut) / NS_PER_HOUR, np.nan)
+        stats = pd.DataFrame({
+            "machine": machine,
+            "n_pannes": 1,
+            "mtbf_h": np.clip(uptime, 0, None),
+            "mttr_h": repair,
+            "derniere_panne": failures["debut"].to_numpy(),
+        }).groupby("machine", sort=False).agg(
+            n_pannes=("n_pannes", "sum"),
+            mtbf_h=("mtbf_h", "mean"),
+            mttr_h=("mttr_h", "mean"),
+            derniere_panne=("derniere_panne", "max"),
+        )
+        # Remise en service de la dernière panne (triée par début), NaT si elle
+        # est en cours : "last" sauterait le NaT et prendrait la panne précédente
+        last = ~same_next
+        stats["remise_en_service"] = pd.Series(failures["fin"].to_numpy()[last], index=machine[last])
+
+        maintenances = frame[frame["type"] == MAINTENANCE]
+        done = maintenances[maintenances["debut"] <= now].groupby("machine", sort=False)["debut"].max()
+        planned = maintenances[maintenances["debut"] > now].groupby("machine", sort=False)["debut"].min()
+        # Le compte repart de la plus récente des remises en service : fin de
+        # la dernière panne ou fin de la dernière maintenance réalisée
+        done_end = (
+            maintenances[maintenances["debut"] <= now].assign(fin=lambda m: m["fin"].fillna(now))
+            .groupby("machine", sort=False)["fin"].max()
+        )
+        restart = stats["remise_en_service"]
+        restart = restart.where(restart.isna(), pd.concat([restart, done_end.reindex(restart.index)], axis=1).max(axis=1))
+        forecast = restart + pd.to_timedelta(stats["mtbf_h"] * PREVENTIVE_RATIO, unit="h")
+        # Une maintenance déjà en retard est due maintenant
+        forecast = forecast.where(forecast.isna() | (forecast > now), now)
+
+        result = stats.drop(columns="remise_en_service").reindex(stats.index.union(done.index).union(planned.index))
+        result["n_pannes"] = result["n_pannes"].fillna(0).astype(int)
+        result["derniere_maintenance"] = done
+        result["maintenance_planifiee"] = planned
+        result["maintenance_prevue"] = forecast
+        result["prochaine_maintenance"] = result[["maintenance_planifiee", "maintenance_prevue"]].min(axis=1)
+        return result.rename_axis("machine")
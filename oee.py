@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+
+from dates import to_datetime, utc_now
+from table_cache import fill_category
+
+# Vocabulaire de la colonne evenement (data/events.csv)
+STOP_EVENTS = {"arret", "panne"}
+RESTART_EVENTS = {"reprise"}
+RUN_START_EVENTS = {"debut"}
+RUN_END_EVENTS = {"fin"}
+GOOD_EVENTS = {"production"}
+SCRAP_EVENTS = {"rebut"}
+
+# Équipes : heure de début de chaque poste de 8 h
+SHIFTS = {"Matin": 6, "Après-midi": 14, "Nuit": 22}
+
+NS_PER_HOUR = 3_600_000_000_000
+
+
+def attach_machine(events, ofs=None):
+    """Ajoute la colonne machine aux événements.
+
+    Priorité à une colonne machine déjà présente, sinon machine ou poste de
+    l'OF (colonnes machine/Machine/poste de la liste des OF).
+    """
+    events = events.copy()
+    if "machine" in events.columns:
+        return events
+    events["machine"] = "Non affecté"
+    if ofs is None or ofs.empty:
+        return events
+    of_column = "numero_of" if "numero_of" in ofs.columns else "OF" if "OF" in ofs.columns else None
+    machine_column = next((c for c in ("machine", "Machine", "poste") if c in ofs.columns), None)
+    if of_column and machine_column:
+        mapping = ofs.drop_duplicates(of_column).set_index(of_column)[machine_column]
+        events["machine"] = fill_category(events["OF"].map(mapping), "Non affecté")
+    return events
+
+
+def _pair(events, open_kinds, close_kinds, until):
+    """Associe chaque ouverture à la fermeture suivante sur la même machine.
+
+    Les ouvertures répétées sont fusionnées ; une fermeture sans ouverture
+    est ignorée ; une ouverture non refermée court jusqu'à ``until``.
+    """
+    mask = events["evenement"].isin(open_kinds | close_kinds)
+    ev = events.loc[mask, ["machine", "OF", "t", "evenement"]].sort_values(["machine", "t"], kind="stable")
+    if ev.empty:
+        return pd.DataFrame({"machine": [], "OF": [], "start": [], "end": []})
+    is_open = ev["evenement"].isin(open_kinds).to_numpy()
+    machine = ev["machine"].to_numpy()
+    new_machine = np.r_[True, machine[1:] != machine[:-1]]
+    # Ne garder que les changements d'état (ouvert -> fermé -> ouvert...)
+    changed = new_machine | np.r_[True, is_open[1:] != is_open[:-1]]
+    ev, is_open, new_machine = ev[changed], is_open[changed], new_machine[changed]
+    t = ev["t"].to_numpy()
+    machine = ev["machine"].to_numpy()
+
+    next_same = np.r_[machine[1:] == machine[:-1], False]
+    next_t = np.r_[t[1:], 0]
+    starts = is_open
+    ends = np.where(next_same, next_t, until)
+    return pd.DataFrame({
+        "machine": machine[starts],
+        "OF": ev["OF"].to_numpy()[starts],
+        "start": t[starts],
+        "end": ends[starts],
+    })
+
+
+def merge_intervals(intervals):
+    """Fusionne les intervalles qui se chevauchent, par machine."""
+    if intervals.empty:
+        return intervals[["machine", "start", "end"]]
+    df = intervals.sort_values(["machine", "start"], kind="stable")
+    machine = df["machine"].to_numpy()
+    start, end = df["start"].to_numpy(), df["end"].to_numpy()
+    new_machine = np.r_[True, machine[1:] != machine[:-1]]
+    # Fin maximale vue jusqu'ici dans la machine (cummax par groupe)
+    running_end = df.groupby("machine", sort=False)["end"].cummax().to_numpy()
+    previous_end = np.r_[0, running_end[:-1]]
+    new_group = new_machine | (start > previous_end)
+    group = np.cumsum(new_group)
+    merged = pd.DataFrame({"machine": machine, "start": start, "end": end, "g": group})
+    return merged.groupby("g", sort=False).agg(machine=("machine", "first"), start=("start", "min"), end=("end", "max")).reset_index(drop=True)
+
+
+def intersect_intervals(a, b):
+    """Intersection, par machine, de deux ensembles d'intervalles fusionnés."""
+    pieces = []
+    for machine, group in a.groupby("machine", sort=False):
+        other = b[b["machine"] == machine]
+        if other.empty:
+            continue
+        a_start, a_end = group["start"].to_numpy(np.int64), group["end"].to_numpy(np.int64)
+        b_start, b_end = other["start"].to_numpy(np.int64), other["end"].to_numpy(np.int64)
+        # Intervalles de b qui chevauchent chaque intervalle de a : [lo, hi)
+        lo = np.searchsorted(b_end, a_start, side="right")
+        hi = np.searchsorted(b_start, a_end, side="left")
+        counts = np.maximum(hi - lo, 0)
+        ia = np.repeat(np.arange(len(a_start)), counts)
+        ib = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+        start = np.maximum(a_start[ia], b_start[ib])
+        end = np.minimum(a_end[ia], b_end[ib])
+        keep = end > start
+        pieces.append(pd.DataFrame({"machine": machine, "start": start[keep], "end": end[keep]}))
+    if not pieces:
+        return pd.DataFrame({"machine": [], "start": np.array([], np.int64), "end": np.array([], np.int64)})
+    return pd.concat(pieces, ignore_index=True)
+
+
+class IntervalIndex:
+    """Index d'intervalles disjoints par machine (bornes en ns).
+
+    ``covered(machine, t1, t2)`` renvoie la durée couverte entre t1 et t2 en
+    O(log n) grâce aux sommes cumulées des durées.
+    """
+
+    def __init__(self, merged):
+        self.machines = {}
+        for machine, group in merged.groupby("machine", sort=False):
+            starts = group["start"].to_numpy(np.int64)
+            ends = group["end"].to_numpy(np.int64)
+            order = np.argsort(starts)
+            starts, ends = starts[order], ends[order]
+            cumulative = np.r_[0, np.cumsum(ends - starts)]
+            self.machines[machine] = (starts, ends, cumulative)
+
+    def _covered_before(self, machine, t):
+        # Durée couverte avant chaque instant de t (vectorisé)
+        starts, ends, cumulative = self.machines[machine]
+        t = np.asarray(t, dtype=np.int64)
+        k = np.searchsorted(starts, t, side="right") - 1
+        inside = np.where(k >= 0, np.clip(t - starts[np.maximum(k, 0)], 0, (ends - starts)[np.maximum(k, 0)]), 0)
+        return np.where(k >= 0, cumulative[np.maximum(k, 0)] + inside, 0)
+
+    def covered(self, machine, t1, t2):
+        if machine not in self.machines:
+            return np.zeros(np.broadcast(np.asarray(t1), np.asarray(t2)).shape, dtype=np.int64)
+        return self._covered_before(machine, t2) - self._covered_before(machine, t1)
+
+    def intervals(self, machine, t1, t2):
+        if machine not in self.machines:
+            return pd.DataFrame({"start": [], "end": []})
+        starts, ends, _ = self.machines[machine]
+        i = np.searchsorted(ends, t1, side="right")
+        j = np.searchsorted(starts, t2, side="left")
+        return pd.DataFrame({
+            "start": pd.to_datetime(starts[i:j]),
+            "end": pd.to_datetime(ends[i:j]),
+        })
+
+
+class OEEModel:
+    """Arrêts, temps d'ouverture et quantités par machine à partir des événements.
+
+    TRS = disponibilité × performance × qualité :
+    - disponibilité : (temps d'ouverture - arrêts) / temps d'ouverture ;
+    - performance : temps de cycle idéal × quantité / temps de fonctionnement ;
+    - qualité : bonnes pièces / (bonnes pièces + rebuts).
+    Le temps d'ouverture est la durée des fenêtres debut/fin des OF, ou la
+    durée de la période si la machine n'en a aucune ; seuls les arrêts
+    compris dans ces fenêtres sont décomptés. Horodatages en naïf UTC.
+    """
+
+    def __init__(self, events, ofs=None, cycle_hours=None, until=None):
+        events = attach_machine(events, ofs)
+        events = events.assign(t=to_datetime(events["timestamp"]).to_numpy().astype("datetime64[ns]").astype(np.int64))
+        events = events[events["t"] > np.iinfo(np.int64).min]
+        until = pd.Timestamp(until or utc_now()).value
+
+        self.downtime = _pair(events, STOP_EVENTS, RESTART_EVENTS, until)
+        down = merge_intervals(self.downtime)
+        runs = merge_intervals(_pair(events, RUN_START_EVENTS, RUN_END_EVENTS, until))
+        # Arrêts limités aux fenêtres de fonctionnement des machines qui en ont
+        with_runs = down["machine"].isin(runs["machine"])
+        down = pd.concat([down[~with_runs], intersect_intervals(down[with_runs], runs)], ignore_index=True)
+        self.down_index = IntervalIndex(down)
+        self.run_index = IntervalIndex(runs)
+        self.machines = sorted(events["machine"].unique().tolist())
+
+        quantite = pd.to_numeric(events.get("quantite"), errors="coerce").fillna(0.0)
+        good = events["evenement"].isin(GOOD_EVENTS)
+        scrap = events["evenement"].isin(SCRAP_EVENTS)
+        cycle = events["OF"].map(cycle_hours).fillna(0.0) if cycle_hours is not None else pd.Series(0.0, index=events.index)
+        self.production = pd.DataFrame({
+            "machine": events["machine"],
+            "t": events["t"],
+            "good": np.where(good, quantite, 0.0),
+            "scrap": np.where(scrap, quantite, 0.0),
+            "ideal_ns": np.where(good | scrap, quantite * cycle * NS_PER_HOUR, 0.0),
+        })[good | scrap].sort_values("t")
+
+    def downtime_between(self, machine, t1, t2):
+        """Durée d'arrêt (Timedelta) d'une machine entre t1 et t2."""
+        return pd.Timedelta(int(self.down_index.covered(machine, pd.Timestamp(t1).value, pd.Timestamp(t2).value)))
+
+    def oee(self, bounds, machines=None):
+        """TRS par machine et par période ; bounds = bornes croissantes des périodes."""
+        bounds = pd.DatetimeIndex(bounds)
+        # Unité explicite : pandas 3 peut créer les bornes en µs
+        edges = bounds.as_unit("ns").asi8
+        length = np.diff(edges).astype(float)
+        rows = []
+        for machine in machines or self.machines:
+            down = np.diff(self.down_index._covered_before(machine, edges)) if machine in self.down_index.machines else np.zeros(len(length))
+            if machine in self.run_index.machines:
+                opening = np.diff(self.run_index._covered_before(machine, edges)).astype(float)
+            else:
+                opening = length
+            operating = np.clip(opening - down, 0, None)
+
+            prod = self.production[self.production["machine"] == machine]
+            bucket = np.searchsorted(edges, prod["t"].to_numpy(), side="right") - 1
+            valid = (bucket >= 0) & (bucket < len(length))
+            sums = {
+                column: np.bincount(bucket[valid], weights=prod[column].to_numpy()[valid], minlength=len(length))
+                for column in ("good", "scrap", "ideal_ns")
+            }
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                availability = np.where(opening > 0, operating / opening, np.nan)
+                performance = np.where(operating > 0, np.minimum(sums["ideal_ns"] / operating, 1.0), np.nan)
+                total = sums["good"] + sums["scrap"]
+                quality = np.where(total > 0, sums["good"] / total, np.nan)
+            rows.append(pd.DataFrame({
+                "machine": machine,
+                "debut": bounds[:-1],
+                "disponibilite": availability,
+                "performance": performance,
+                "qualite": quality,
+                "trs": availability * performance * quality,
+                "arret_h": down / NS_PER_HOUR,
+                "fonctionnement_h": operating / NS_PER_HOUR,
+            }))
+        return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+
+    def daily(self, start, end, machines=None):
+        return self.oee(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D"), machines)
+
+    def by_shift(self, start, end, machines=None):
+        day_bounds = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+        bounds = sorted({day + pd.Timedelta(hours=h) for day in day_bounds for h in SHIFTS.values()})
+        result = self.oee(bounds, machines)
+        hour_to_shift = {h: name for name, h in SHIFTS.items()}
+        result["equipe"] = result["debut"].dt.hour.map(hour_to_shift)
+        return result
+
+    def utilisation(self, start, end):
+        """Part du temps calendaire passée en fonctionnement, par machine (%)."""
+        edges = np.array([pd.Timestamp(start).value, pd.Timestamp(end).value])
+        span = float(edges[1] - edges[0])
+        result = {}
+        for machine in self.machines:
+            down = np.diff(self.down_index._covered_before(machine, edges))[0] if machine in self.down_index.machines else 0
+            if machine in self.run_index.machines:
+                opening = np.diff(self.run_index._covered_before(machine, edges))[0]
+            else:
+                opening = span
+            result[machine] = max(opening - down, 0) / span * 100
+        return pd.Series(result, name="utilisation")
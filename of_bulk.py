@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+OF_TABLE = "ordres_fabrication"
+BATCH_SIZE = 500
+
+# Colonnes de data/of_list.csv -> colonnes de ordres_fabrication
+CSV_COLUMNS = {
+    "OF": "numero_of",
+    "Description": "description",
+    "Statut": "statut",
+    "Machine": "machine",
+    "QtePrevue": "quantite",
+    "QteRealisee": "quantite_realisee",
+}
+STATUT_MAPPING = {"En attente": "Planifié"}
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _json_value(value):
+    # Valeurs NumPy/pandas -> types JSON
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return value
+
+
+def _results(keys, ok_keys, key_name, ok_message, error_message):
+    ok_keys = set(ok_keys)
+    return pd.DataFrame({
+        key_name: list(keys),
+        "ok": [k in ok_keys for k in keys],
+        "message": [ok_message if k in ok_keys else error_message for k in keys],
+    })
+
+
+def upsert_ofs(client, rows, on_conflict="numero_of"):
+    """Crée ou met à jour des OF par lots ; renvoie (lignes écrites, résultat par ligne).
+
+    Si un lot est refusé, ses lignes sont renvoyées une à une pour isoler
+    celles en erreur.
+    """
+    rows = [{k: _json_value(v) for k, v in row.items()} for row in rows]
+    written, results = [], []
+    for chunk in _chunks(rows):
+        try:
+            data = client.table(OF_TABLE).upsert(chunk, on_conflict=on_conflict).execute().data
+            written.extend(data)
+            results.append(_results([r.get(on_conflict) for r in chunk], [r.get(on_conflict) for r in data],
+                                    on_conflict, "enregistré", "non renvoyé par la base"))
+        except Exception:
+            for row in chunk:
+                try:
+                    data = client.table(OF_TABLE).upsert(row, on_conflict=on_conflict).execute().data
+                    written.extend(data)
+                    results.append(_results([row.get(on_conflict)], [row.get(on_conflict)], on_conflict, "enregistré", ""))
+                except Exception as e:
+                    results.append(pd.DataFrame({on_conflict: [row.get(on_conflict)], "ok": [False], "message": [str(e)]}))
+    result = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=[on_conflict, "ok", "message"])
+    return written, result
+
+
+def terminate_ofs(client, ids):
+    """Passe une sélection d'OF à « Terminé ».
+
+    Contrôle optimiste : la mise à jour ne touche que les OF qui ne sont pas
+    déjà terminés (OF sans statut compris) ; les autres sont signalés dans le
+    résultat. Renvoie les lignes effectivement modifiées.
+    """
+    ids = [_json_value(i) for i in ids]
+    update = {"statut": "Terminé", "date_fin": pd.Timestamp.now().isoformat(), "progression": 100}
+    written = []
+    for chunk in _chunks(ids):
+        written.extend(
+            # neq seul exclurait les OF sans statut (NULL)
+            client.table(OF_TABLE).update(update).in_("id", chunk)
+            .or_("statut.is.null,statut.neq.Terminé").execute().data
+        )
+    result = _results(ids, [row["id"] for row in written], "id", "terminé", "déjà terminé ou supprimé")
+    return written, result
+
+
+def delete_ofs(client, ids):
+    ids = [_json_value(i) for i in ids]
+    deleted = []
+    for chunk in _chunks(ids):
+        deleted.extend(client.table(OF_TABLE).delete().in_("id", chunk).execute().data)
+    deleted_ids = [row["id"] for row in deleted]
+    return deleted_ids, _results(ids, deleted_ids, "id", "supprimé", "introuvable")
+
+
+def read_of_csv(fileobj):
+    """Lit un fichier d'OF planifiés (format data/of_list.csv ou colonnes de la table)."""
+    df = pd.read_csv(fileobj).rename(columns=CSV_COLUMNS)
+    if "numero_of" not in df.columns:
+        raise ValueError("Colonne OF (ou numero_of) manquante")
+    if "statut" in df.columns:
+        df["statut"] = df["statut"].replace(STATUT_MAPPING)
+    else:
+        df["statut"] = "Planifié"
+    df = df.dropna(subset=["numero_of"]).drop_duplicates("numero_of", keep="last")
+    return df.astype(object).where(df.notna(), None).to_dict("records")
@@ -0,0 +1,72 @@
+import pandas as pd
+
+from connection import is_missing_relation
+from of_sync import fetch_paginated
+
+OF_TABLE = "ordres_fabrication"
+
+# Colonnes proposées dans les filtres de la liste des OF
+FILTER_COLUMNS = ("statut", "poste")
+
+
+def build_of_query(client, statuts=None, postes=None, columns="*", count=None):
+    # Les filtres sont traduits en clauses PostgREST (statut=in.(...)) pour
+    # que seule la sélection voyage sur le réseau
+    query = client.table(OF_TABLE).select(columns, count=count)
+    if statuts is not None:
+        query = query.in_("statut", list(statuts))
+    if postes is not None:
+        query = query.in_("poste", list(postes))
+    return query
+
+
+def fetch_of_page(client, statuts=None, postes=None, page=0, page_size=50,
+                  order_by="priorite", descending=True):
+    """Renvoie (DataFrame de la page, nombre total d'OF correspondant aux filtres)."""
+    start = page * page_size
+    query = build_of_query(client, statuts, postes, count="exact")
+    # L'id sert de départage pour que la pagination reste stable
+    query = query.order(order_by, desc=descending).order("id", desc=descending)
+    response = query.range(start, start + page_size - 1).execute()
+    total = response.count if response.count is not None else len(response.data)
+    return pd.DataFrame(response.data), total
+
+
+def fetch_distinct_values(client, column):
+    # La fonction SQL of_distinct_values (voir sql/of_distinct_values.sql)
+    # renvoie directement les valeurs distinctes ; si elle n'est pas
+    # installée, on lit la colonne demandée page par page
+    if column not in FILTER_COLUMNS:
+        raise ValueError(f"Colonne de filtre inconnue: {column}")
+    try:
+        data = client.rpc("of_distinct_values", {"col": column}).execute().data
+        values = [row["valeur"] for row in data]
+    except Exception as e:
+        if not is_missing_relation(e):
+            raise
+        data = fetch_paginated(lambda: client.table(OF_TABLE).select(column).order("id"))
+        values = [row[column] for row in data]
+    return sorted({value for value in values if value is not None})
+
+
+def of_page_from_frame(df, statuts=None, postes=None, page=0, page_size=50,
+                       order_by="priorite", descending=True):
+    """Même résultat que fetch_of_page, calculé sur une table déjà en mémoire (instantané partagé)."""
+    mask = pd.Series(True, index=df.index)
+    if statuts is not None:
+        mask &= df["statut"].isin(list(statuts))
+    if postes is not None:
+        mask &= df["poste"].isin(list(postes))
+    selection = df[mask]
+    if order_by in selection.columns:
+        selection = selection.sort_values([order_by, "id"], ascending=not descending, na_position="first" if descending else "last")
+    start = page * page_size
+    return selection.iloc[start:start + page_size].reset_index(drop=True), len(selection)
+
+
+def distinct_values_from_frame(df, column):
+    if column not in FILTER_COLUMNS:
+        raise ValueError(f"Colonne de filtre inconnue: {column}")
+    if column not in df.columns:
+        return []
+    return sorted({value for value in df[column].dropna().unique()})
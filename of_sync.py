@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pandas as pd
+
+from connection import is_missing_relation
+from table_cache import drop_rows, upsert_rows
+
+# PostgREST plafonne le nombre de lignes par réponse (1000 par défaut)
+PAGE_SIZE = 1000
+# Identifiants par filtre in_ : l'URL de la requête reste courte
+ID_CHUNK_SIZE = 200
+# updated_at = now() est l'heure de début de la transaction : une transaction
+# validée après une plus récente porte un horodatage antérieur au watermark.
+# Les deltas relisent donc cette marge (secondes) avant le watermark
+LOOKBACK_SECONDS = 120
+
+
+def fetch_paginated(make_query, page_size=PAGE_SIZE):
+    # make_query() doit renvoyer une requête ordonnée de façon stable
+    rows = []
+    start = 0
+    while True:
+        data = make_query().range(start, start + page_size - 1).execute().data
+        rows.extend(data)
+        if len(data) < page_size:
+            return rows
+        start += page_size
+
+
+def fetch_by_ids(make_query, ids, key="id", chunk_size=ID_CHUNK_SIZE):
+    # Lignes des ids demandés, par paquets de chunk_size (chaque paquet paginé)
+    ids = list(ids)
+    rows = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows.extend(fetch_paginated(lambda chunk=chunk: make_query().in_(key, chunk).order(key)))
+    return rows
+
+
+def _before(watermark, seconds):
+    return (pd.Timestamp(watermark) - pd.Timedelta(seconds=seconds)).isoformat()
+
+
+class DeltaSync:
+    """Copie locale d'une table, tenue à jour par delta sur updated_at.
+
+    Le premier appel à ``refresh`` charge toute la table ; les suivants ne
+    demandent que les lignes modifiées depuis le dernier ``updated_at`` vu,
+    moins ``lookback`` secondes (transactions validées en retard).
+    Les suppressions sont lues dans la table de tombstones si elle existe
+    (voir sql/of_delta_sync.sql) et, dans tous les cas, un rapprochement
+    complet des identifiants est fait toutes les ``reconcile_every`` secondes :
+    les lignes disparues sont retirées, celles qui manquent encore relues.
+    """
+
+    def __init__(self, client, table, key="id", watermark_column="updated_at",
+                 tombstone_table=None, reconcile_every=600, lookback=LOOKBACK_SECONDS):
+        self.client = client
+        self.table = table
+        self.key = key
+        self.watermark_column = watermark_column
+        self.tombstone_table = tombstone_table
+        self.reconcile_every = reconcile_every
+        self.lookback = lookback
+        self.frame = pd.DataFrame()
+        self.watermark = None
+        self.tombstone_watermark = None
+        self.last_reconcile = 0.0
+        self.rows_fetched = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            if self.watermark is None:
+                self._full_load()
+            else:
+                self._pull_changes()
+                self._pull_tombstones()
+                if time.monotonic() - self.last_reconcile > self.reconcile_every:
+                    self._reconcile()
+            return self.frame
+
+    def _full_load(self):
+        rows = fetch_paginated(
+            lambda: self.client.table(self.table).select("*").order(self.key)
+        )
+        self.rows_fetched += len(rows)
+        self.frame = pd.DataFrame(rows)
+        self.watermark = self._max_watermark(self.frame)
+        self.tombstone_watermark = self._latest_tombstone()
+        self.last_reconcile = time.monotonic()
+
+    def _latest_tombstone(self):
+        # Les watermarks viennent des horodatages de la base, jamais de
+        # l'horloge locale (décalage d'horloge = suppressions manquées)
+        if not self.tombstone_table:
+            return None
+        try:
+            rows = (self.client.table(self.tombstone_table).select("supprime_le")
+                    .order("supprime_le", desc=True).limit(1).execute().data)
+        except Exception as e:
+            self._tombstones_failed(e)
+            return None
+        return rows[0]["supprime_le"] if rows else None
+
+    def _tombstones_failed(self, exc):
+        # Table de tombstones absente : le rapprochement périodique suffit ;
+        # toute autre erreur (délai, réseau) est retentée au prochain refresh
+        if is_missing_relation(exc):
+            self.tombstone_table = None
+
+    def _max_watermark(self, df):
+        if df.empty or self.watermark_column not in df.columns:
+            return None
+        return df[self.watermark_column].dropna().max()
+
+    def _pull_changes(self):
+        # Relecture de la marge avant le watermark : la fusion par id rend sans
+        # effet les lignes déjà connues
+        since = _before(self.watermark, self.lookback)
+        rows = fetch_paginated(
+            lambda: self.client.table(self.table).select("*")
+            .gte(self.watermark_column, since)
+            .order(self.watermark_column).order(self.key)
+        )
+        if rows:
+            self.rows_fetched += len(rows)
+            self.frame = upsert_rows(self.frame, rows, self.key)
+            self.watermark = max(self.watermark, self._max_watermark(pd.DataFrame(rows)))
+
+    def _pull_tombstones(self):
+        if not self.tombstone_table:
+            return
+        def make_query():
+            query = self.client.table(self.tombstone_table).select(f"{self.key},supprime_le")
+            if self.tombstone_watermark is not None:
+                query = query.gte("supprime_le", _before(self.tombstone_watermark, self.lookback))
+            return query.order("supprime_le").order(self.key)
+
+        try:
+            rows = fetch_paginated(make_query)
+        except Exception as e:
+            self._tombstones_failed(e)
+            return
+        if rows:
+            self.frame = drop_rows(self.frame, [row[self.key] for row in rows], self.key)
+            self.tombstone_watermark = max(row["supprime_le"] for row in rows)
+
+    def _reconcile(self):
+        rows = fetch_paginated(
+            lambda: self.client.table(self.table).select(self.key).order(self.key)
+        )
+        live_ids = {row[self.key] for row in rows}
+        known = set()
+        if not self.frame.empty and self.key in self.frame.columns:
+            self.frame = self.frame[self.frame[self.key].isin(live_ids)].reset_index(drop=True)
+            known = set(self.frame[self.key])
+        # Lignes présentes en base mais jamais reçues (delta manqué)
+        missing = sorted(live_ids - known)
+        if missing:
+            rows = fetch_by_ids(lambda: self.client.table(self.table).select("*"), missing, self.key)
+            self.rows_fetched += len(rows)
+            self.frame = upsert_rows(self.frame, rows, self.key)
+        self.last_reconcile = time.monotonic()
+
+    def unseen(self, rows):
+        """Lignes absentes de la copie ou dont le watermark diffère (pas encore appliquées)."""
+        with self._lock:
+            if self.frame.empty or self.watermark_column not in self.frame.columns:
+                return list(rows)
+            known = dict(zip(self.frame[self.key], self.frame[self.watermark_column]))
+        return [row for row in rows if known.get(row[self.key]) != row.get(self.watermark_column)]
+
+    def known_ids(self, ids):
+        with self._lock:
+            if self.frame.empty or self.key not in self.frame.columns:
+                return []
+            return self.frame.loc[self.frame[self.key].isin(list(ids)), self.key].tolist()
+
+    # Corrections locales après une écriture de la session courante
+    def apply(self, rows):
+        with self._lock:
+            self.frame = upsert_rows(self.frame, rows, self.key)
+
+    def remove(self, ids):
+        with self._lock:
+            self.frame = drop_rows(self.frame, ids, self.key)
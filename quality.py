@@ -0,0 +1,310 @@
+import threading
+import uuid
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from dates import to_datetime
+from kpi import DEFECT_DATE_COLUMNS
+from schemas import clean_text
+from table_cache import diff_rows, fill_category
+
+DEFECT_TABLE = "defauts"
+GRAVITES = ["Mineure", "Moyenne", "Majeure"]
+# Axes d'analyse du Pareto : libellé -> colonne
+PARETO_DIMENSIONS = {"Type de défaut": "type_defaut", "Poste": "poste", "Gravité": "gravite"}
+UNSPECIFIED = "Non spécifié"
+
+# Règles appliquées aux cartes de contrôle : Western Electric (1 à 4),
+# complétées par la règle de tendance de Nelson (5)
+RULES = {
+    1: "1 point au-delà de 3σ",
+    2: "2 points sur 3 au-delà de 2σ (même côté)",
+    3: "4 points sur 5 au-delà de 1σ (même côté)",
+    4: "9 points consécutifs du même côté",
+    5: "6 points consécutifs en hausse ou en baisse",
+}
+
+
+class Defect(NamedTuple):
+    date: str
+    numero_of: str
+    type_defaut: str
+    gravite: str
+    poste: Optional[str] = None
+    description: Optional[str] = None
+    action_corrective: Optional[str] = None
+    # Clé d'idempotence : un lot réécrit après un échec ne crée pas de doublon
+    cle: Optional[str] = None
+
+    def key(self):
+        return (self.date, self.numero_of, self.type_defaut, self.poste)
+
+
+def parse_defect(record):
+    """Valide une déclaration de défaut (dict) et la renvoie sous forme de Defect."""
+    date = record.get("date")
+    try:
+        date = pd.Timestamp.now() if date is None else pd.Timestamp(date)
+    except (TypeError, ValueError):
+        raise ValueError(f"Date invalide: {record.get('date')!r}")
+    if pd.isna(date):
+        raise ValueError("Date manquante")
+    numero_of = clean_text(record.get("numero_of"))
+    type_defaut = clean_text(record.get("type_defaut"))
+    gravite = clean_text(record.get("gravite"))
+    if not numero_of:
+        raise ValueError("Numéro d'OF manquant")
+    if not type_defaut:
+        raise ValueError("Type de défaut manquant")
+    if gravite not in GRAVITES:
+        raise ValueError(f"Gravité invalide: {gravite!r}")
+    return Defect(
+        date.isoformat(timespec="seconds"),
+        numero_of,
+        type_defaut,
+        gravite,
+        clean_text(record.get("poste")),
+        clean_text(record.get("description")),
+        clean_text(record.get("action_corrective")),
+        clean_text(record.get("cle")) or uuid.uuid4().hex,
+    )
+
+
+def defect_sink(client, on_written=None, table=DEFECT_TABLE):
+    # Un upsert par lot sur la clé d'idempotence : si un lot enregistré n'a pas
+    # été acquitté (délai dépassé), sa réécriture renvoie les mêmes lignes.
+    # on_written reçoit les lignes écrites (avec leur id)
+    def write(defects):
+        rows = client.table(table).upsert([defect._asdict() for defect in defects], on_conflict="cle").execute().data
+        if on_written is not None and rows:
+            on_written(rows)
+    return write
+
+
+def _dimension(df, column):
+    if column not in df.columns:
+        return pd.Series(UNSPECIFIED, index=df.index, dtype=object)
+    return fill_category(df[column], UNSPECIFIED).astype(object)
+
+
+def _quantity(df, column):
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors="coerce").fillna(0.0)
+
+
+def defect_contributions(defects):
+    """Une ligne par défaut daté : jour, poste, type, gravité, OF."""
+    columns = ["jour", "poste", "type_defaut", "gravite", "numero_of", "n_defauts"]
+    date_column = next((c for c in DEFECT_DATE_COLUMNS if c in defects.columns), None)
+    if defects.empty or date_column is None:
+        return pd.DataFrame(columns=columns)
+    contrib = pd.DataFrame({
+        "jour": to_datetime(defects[date_column]).dt.normalize(),
+        "poste": _dimension(defects, "poste"),
+        "type_defaut": _dimension(defects, "type_defaut"),
+        "gravite": _dimension(defects, "gravite"),
+        "numero_of": _dimension(defects, "numero_of"),
+        "n_defauts": 1.0,
+    }, index=defects.index)
+    return contrib[contrib["jour"].notna()]
+
+
+def production_contributions(ofs):
+    """Une ligne par OF terminé : jour de fin, poste, unités produites."""
+    columns = ["jour", "poste", "numero_of", "n_ofs", "unites"]
+    if ofs.empty or not {"statut", "date_fin"}.issubset(ofs.columns):
+        return pd.DataFrame(columns=columns)
+    date_fin = to_datetime(ofs["date_fin"])
+    done = ofs["statut"].eq("Terminé").to_numpy() & date_fin.notna().to_numpy()
+    ofs, date_fin = ofs[done], date_fin[done]
+    # Quantité réalisée si elle est renseignée, sinon quantité prévue
+    quantite = _quantity(ofs, "quantite")
+    realisee = _quantity(ofs, "quantite_realisee")
+    return pd.DataFrame({
+        "jour": date_fin.dt.normalize(),
+        "poste": _dimension(ofs, "poste"),
+        "numero_of": _dimension(ofs, "numero_of"),
+        "n_ofs": 1.0,
+        "unites": realisee.where(realisee > 0, quantite).astype(float),
+    }, index=ofs.index)
+
+
+class IncrementalRollup:
+    """Sommes groupées d'une table, tenues à jour ligne à ligne.
+
+    Comme pour ``KPIEngine``, l'empreinte de chaque ligne (par id) est
+    comparée au passage précédent : seules les lignes ajoutées, modifiées
+    ou supprimées sont retirées puis réinjectées dans les agrégats.
+    ``groupings`` associe un nom d'agrégat à ses colonnes de regroupement ;
+    seules les colonnes ``columns`` lues par ``contributions`` sont hachées.
+    """
+
+    def __init__(self, contributions, groupings, values, columns):
+        self.contributions = contributions
+        self.columns = columns
+        self.groupings = groupings
+        self.values = values
+        self.tables = {name: self._empty(keys) for name, keys in groupings.items()}
+        self._hashes = pd.Series(dtype="uint64")
+        self._contrib = None
+
+    def _empty(self, keys):
+        index = pd.MultiIndex.from_arrays([[] for _ in keys], names=keys) if len(keys) > 1 else pd.Index([], name=keys[0])
+        return pd.DataFrame(0.0, index=index, columns=self.values)
+
+    def _add(self, contrib, sign):
+        if contrib.empty:
+            return
+        for name, keys in self.groupings.items():
+            delta = contrib.groupby(keys, sort=False)[self.values].sum()
+            table = self.tables[name].add(delta * sign, fill_value=0)
+            # Cellules revenues à zéro (lignes supprimées ou déplacées)
+            self.tables[name] = table[table.abs().sum(axis=1) > 1e-9]
+
+    def update(self, df):
+        if df.empty or "id" not in df.columns:
+            # Sans identifiant, pas de suivi ligne à ligne : on reconstruit
+            self.tables = {name: self._empty(keys) for name, keys in self.groupings.items()}
+            self._contrib = self.contributions(df)
+            self._hashes = pd.Series(dtype="uint64")
+            self._add(self._contrib, 1)
+            return
+
+        df = df[["id"] + [c for c in self.columns if c in df.columns]].drop_duplicates("id", keep="last")
+        hashes, changed_ids, stale_ids = diff_rows(df, self._hashes)
+        if changed_ids.empty and stale_ids.empty:
+            return
+        new_contrib = self.contributions(df.set_index("id").loc[changed_ids])
+        old_contrib = self._contrib
+        if old_contrib is not None and not stale_ids.empty:
+            stale = old_contrib.index.isin(stale_ids)
+            self._add(old_contrib[stale], -1)
+            old_contrib = old_contrib[~stale]
+        self._add(new_contrib, 1)
+        self._contrib = new_contrib if old_contrib is None else pd.concat([old_contrib, new_contrib])
+        self._hashes = hashes
+
+
+def _between(table, start, end, poste=None):
+    jours = table.index.get_level_values("jour")
+    mask = (jours >= start) & (jours < end)
+    if poste is not None:
+        mask &= table.index.get_level_values("poste") == poste
+    return table[mask]
+
+
+class QualityEngine:
+    """Agrégats qualité (défauts et production), tenus à jour incrémentalement.
+
+    La page Qualité ne lit que les agrégats : Pareto, taux de défauts par
+    OF et cartes de contrôle restent immédiats quelle que soit la
+    profondeur de l'historique.
+    """
+
+    def __init__(self):
+        self.defects = IncrementalRollup(
+            defect_contributions,
+            {"jour": ["jour", "poste", "type_defaut", "gravite"], "of": ["numero_of"]},
+            ["n_defauts"],
+            DEFECT_DATE_COLUMNS + ["poste", "type_defaut", "gravite", "numero_of"],
+        )
+        self.production = IncrementalRollup(
+            production_contributions,
+            {"jour": ["jour", "poste"], "of": ["numero_of"]},
+            ["n_ofs", "unites"],
+            ["statut", "date_fin", "poste", "numero_of", "quantite", "quantite_realisee"],
+        )
+        self._lock = threading.Lock()
+
+    def update(self, defects, ofs):
+        with self._lock:
+            self.defects.update(defects)
+            self.production.update(ofs)
+
+    def pareto(self, dimension, start, end, poste=None):
+        """Défauts par valeur de dimension, décroissants, avec pourcentage cumulé."""
+        counts = _between(self.defects.tables["jour"], start, end, poste)
+        counts = counts.groupby(level=dimension)["n_defauts"].sum().sort_values(ascending=False)
+        counts = counts[counts > 0]
+        total = counts.sum()
+        result = pd.DataFrame({"n_defauts": counts.astype(int)})
+        result["pourcentage"] = counts / total * 100 if total else 0.0
+        result["cumul"] = result["pourcentage"].cumsum()
+        # Les quelques causes qui font 80 % des défauts (la première qui franchit le seuil comprise)
+        result["vital"] = result["cumul"].shift(fill_value=0) < 80
+        return result
+
+    def defect_rate_by_of(self, n=20):
+        """OF terminés ayant le plus de défauts pour 100 unités produites."""
+        defects = self.defects.tables["of"]["n_defauts"]
+        production = self.production.tables["of"]["unites"]
+        rates = pd.DataFrame({"n_defauts": defects, "unites": production.reindex(defects.index)}).dropna()
+        rates = rates[rates["unites"] > 0]
+        rates["defauts_pour_100"] = rates["n_defauts"] / rates["unites"] * 100
+        return rates.sort_values("defauts_pour_100", ascending=False).head(n)
+
+    def control_chart(self, kind, start, end, freq="D", poste=None):
+        """Carte p (proportion d'unités défectueuses) ou u (défauts par OF).
+
+        Un sous-groupe par période de ``freq`` : les défauts déclarés sur la
+        période rapportés aux unités (carte p) ou aux OF (carte u) terminés
+        sur la même période. Les limites varient avec la taille de chaque
+        sous-groupe ; les périodes sans production sont ignorées.
+        """
+        defects = _between(self.defects.tables["jour"], start, end, poste)
+        production = _between(self.production.tables["jour"], start, end, poste)
+        defects = defects.groupby(level="jour")["n_defauts"].sum()
+        production = production.groupby(level="jour")[["n_ofs", "unites"]].sum()
+        periods = pd.DataFrame({
+            "defauts": defects.resample(freq, label="left", closed="left").sum() if not defects.empty else pd.Series(dtype=float),
+            "n": production["unites" if kind == "p" else "n_ofs"].resample(freq, label="left", closed="left").sum() if not production.empty else pd.Series(dtype=float),
+        }).fillna(0.0)
+        periods = periods[periods["n"] > 0]
+        if periods.empty:
+            return periods.assign(valeur=[], centre=[], lci=[], lcs=[], regles=[])
+
+        if kind == "p":
+            # Chaque défaut compte pour une unité non conforme
+            nonconformes = periods["defauts"].clip(upper=periods["n"])
+            centre = nonconformes.sum() / periods["n"].sum()
+            valeur = nonconformes / periods["n"]
+            sigma = np.sqrt(centre * (1 - centre) / periods["n"])
+        else:
+            centre = periods["defauts"].sum() / periods["n"].sum()
+            valeur = periods["defauts"] / periods["n"]
+            sigma = np.sqrt(centre / periods["n"])
+        chart = periods.assign(
+            valeur=valeur,
+            centre=centre,
+            lci=(centre - 3 * sigma).clip(lower=0),
+            lcs=centre + 3 * sigma,
+        )
+        zscore = (valeur - centre) / sigma.where(sigma > 0)
+        chart["regles"] = out_of_control(zscore.fillna(0.0), valeur)
+        return chart
+
+
+def out_of_control(zscore, values):
+    """Numéros des règles de RULES enfreintes à chaque point ("" si aucune)."""
+    above, below = zscore > 0, zscore < 0
+
+    def count(flags, window):
+        return flags.astype(int).rolling(window, min_periods=window).sum()
+
+    diffs = np.sign(values.diff())
+    violations = {
+        1: zscore.abs() > 3,
+        2: (count(zscore > 2, 3) >= 2) | (count(zscore < -2, 3) >= 2),
+        3: (count(zscore > 1, 5) >= 4) | (count(zscore < -1, 5) >= 4),
+        4: (count(above, 9) == 9) | (count(below, 9) == 9),
+        # 6 points en hausse : 5 variations consécutives de même signe
+        5: (count(diffs > 0, 5) == 5) | (count(diffs < 0, 5) == 5),
+    }
+    labels = pd.Series("", index=zscore.index, dtype=object)
+    for rule, flags in violations.items():
+        flags = flags.fillna(False).to_numpy(dtype=bool)
+        labels[flags] = labels[flags].map(lambda text, rule=rule: f"{text}, {rule}" if text else str(rule))
+    return labels
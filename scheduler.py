@@ -0,0 +1,357 @@
+import bisect
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+
+from capacity import POSTES, skill_matrix
+from dates import to_datetime
+from kpi import HOURS_PER_DAY
+from simulation import SKILL_SPEED
+
+# Heure de prise de poste : le temps du planning est compté en heures
+# travaillées depuis le début de la journée de référence
+SHIFT_START_HOUR = 8
+
+
+class Timeline:
+    """Intervalles occupés d'un opérateur (OF planifiés et absences), triés."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.jobs = []
+
+    def earliest_slot(self, t, duration):
+        # Premier créneau libre de longueur `duration` commençant au plus tôt à t
+        i = bisect.bisect_right(self.ends, t)
+        if i == len(self.starts):
+            return t
+        while i < len(self.starts):
+            if t + duration <= self.starts[i]:
+                return t
+            t = max(t, self.ends[i])
+            i += 1
+        return t
+
+    def insert(self, start, end, job):
+        if job is None:
+            # Absences qui se chevauchent fusionnées : les intervalles restent
+            # disjoints, donc triés aussi par fin (bisect de earliest_slot)
+            i = bisect.bisect_left(self.ends, start)
+            while i < len(self.starts) and self.jobs[i] is None and self.starts[i] <= end:
+                start, end = min(start, self.starts[i]), max(end, self.ends[i])
+                del self.starts[i], self.ends[i], self.jobs[i]
+        i = bisect.bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.jobs.insert(i, job)
+
+    def remove(self, job):
+        i = self.jobs.index(job)
+        del self.starts[i], self.ends[i], self.jobs[i]
+
+    def overlapping(self, start, end):
+        return [j for s, e, j in zip(self.starts, self.ends, self.jobs) if s < end and e > start]
+
+
+class Scheduler:
+    """Ordonnancement à capacité finie des OF ouverts sur les opérateurs.
+
+    Chaque OF est affecté à un opérateur qualifié sur son poste ; la durée
+    est le reste à faire divisé par la vitesse du niveau de compétence.
+    La capacité d'un poste est celle de ses opérateurs qualifiés.
+
+    ``schedule`` répartit les OF par file de priorité (priorité décroissante,
+    puis date de début) en choisissant l'opérateur qui termine le plus tôt,
+    puis ``improve`` applique une recherche locale (échanges adjacents et
+    réaffectations) pour réduire le retard pondéré par la priorité.
+    ``replan`` et ``add_absence`` ne replanifient que les OF touchés.
+    Partagé entre sessions et thread du flux : toutes les lectures et
+    modifications passent par un verrou (réentrant).
+    """
+
+    def __init__(self, operators, skills, postes=POSTES, today=None):
+        self.today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        self.postes = list(postes)
+        self.operators = list(operators)
+        self.skills = np.asarray(skills)
+        self.timelines = [Timeline() for _ in self.operators]
+        # Opérateurs qualifiés par poste, meilleurs niveaux d'abord
+        self.qualified = [
+            sorted(np.flatnonzero(self.skills[:, p] > 0), key=lambda o: -self.skills[o, p])
+            for p in range(len(self.postes))
+        ]
+        self.jobs = {}
+        self.assignment = {}
+        # Absences prises en compte : (opérateur, premier jour, dernier jour)
+        self.absences = set()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_frames(cls, operators, today=None):
+        # Opérateurs réels uniquement (pas de tableau de démonstration) :
+        # sans opérateur, le planning est refusé
+        if operators.empty:
+            return cls([], np.zeros((0, len(POSTES)), dtype=np.int8), today=today)
+        names, skills = skill_matrix(operators)
+        return cls(names, skills, today=today)
+
+    # Données des OF
+    def _job(self, row):
+        temps_standard = pd.to_numeric(row.get("temps_standard"), errors="coerce")
+        progression = pd.to_numeric(row.get("progression"), errors="coerce")
+        temps_standard = 0.0 if pd.isna(temps_standard) else float(temps_standard)
+        progression = 0.0 if pd.isna(progression) else min(max(float(progression), 0.0), 100.0)
+        remaining = temps_standard * (1 - progression / 100)
+        date_debut = to_datetime(pd.Series([row.get("date_debut")])).iloc[0]
+        release_day = 0 if pd.isna(date_debut) else max((date_debut.normalize() - self.today).days, 0)
+        priority = pd.to_numeric(row.get("priorite"), errors="coerce")
+        poste = self.postes.index(row.get("poste")) if row.get("poste") in self.postes else -1
+        release = release_day * HOURS_PER_DAY
+        return {
+            "poste": poste,
+            "remaining": remaining,
+            "release": float(release),
+            "due": float(release + max(np.ceil(remaining / HOURS_PER_DAY), 1) * HOURS_PER_DAY),
+            "priority": 3.0 if pd.isna(priority) else float(priority),
+        }
+
+    def _is_open(self, row, job):
+        return row.get("statut") != "Terminé" and job["remaining"] > 0 and job["poste"] >= 0
+
+    # Placement
+    def _best_slot(self, job_id, exclude=None):
+        job = self.jobs[job_id]
+        best = None
+        for op in self.qualified[job["poste"]]:
+            if op == exclude:
+                continue
+            duration = job["remaining"] / SKILL_SPEED[self.skills[op, job["poste"]]]
+            start = self.timelines[op].earliest_slot(job["release"], duration)
+            if best is None or start + duration < best[2]:
+                best = (op, start, start + duration)
+        return best
+
+    def _place(self, job_id, op, start, end):
+        self.timelines[op].insert(start, end, job_id)
+        self.assignment[job_id] = (op, start, end)
+
+    def _unplace(self, job_id):
+        op, _, _ = self.assignment.pop(job_id)
+        self.timelines[op].remove(job_id)
+
+    def _dispatch(self, job_ids):
+        # File de priorité : priorité décroissante, puis date de disponibilité
+        heap = [(-self.jobs[j]["priority"], self.jobs[j]["release"], self.jobs[j]["due"], j) for j in job_ids]
+        heapq.heapify(heap)
+        while heap:
+            _, _, _, job_id = heapq.heappop(heap)
+            slot = self._best_slot(job_id)
+            if slot is not None:
+                self._place(job_id, *slot)
+
+    def schedule(self, ofs, absences=None, improve=True):
+        """Planifie tous les OF ouverts (DataFrame avec une colonne id).
+
+        ``absences`` remplace les absences connues ; par défaut, celles déjà
+        prises en compte (sync_absences, add_absence) sont conservées.
+        """
+        if not self.operators:
+            raise ValueError("Aucun opérateur enregistré : planning impossible.")
+        with self._lock:
+            if absences is not None:
+                self.absences = {_period(*absence) for absence in absences}
+            self.timelines = [Timeline() for _ in self.operators]
+            self.jobs, self.assignment = {}, {}
+            for op_name, start, end in self.absences:
+                if op_name in self.operators:
+                    self.timelines[self.operators.index(op_name)].insert(*self._absence_hours(start, end), None)
+            for row in ofs.to_dict("records"):
+                job = self._job(row)
+                if self._is_open(row, job):
+                    self.jobs[row["id"]] = job
+            self._dispatch(list(self.jobs))
+            if improve:
+                self._improve(range(len(self.operators)))
+        return self.plan()
+
+    # Recherche locale
+    def _tardiness(self, job_id, end):
+        job = self.jobs[job_id]
+        return job["priority"] * max(end - job["due"], 0.0)
+
+    def _improve(self, ops, max_passes=3):
+        for _ in range(max_passes):
+            improved = False
+            for op in ops:
+                improved |= self._swap_pass(op)
+            improved |= self._reassign_pass()
+            if not improved:
+                return
+
+    def _swap_pass(self, op):
+        # Échange de deux OF consécutifs d'un même opérateur, accepté s'il
+        # réduit le retard pondéré sans décaler les OF suivants
+        timeline = self.timelines[op]
+        improved = False
+        i = 0
+        while i < len(timeline.jobs) - 1:
+            j, k = timeline.jobs[i], timeline.jobs[i + 1]
+            if j not in self.jobs or k not in self.jobs:
+                i += 1
+                continue
+            _, start_j, end_j = self.assignment[j]
+            _, start_k, end_k = self.assignment[k]
+            dur_j, dur_k = end_j - start_j, end_k - start_k
+            new_start_k = max(start_j, self.jobs[k]["release"])
+            new_end_k = new_start_k + dur_k
+            new_start_j = max(new_end_k, self.jobs[j]["release"])
+            new_end_j = new_start_j + dur_j
+            before = self._tardiness(j, end_j) + self._tardiness(k, end_k)
+            after = self._tardiness(j, new_end_j) + self._tardiness(k, new_end_k)
+            if new_end_j <= end_k and after < before - 1e-9:
+                self._unplace(j)
+                self._unplace(k)
+                self._place(k, op, new_start_k, new_end_k)
+                self._place(j, op, new_start_j, new_end_j)
+                improved = True
+            i += 1
+        return improved
+
+    def _reassign_pass(self):
+        # Un OF en retard passe chez un autre opérateur qualifié s'il y finit plus tôt
+        improved = False
+        for job_id, (op, start, end) in list(self.assignment.items()):
+            if end <= self.jobs[job_id]["due"]:
+                continue
+            slot = self._best_slot(job_id, exclude=op)
+            if slot is not None and slot[2] < end - 1e-9:
+                self._unplace(job_id)
+                self._place(job_id, *slot)
+                improved = True
+        return improved
+
+    # Replanification incrémentale
+    def replan(self, rows=(), removed_ids=()):
+        """Replanifie en un lot les OF créés, modifiés, terminés ou supprimés.
+
+        Un OF dont les données de planification n'ont pas changé (par exemple
+        une écriture du planning lui-même, write_plan) garde sa place.
+        """
+        with self._lock:
+            ops, dispatch = set(), []
+            for job_id in removed_ids:
+                if job_id in self.assignment:
+                    ops.add(self.assignment[job_id][0])
+                    self._unplace(job_id)
+                self.jobs.pop(job_id, None)
+            for row in rows:
+                job_id = row["id"]
+                job = self._job(row)
+                is_open = self._is_open(row, job)
+                if is_open and job_id in self.assignment and self.jobs.get(job_id) == job:
+                    continue
+                if job_id in self.assignment:
+                    ops.add(self.assignment[job_id][0])
+                    self._unplace(job_id)
+                self.jobs.pop(job_id, None)
+                if is_open:
+                    self.jobs[job_id] = job
+                    dispatch.append(job_id)
+            self._dispatch(dispatch)
+            ops |= {self.assignment[j][0] for j in dispatch if j in self.assignment}
+            if ops:
+                self._improve(ops, max_passes=1)
+
+    def replan_of(self, row):
+        """Replanifie un seul OF (créé, modifié ou terminé)."""
+        self.replan([row])
+
+    def remove_of(self, job_id):
+        self.replan(removed_ids=[job_id])
+
+    def _absence_hours(self, start, end):
+        return self.to_hours(start), self.to_hours(pd.Timestamp(end) + pd.Timedelta(days=1))
+
+    def add_absence(self, op_name, start, end):
+        """Déclare une absence (dates incluses) et replace les OF qu'elle chevauche."""
+        with self._lock:
+            self.absences.add(_period(op_name, start, end))
+            op = self.operators.index(op_name)
+            start_h, end_h = self._absence_hours(start, end)
+            displaced = [j for j in self.timelines[op].overlapping(start_h, end_h) if j is not None]
+            for job_id in displaced:
+                self._unplace(job_id)
+            self.timelines[op].insert(start_h, end_h, None)
+            self._dispatch(displaced)
+            touched = {self.assignment[j][0] for j in displaced if j in self.assignment} | {op}
+            self._improve(touched, max_passes=1)
+            return displaced
+
+    def sync_absences(self, periods):
+        """Applique les absences pas encore prises en compte ; renvoie les OF replacés."""
+        displaced = []
+        with self._lock:
+            for name, start, end in sorted({_period(*p) for p in periods} - self.absences):
+                if name in self.operators:
+                    displaced.extend(self.add_absence(name, start, end))
+                else:
+                    self.absences.add((name, start, end))
+        return displaced
+
+    # Conversion du temps et restitution
+    def to_hours(self, date):
+        return float((pd.Timestamp(date).normalize() - self.today).days * HOURS_PER_DAY)
+
+    def hours_to_datetime(self, hours):
+        hours = np.asarray(hours, dtype=float)
+        days = np.floor(hours / HOURS_PER_DAY)
+        offset = hours - days * HOURS_PER_DAY
+        return self.today + pd.to_timedelta(days, unit="D") + pd.to_timedelta(SHIFT_START_HOUR + offset, unit="h")
+
+    def plan(self):
+        with self._lock:
+            if not self.assignment:
+                return pd.DataFrame(columns=["id", "poste", "id_operateur", "debut_planifie", "fin_planifiee", "retard_h"])
+            ids = list(self.assignment)
+            ops, starts, ends = (np.array(v) for v in zip(*self.assignment.values()))
+            due = np.array([self.jobs[j]["due"] for j in ids])
+            postes = [self.postes[self.jobs[j]["poste"]] for j in ids]
+        plan = pd.DataFrame({
+            "id": ids,
+            "poste": postes,
+            "id_operateur": [self.operators[o] for o in ops],
+            "debut_planifie": self.hours_to_datetime(starts),
+            "fin_planifiee": self.hours_to_datetime(ends),
+            "retard_h": np.maximum(ends - due, 0.0).round(2),
+        })
+        return plan.sort_values("debut_planifie", ignore_index=True)
+
+    def unplanned(self):
+        # OF ouverts sans opérateur qualifié sur leur poste
+        with self._lock:
+            return [j for j in self.jobs if j not in self.assignment]
+
+    def weighted_tardiness(self):
+        with self._lock:
+            return sum(self._tardiness(j, end) for j, (_, _, end) in self.assignment.items())
+
+
+def _period(name, start, end):
+    return name, pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+
+
+def write_plan(client, plan):
+    """Écrit tout le planning en une requête (fonction SQL apply_of_plan)."""
+    rows = [
+        {
+            "id": int(row.id) if isinstance(row.id, (int, np.integer)) else row.id,
+            "id_operateur": row.id_operateur,
+            "debut_planifie": row.debut_planifie.isoformat(),
+            "fin_planifiee": row.fin_planifiee.isoformat(),
+        }
+        for row in plan.itertuples(index=False)
+    ]
+    return client.rpc("apply_of_plan", {"plan": rows}).execute()
@@ -0,0 +1,231 @@
+"""Schéma des tables et conversion des lignes Supabase en DataFrames typés.
+
+Les modèles pydantic décrivent les colonnes de chaque table ; ``typed_frame``
+en déduit une représentation compacte, convertie colonne par colonne
+(vectorisé, sans valider ligne à ligne) :
+- catégories pour les colonnes à peu de valeurs (statut, poste, gravité) ;
+- entiers réduits au plus petit type numpy quand la colonne est complète ;
+- datetime64 pour les dates.
+"""
+import datetime
+from typing import Optional
+
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, Field
+
+from dates import to_datetime
+
+
+def category(default=None):
+    # Colonne stockée en pandas.Categorical
+    return Field(default, json_schema_extra={"dtype": "category"})
+
+
+class Row(BaseModel):
+    # Colonnes inconnues conservées telles quelles
+    model_config = ConfigDict(extra="allow")
+
+
+class OrdreFabrication(Row):
+    id: Optional[int] = None
+    numero_of: str
+    description: Optional[str] = None
+    poste: Optional[str] = category()
+    machine: Optional[str] = None
+    id_operateur: Optional[str] = None
+    statut: Optional[str] = category()
+    priorite: Optional[int] = None
+    progression: Optional[float] = None
+    date_debut: Optional[datetime.datetime] = None
+    date_fin: Optional[datetime.datetime] = None
+    temps_standard: Optional[float] = None
+    temps_reel: Optional[float] = None
+    quantite: Optional[int] = None
+    quantite_realisee: Optional[int] = None
+    debut_planifie: Optional[datetime.datetime] = None
+    fin_planifiee: Optional[datetime.datetime] = None
+
+
+class RessourceHumaine(Row):
+    id: Optional[int] = None
+    nom: str
+    poste: Optional[str] = category()
+
+
+class Defaut(Row):
+    id: Optional[int] = None
+    date: Optional[datetime.datetime] = None
+    numero_of: Optional[str] = None
+    poste: Optional[str] = category()
+    type_defaut: Optional[str] = category()
+    gravite: Optional[str] = category()
+    description: Optional[str] = None
+    action_corrective: Optional[str] = None
+    cle: Optional[str] = None
+
+
+class Equipement(Row):
+    id: Optional[int] = None
+    nom: str
+    poste: Optional[str] = category()
+    statut: Optional[str] = category()
+
+
+class Evenement(Row):
+    id: Optional[int] = None
+    timestamp: datetime.datetime
+    OF: str
+    evenement: str = category()
+    type_arret: Optional[str] = category()
+    commentaire: Optional[str] = None
+    quantite: Optional[int] = None
+
+
+class Maintenance(Row):
+    id: Optional[int] = None
+    machine: str = category()
+    type: str = category()
+    debut: datetime.datetime
+    fin: Optional[datetime.datetime] = None
+    commentaire: Optional[str] = None
+
+
+class Absence(Row):
+    id: Optional[int] = None
+    operateur: str
+    debut: datetime.date
+    fin: datetime.date
+    motif: Optional[str] = category()
+
+
+SCHEMAS = {
+    "ordres_fabrication": OrdreFabrication,
+    "ressources_humaines": RessourceHumaine,
+    "defauts": Defaut,
+    "equipements": Equipement,
+    "evenements": Evenement,
+    "maintenances": Maintenance,
+    "absences": Absence,
+}
+
+
+def clean_text(value):
+    """Texte saisi sans espaces de bord ; None pour une valeur vide ou absente."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _column_kinds(model):
+    kinds = {}
+    for name, field in model.model_fields.items():
+        extra = field.json_schema_extra or {}
+        annotation = field.annotation
+        args = getattr(annotation, "__args__", ())
+        base = next((a for a in args if a is not type(None)), annotation)
+        if extra.get("dtype") == "category":
+            kinds[name] = "category"
+        elif base is int:
+            kinds[name] = "int"
+        elif base is float:
+            kinds[name] = "float"
+        elif base in (datetime.datetime, datetime.date):
+            kinds[name] = "datetime"
+    return kinds
+
+
+def _int_column(values):
+    values = pd.to_numeric(values, errors="coerce")
+    if values.isna().any():
+        # Entiers incomplets : flottants, comme pandas les lit déjà
+        return values.astype(float)
+    return pd.to_numeric(values, downcast="integer")
+
+
+def typed_frame(df, table):
+    """Convertit un DataFrame brut (JSON Supabase) au schéma compact de la table."""
+    model = SCHEMAS.get(table)
+    if model is None or df.empty:
+        return df
+    converted = {}
+    for column, kind in _column_kinds(model).items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if kind == "category":
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                converted[column] = values.astype("category")
+        elif kind == "int":
+            if not (pd.api.types.is_integer_dtype(values) and values.dtype.itemsize <= 4):
+                converted[column] = _int_column(values)
+        elif kind == "float":
+            if not pd.api.types.is_float_dtype(values):
+                converted[column] = pd.to_numeric(values, errors="coerce").astype(float)
+        elif kind == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                converted[column] = to_datetime(values)
+    return df.assign(**converted) if converted else df
+
+
+def typed_upsert(df, rows, table, key="id"):
+    """Remplace ou ajoute des lignes brutes dans un DataFrame déjà typé.
+
+    Seules les nouvelles lignes sont converties (typed_frame) ; les catégories
+    sont unifiées avant la concaténation, qui garde ainsi les types compacts
+    sans reconvertir la table.
+    """
+    if not rows:
+        return df
+    new_rows = typed_frame(pd.DataFrame(rows), table)
+    if df.empty or key not in df.columns or key not in new_rows.columns:
+        return typed_frame(pd.concat([df, new_rows], ignore_index=True), table)
+    kept = df[~df[key].isin(new_rows[key])]
+    for column in kept.columns.intersection(new_rows.columns):
+        old, new = kept[column], new_rows[column]
+        if isinstance(old.dtype, pd.CategoricalDtype) and isinstance(new.dtype, pd.CategoricalDtype):
+            extra = new.cat.categories.difference(old.cat.categories, sort=False)
+            if len(extra):
+                old = old.cat.add_categories(extra)
+                kept = kept.assign(**{column: old})
+            new_rows[column] = new.cat.set_categories(old.cat.categories)
+    return pd.concat([kept, new_rows], ignore_index=True)
+
+
+def export_frame(df, table):
+    """Colonnes converties au type déclaré, sans perte, pour les exports.
+
+    Entiers nullables (une valeur non entière lève une erreur au lieu
+    d'être tronquée), flottants, dates naïves UTC ; le reste en texte.
+    """
+    kinds = _column_kinds(SCHEMAS[table]) if table in SCHEMAS else {}
+    converted = {}
+    for column in df.columns:
+        kind = kinds.get(column)
+        values = df[column]
+        if kind == "int":
+            converted[column] = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif kind == "float":
+            converted[column] = pd.to_numeric(values, errors="coerce").astype(float)
+        elif kind == "datetime":
+            converted[column] = to_datetime(values)
+        else:
+            converted[column] = values.astype("string")
+    return df.assign(**converted)
+
+
+def arrow_schema(table, columns):
+    """Schéma Arrow des colonnes, d'après le modèle de la table (texte si non déclarée)."""
+    import pyarrow as pa
+
+    types = {"int": pa.int64(), "float": pa.float64(), "datetime": pa.timestamp("ns")}
+    kinds = _column_kinds(SCHEMAS[table]) if table in SCHEMAS else {}
+    return pa.schema([(column, types.get(kinds.get(column), pa.string())) for column in columns])
+
+
+def frame_memory(df):
+    """Mémoire occupée (octets), chaînes comprises."""
+    if not isinstance(df, pd.DataFrame):
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
@@ -0,0 +1,340 @@
+import hashlib
+import heapq
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from capacity import POSTES, skill_matrix
+from dates import to_datetime
+from kpi import HOURS_PER_DAY
+
+SCENARIOS = [
+    "Absence d'un opérateur clé",
+    "Ajout d'un opérateur",
+    "Panne machine",
+    "Commande urgente",
+]
+
+# Aléas du modèle
+DURATION_CV = 0.2          # dispersion des temps opératoires (loi log-normale)
+MTBF_HOURS = 120.0         # temps moyen entre pannes d'une machine (heures travaillées)
+MTTR_HOURS = 4.0           # durée moyenne de réparation
+SKILL_SPEED = np.array([0.0, 0.7, 0.85, 1.0])  # vitesse relative par niveau (0 = non qualifié)
+
+METRICS = ["retard_moyen_j", "part_en_retard", "occupation", "duree_totale_j", "non_termines"]
+
+# Derniers résultats (LRU borné), partagés par les sessions du processus
+_RESULTS = OrderedDict()
+_RESULTS_MAX = 32
+_RESULTS_LOCK = threading.Lock()
+
+
+def build_workshop(ofs, operators, equipment, horizon_days=60, today=None):
+    """Modèle de l'atelier (dict de tableaux NumPy, transmissible aux processus)."""
+    today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+    postes = list(POSTES)
+
+    if not ofs.empty and "statut" in ofs.columns:
+        ofs = ofs[ofs["statut"].ne("Terminé")]
+    if ofs.empty:
+        ofs = pd.DataFrame(columns=["poste", "temps_standard", "progression", "priorite", "date_debut"])
+    temps_standard = pd.to_numeric(ofs.get("temps_standard"), errors="coerce").fillna(0.0)
+    progression = pd.to_numeric(ofs.get("progression"), errors="coerce").fillna(0.0).clip(0, 100)
+    hours = (temps_standard * (1 - progression / 100)).to_numpy(float)
+    job_poste = pd.Categorical(ofs.get("poste"), categories=postes).codes.astype(np.int64)
+    date_debut = to_datetime(ofs["date_debut"]) if "date_debut" in ofs.columns else pd.Series(pd.NaT, index=ofs.index)
+    release = (date_debut.dt.normalize() - today).dt.days.fillna(0).clip(lower=0).to_numpy(np.int64)
+    priority = pd.to_numeric(ofs.get("priorite"), errors="coerce").fillna(3).to_numpy(float)
+
+    keep = (hours > 0) & (job_poste >= 0) & (release < horizon_days)
+    names, skills = skill_matrix(operators, postes)
+
+    if not equipment.empty and "poste" in equipment.columns:
+        machine_poste = pd.Categorical(equipment["poste"], categories=postes).codes
+        machine_names = equipment.get("nom", pd.Series([f"Machine {i + 1}" for i in range(len(equipment))]))
+        machine_names = machine_names.astype(str)[machine_poste >= 0].tolist()
+        machine_poste = machine_poste[machine_poste >= 0].astype(np.int64)
+    else:
+        # Sans affectation connue : une machine par poste
+        machine_poste = np.arange(len(postes), dtype=np.int64)
+        machine_names = [f"Machine {i + 1}" for i in range(len(postes))]
+
+    return {
+        "postes": postes,
+        "hours": hours[keep],
+        "job_poste": job_poste[keep],
+        "release": release[keep],
+        "priority": priority[keep],
+        "operators": names,
+        "skills": skills,
+        "machine_poste": machine_poste,
+        "machines": machine_names,
+    }
+
+
+def workshop_key(ws):
+    digest = hashlib.sha1()
+    for name in ("hours", "job_poste", "release", "priority", "skills", "machine_poste"):
+        digest.update(np.ascontiguousarray(ws[name]).tobytes())
+    # Les scénarios ciblent opérateurs et machines par leur nom
+    for name in ("operators", "machines", "postes"):
+        digest.update("\x1f".join(map(str, ws[name])).encode("utf-8") + b"\x1e")
+    return digest.hexdigest()
+
+
+def apply_scenario(ws, scenario, duree, target=None, volume=0.0, poste=None):
+    """Renvoie une copie du modèle modifiée par le scénario (durées en heures travaillées)."""
+    ws = dict(ws)
+    n_ops = len(ws["skills"])
+    ws["op_unavailable"] = np.zeros((n_ops, 2))
+    ws["machine_down"] = np.zeros((len(ws["machine_poste"]), 2))
+    ws["extra_op_until"] = None
+    span = duree * HOURS_PER_DAY
+
+    if scenario == "Absence d'un opérateur clé" and target in ws["operators"]:
+        ws["op_unavailable"][ws["operators"].index(target)] = (0.0, span)
+    elif scenario == "Panne machine" and target in ws["machines"]:
+        ws["machine_down"][ws["machines"].index(target)] = (0.0, span)
+    elif scenario == "Ajout d'un opérateur":
+        p = ws["postes"].index(poste) if poste in ws["postes"] else 0
+        extra = np.zeros((1, len(ws["postes"])), dtype=np.int8)
+        extra[0, p] = 2
+        ws["skills"] = np.vstack([ws["skills"], extra])
+        # Le renfort n'est présent que pendant la durée du scénario
+        ws["op_unavailable"] = np.vstack([ws["op_unavailable"], [(span, np.inf)]])
+    elif scenario == "Commande urgente" and volume > 0:
+        p = ws["postes"].index(poste) if poste in ws["postes"] else 0
+        ws["hours"] = np.append(ws["hours"], float(volume))
+        ws["job_poste"] = np.append(ws["job_poste"], p)
+        ws["release"] = np.append(ws["release"], 0)
+        ws["priority"] = np.append(ws["priority"], np.inf)
+    return ws
+
+
+def run_replication(ws, seed):
+    """Une réplication de la simulation à événements discrets.
+
+    Temps exprimé en heures travaillées (une journée = HOURS_PER_DAY).
+    Chaque poste a sa file d'OF (priorité décroissante) ; un OF démarre
+    quand une machine du poste est disponible et qu'un opérateur qualifié
+    est libre (le plus compétent d'abord). Les pannes suivent un processus
+    de Poisson par machine et prolongent l'OF en cours.
+    """
+    rng = np.random.default_rng(seed)
+    n_jobs = len(ws["hours"])
+    n_postes = len(ws["postes"])
+    skills = ws["skills"]
+    machine_poste = ws["machine_poste"]
+    n_machines = len(machine_poste)
+    op_unavailable = ws.get("op_unavailable", np.zeros((len(skills), 2)))
+    machine_down = ws.get("machine_down", np.zeros((n_machines, 2)))
+
+    noise = rng.lognormal(-DURATION_CV ** 2 / 2, DURATION_CV, n_jobs)
+    work = ws["hours"] * noise
+    release = ws["release"] * float(HOURS_PER_DAY)
+    due = release + np.ceil(ws["hours"] / HOURS_PER_DAY).clip(min=1) * HOURS_PER_DAY
+    horizon = (release.max() if n_jobs else 0) + ws["hours"].sum() + 10 * HOURS_PER_DAY
+
+    events = []
+    seq = 0
+
+    def push(t, kind, a=0, b=0):
+        nonlocal seq
+        heapq.heappush(events, (t, seq, kind, a, b))
+        seq += 1
+
+    queues = [[] for _ in range(n_postes)]
+    idle_machines = [set() for _ in range(n_postes)]
+    idle_ops = set()
+    machine_job = np.full(n_machines, -1)
+    machine_op = np.full(n_machines, -1)
+    machine_done = np.zeros(n_machines)
+    machine_version = np.zeros(n_machines, dtype=np.int64)
+    machine_up = np.ones(n_machines, dtype=bool)
+    busy_hours = 0.0
+    completion = np.full(n_jobs, np.nan)
+
+    for j in range(n_jobs):
+        push(release[j], "release", j)
+    for op, (start, end) in enumerate(op_unavailable):
+        if end > start:
+            if start > 0:
+                idle_ops.add(op)
+                push(start, "op_out", op)
+            if np.isfinite(end):
+                push(end, "op_back", op)
+        else:
+            idle_ops.add(op)
+    for m in range(n_machines):
+        start, end = machine_down[m]
+        if end > start:
+            machine_up[m] = False
+            push(end, "machine_up", m)
+        else:
+            idle_machines[machine_poste[m]].add(m)
+        # Pannes aléatoires sur l'horizon
+        t = rng.exponential(MTBF_HOURS)
+        while t < horizon:
+            push(t, "failure", m, rng.exponential(MTTR_HOURS))
+            t += rng.exponential(MTBF_HOURS)
+
+    unavailable_ops = set()
+
+    def dispatch(t):
+        nonlocal busy_hours
+        for p in range(n_postes):
+            while queues[p] and idle_machines[p]:
+                candidates = [op for op in idle_ops if skills[op, p] > 0]
+                if not candidates:
+                    break
+                op = max(candidates, key=lambda o: skills[o, p])
+                _, _, j = heapq.heappop(queues[p])
+                m = idle_machines[p].pop()
+                idle_ops.discard(op)
+                duration = work[j] / SKILL_SPEED[skills[op, p]]
+                machine_job[m], machine_op[m] = j, op
+                machine_done[m] = t + duration
+                busy_hours += duration
+                push(machine_done[m], "done", m, machine_version[m])
+
+    while events:
+        t, _, kind, a, b = heapq.heappop(events)
+        if kind == "release":
+            heapq.heappush(queues[ws["job_poste"][a]], (-ws["priority"][a], release[a], a))
+        elif kind == "done":
+            m = a
+            if b != machine_version[m] or machine_job[m] < 0:
+                continue  # fin reportée par une panne
+            completion[machine_job[m]] = t
+            op = machine_op[m]
+            machine_job[m] = machine_op[m] = -1
+            if op not in unavailable_ops:
+                idle_ops.add(op)
+            if machine_up[m]:
+                idle_machines[machine_poste[m]].add(m)
+        elif kind == "failure":
+            m, repair = a, b
+            if not machine_up[m]:
+                continue
+            if machine_job[m] >= 0:
+                # La panne immobilise l'OF en cours pendant la réparation
+                machine_version[m] += 1
+                machine_done[m] += repair
+                push(machine_done[m], "done", m, machine_version[m])
+            else:
+                machine_up[m] = False
+                idle_machines[machine_poste[m]].discard(m)
+                push(t + repair, "machine_up", m)
+        elif kind == "machine_up":
+            machine_up[a] = True
+            if machine_job[a] < 0:
+                idle_machines[machine_poste[a]].add(a)
+        elif kind == "op_out":
+            unavailable_ops.add(a)
+            idle_ops.discard(a)
+        elif kind == "op_back":
+            unavailable_ops.discard(a)
+            if a not in machine_op:
+                idle_ops.add(a)
+        dispatch(t)
+
+    finished = ~np.isnan(completion)
+    late = np.maximum(completion[finished] - due[finished], 0.0) / HOURS_PER_DAY
+    makespan = completion[finished].max() if finished.any() else 0.0
+    occupation = busy_hours / (n_machines * makespan) * 100 if n_machines and makespan else 0.0
+    return np.array([
+        late.mean() if late.size else 0.0,
+        (late > 0).mean() * 100 if late.size else 0.0,
+        occupation,
+        makespan / HOURS_PER_DAY,
+        float((~finished).sum()),
+    ])
+
+
+def run_batch(baseline, scenario, seeds):
+    # Nombres aléatoires communs : même graine pour la référence et le scénario
+    return (
+        np.array([run_replication(baseline, seed) for seed in seeds]),
+        np.array([run_replication(scenario, seed) for seed in seeds]),
+    )
+
+
+def summarize(samples):
+    """Moyenne, intervalle de confiance à 95 % et quantiles par indicateur."""
+    n = len(samples)
+    mean = samples.mean(axis=0)
+    half_width = 1.96 * samples.std(axis=0, ddof=1) / np.sqrt(n) if n > 1 else np.zeros(samples.shape[1])
+    return pd.DataFrame({
+        "moyenne": mean,
+        "ic95_bas": mean - half_width,
+        "ic95_haut": mean + half_width,
+        "p5": np.percentile(samples, 5, axis=0),
+        "p95": np.percentile(samples, 95, axis=0),
+    }, index=METRICS)
+
+
+def simulation_pool(workers=None):
+    """Pool de processus de calcul, à garder pour toute la durée du serveur.
+
+    Processus lancés par spawn : un fork du serveur Streamlit, qui a de
+    nombreux threads, peut hériter de verrous pris et bloquer.
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def simulate(ws, scenario, params, n_replications=500, seed=0, pool=None, progress=None):
+    """Lance les réplications sur un pool de processus (simulation_pool).
+
+    Sans pool, un pool temporaire est créé pour l'appel. Renvoie un dict
+    avec les échantillons bruts de la référence et du scénario et leurs
+    résumés. Les résultats sont mis en cache par (modèle, scénario,
+    paramètres, nombre de réplications, graine).
+    """
+    key = (workshop_key(ws), scenario, tuple(sorted(params.items())), n_replications, seed)
+    with _RESULTS_LOCK:
+        result = _RESULTS.get(key)
+        if result is not None:
+            _RESULTS.move_to_end(key)
+    if result is not None:
+        if progress:
+            progress(1.0)
+        return result
+
+    if pool is None:
+        with simulation_pool() as pool:
+            return simulate(ws, scenario, params, n_replications, seed, pool, progress)
+
+    scenario_ws = apply_scenario(ws, scenario, **params)
+    seeds = np.random.SeedSequence(seed).generate_state(n_replications)
+    chunks = [c for c in np.array_split(seeds, max(1, min((os.cpu_count() or 1) * 4, n_replications))) if len(c)]
+
+    base, scen = [], []
+    done = 0
+    futures = [pool.submit(run_batch, ws, scenario_ws, chunk.tolist()) for chunk in chunks]
+    sizes = {future: len(chunk) for future, chunk in zip(futures, chunks)}
+    for future in as_completed(futures):
+        b, s = future.result()
+        base.append(b)
+        scen.append(s)
+        done += sizes[future]
+        if progress:
+            progress(done / n_replications)
+
+    base, scen = np.vstack(base), np.vstack(scen)
+    result = {
+        "baseline": base,
+        "scenario": scen,
+        "summary": summarize(scen),
+        "impact": summarize(scen - base),
+    }
+    with _RESULTS_LOCK:
+        _RESULTS[key] = result
+        if len(_RESULTS) > _RESULTS_MAX:
+            _RESULTS.popitem(last=False)
+    return result
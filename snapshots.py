@@ -0,0 +1,206 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import pyarrow as pa
+
+from changes import WATCHED_TABLES, ChangeFeed
+from of_sync import DeltaSync
+from schemas import typed_frame
+from table_cache import TABLE_TTLS
+
+# Tables publiées pour tous les processus Streamlit
+SNAPSHOT_TABLES = ("ordres_fabrication", "ressources_humaines", "defauts", "equipements")
+# Versions conservées sur disque : un lecteur peut encore ouvrir la précédente
+KEEP_VERSIONS = 2
+
+
+class SnapshotStore:
+    """Instantanés versionnés des tables, partagés entre processus.
+
+    Chaque version d'une table est un fichier Arrow IPC non compressé
+    (``<table>-<version>.arrow``) ; le fichier ``<table>.version`` désigne
+    la version courante et n'est remplacé qu'une fois les données écrites
+    (renommage atomique). Les lecteurs ouvrent le fichier par mmap : les
+    colonnes numériques, dates et chaînes restent dans le cache de pages du
+    système, partagé par tous les processus, au lieu d'être copiées dans
+    chacun. Placé sous /dev/shm, le répertoire est en mémoire partagée.
+
+    Un processus ne reconstruit son DataFrame que lorsque la version
+    change : ``version`` ne coûte qu'un stat tant que le fichier de version
+    n'a pas été remplacé.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._stamps = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _version_path(self, table):
+        return os.path.join(self.directory, f"{table}.version")
+
+    def _data_path(self, table, version):
+        return os.path.join(self.directory, f"{table}-{version:010d}.arrow")
+
+    def version(self, table):
+        """Version courante de la table, None si elle n'a jamais été publiée."""
+        path = self._version_path(table)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._stamps.get(table)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path) as f:
+            version = int(f.read())
+        self._stamps[table] = (stamp, version)
+        return version
+
+    def read(self, table):
+        """DataFrame de la version courante (le même objet tant qu'elle ne change pas)."""
+        version = self.version(table)
+        if version is None:
+            return None
+        cached = self._frames.get(table)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            cached = self._frames.get(table)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            source = pa.memory_map(self._data_path(table, version))
+            # split_blocks : une colonne par bloc, sans consolidation (donc sans copie)
+            frame = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+            self._frames[table] = (version, frame)
+            return frame
+
+    def publish(self, table, df):
+        """Écrit une nouvelle version de la table ; renvoie son numéro."""
+        version = (self.version(table) or 0) + 1
+        path = self._data_path(table, version)
+        data = _arrow_table(df)
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, data.schema) as writer:
+            writer.write_table(data)
+        os.replace(path + ".tmp", path)
+        version_path = self._version_path(table)
+        with open(version_path + ".tmp", "w") as f:
+            f.write(str(version))
+        os.replace(version_path + ".tmp", version_path)
+        self._prune(table, version)
+        return version
+
+    def _prune(self, table, version):
+        # Les processus qui lisent encore une ancienne version gardent leur
+        # mmap valide après suppression du fichier
+        for old in range(version - KEEP_VERSIONS, 0, -1):
+            try:
+                os.remove(self._data_path(table, old))
+            except FileNotFoundError:
+                break
+            except OSError:
+                # Fichier encore ouvert (Windows) : supprimé à une prochaine publication
+                continue
+
+
+def _arrow_table(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colonnes object aux valeurs hétérogènes (JSON non typé) : publiées en texte
+        objects = df.select_dtypes("object").columns
+        return pa.Table.from_pandas(df.astype(dict.fromkeys(objects, "str")), preserve_index=False)
+
+
+class SnapshotRefresher:
+    """Processus unique qui lit la base et publie les instantanés.
+
+    Les tables suivies par le journal des modifications (changes.py) sont
+    republiées dès qu'elles changent, les OF par delta sur updated_at ;
+    les autres sont relues à l'expiration de leur TTL et republiées
+    seulement si leur contenu a changé.
+    """
+
+    def __init__(self, repository, store, tables=SNAPSHOT_TABLES, interval=1.0):
+        self.repository = repository
+        self.store = store
+        self.tables = tables
+        self.interval = interval
+        self.of_sync = DeltaSync(repository.client, "ordres_fabrication",
+                                 tombstone_table="ordres_fabrication_suppressions")
+        self.published = {}
+        self._loaded_at = {}
+        self._dirty = set(tables)
+        self._dirty_lock = threading.Lock()
+
+    def load(self, table):
+        if table == "ordres_fabrication":
+            return typed_frame(self.of_sync.refresh(), table)
+        return typed_frame(self.repository.fetch_table(table), table)
+
+    def refresh(self, table):
+        df = self.load(table)
+        self._loaded_at[table] = time.monotonic()
+        previous = self.published.get(table)
+        if previous is not None and previous.equals(df):
+            return None
+        self.published[table] = df
+        return self.store.publish(table, df)
+
+    def changes_received(self, changes):
+        with self._dirty_lock:
+            self._dirty.update(change["table_name"] for change in changes if change["table_name"] in self.tables)
+
+    def step(self):
+        # Tables modifiées, puis tables non suivies dont le TTL est expiré
+        now = time.monotonic()
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for table in self.tables:
+            if table not in WATCHED_TABLES and now - self._loaded_at.get(table, float("-inf")) >= TABLE_TTLS.get(table, 60):
+                dirty.add(table)
+        versions = {}
+        for table in sorted(dirty):
+            try:
+                version = self.refresh(table)
+            except Exception:
+                # Base momentanément injoignable : la table sera relue au tour suivant
+                with self._dirty_lock:
+                    self._dirty.add(table)
+                continue
+            if version is not None:
+                versions[table] = version
+        return versions
+
+    def run(self):
+        feed = ChangeFeed(self.repository.client, self.interval)
+        feed.subscribe(self.changes_received)
+        try:
+            while True:
+                for table, version in self.step().items():
+                    print(f"{time.strftime('%H:%M:%S')} {table} v{version} ({len(self.published[table])} lignes)", flush=True)
+                time.sleep(self.interval)
+        finally:
+            feed.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publie les instantanés des tables pour les processus Streamlit.")
+    parser.add_argument("--dir", default=os.environ.get("MES_SNAPSHOT_DIR", "/dev/shm/mes_snapshots"),
+                        help="répertoire des instantanés (MES_SNAPSHOT_DIR des processus Streamlit)")
+    parser.add_argument("--interval", type=float, default=1.0, help="secondes entre deux lectures du journal")
+    args = parser.parse_args()
+
+    # Même stockage que l'application (MES_STORAGE, MES_LOCAL_DB)
+    from services import init_repository
+    SnapshotRefresher(init_repository(), SnapshotStore(args.dir), interval=args.interval).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
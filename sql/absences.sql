@@ -0,0 +1,13 @@
+-- Absences des opérateurs (dates incluses), lues par staffing.OperatorIndex
+create table if not exists absences (
+    id bigint generated always as identity primary key,
+    operateur text not null,
+    debut date not null,
+    fin date not null check (fin >= debut),
+    motif text,
+    cree_le timestamptz not null default now()
+);
+
+-- Absences d'un opérateur sur une plage de dates
+create index if not exists absences_operateur_debut_idx
+    on absences (operateur, debut);
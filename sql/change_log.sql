@@ -0,0 +1,39 @@
+-- Journal des modifications lu par changes.ChangeFeed : une ligne par
+-- insertion, modification ou suppression dans les tables suivies.
+-- (Supabase Realtime peut remplacer la lecture périodique ; le journal
+-- garde l'avantage de fonctionner à l'identique avec la base locale.)
+create table if not exists change_log (
+    id bigint generated always as identity primary key,
+    table_name text not null,
+    row_id bigint,
+    operation text not null,
+    changed_at timestamptz not null default now()
+);
+
+create or replace function log_change()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into change_log (table_name, row_id, operation)
+    values (tg_table_name, coalesce(new.id, old.id), lower(tg_op));
+    return null;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['ordres_fabrication', 'defauts', 'equipements', 'maintenances', 'absences'] loop
+        execute format('drop trigger if exists %I on %I', t || '_change_log', t);
+        execute format(
+            'create trigger %I after insert or update or delete on %I for each row execute function log_change()',
+            t || '_change_log', t
+        );
+    end loop;
+end;
+$$;
+
+-- Purge quotidienne conseillée (pg_cron) : les sessions ne relisent que les dernières minutes
+-- delete from change_log where changed_at < now() - interval '1 day';
@@ -0,0 +1,6 @@
+-- Clé d'idempotence des déclarations de défauts (quality.defect_sink) :
+-- l'upsert d'un lot réécrit après un délai dépassé ne crée pas de doublon
+alter table defauts add column if not exists cle text;
+
+create unique index if not exists defauts_cle_idx
+    on defauts (cle);
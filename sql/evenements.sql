@@ -0,0 +1,15 @@
+-- Événements atelier (schéma de data/events.csv), alimentés par events.EventIngestor
+create table if not exists evenements (
+    id bigint generated always as identity primary key,
+    "timestamp" timestamptz not null,
+    "OF" text not null,
+    evenement text not null,
+    type_arret text,
+    commentaire text,
+    quantite integer check (quantite >= 0),
+    recu_le timestamptz not null default now()
+);
+
+-- Clé de déduplication utilisée par l'upsert (on_conflict)
+create unique index if not exists evenements_dedup_idx
+    on evenements ("timestamp", "OF", evenement);
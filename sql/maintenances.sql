@@ -0,0 +1,14 @@
+-- Journal des pannes et maintenances des équipements (maintenance.MaintenanceLog)
+create table if not exists maintenances (
+    id bigint generated always as identity primary key,
+    machine text not null,
+    type text not null check (type in ('panne', 'maintenance')),
+    debut timestamptz not null,
+    fin timestamptz check (fin is null or fin >= debut),
+    commentaire text,
+    cree_le timestamptz not null default now()
+);
+
+-- Historique d'une machine sur une plage de dates
+create index if not exists maintenances_machine_debut_idx
+    on maintenances (machine, debut);
@@ -0,0 +1,9 @@
+-- Import d'OF planifiés (of_bulk.upsert_ofs) : clé naturelle et colonnes de data/of_list.csv
+alter table ordres_fabrication
+    add column if not exists description text,
+    add column if not exists machine text,
+    add column if not exists quantite integer,
+    add column if not exists quantite_realisee integer;
+
+create unique index if not exists ordres_fabrication_numero_of_idx
+    on ordres_fabrication (numero_of);
@@ -0,0 +1,49 @@
+-- Synchronisation incrémentale des ordres de fabrication (of_sync.DeltaSync)
+
+-- Horodatage de dernière modification, tenu à jour par trigger
+alter table ordres_fabrication
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists ordres_fabrication_updated_at_idx
+    on ordres_fabrication (updated_at);
+
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists ordres_fabrication_set_updated_at on ordres_fabrication;
+create trigger ordres_fabrication_set_updated_at
+    before insert or update on ordres_fabrication
+    for each row execute function set_updated_at();
+
+-- Tombstones : identifiants des OF supprimés
+create table if not exists ordres_fabrication_suppressions (
+    id bigint primary key,
+    supprime_le timestamptz not null default now()
+);
+
+create index if not exists ordres_fabrication_suppressions_supprime_le_idx
+    on ordres_fabrication_suppressions (supprime_le);
+
+create or replace function record_of_suppression()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into ordres_fabrication_suppressions (id)
+    values (old.id)
+    on conflict (id) do update set supprime_le = now();
+    return old;
+end;
+$$;
+
+drop trigger if exists ordres_fabrication_record_suppression on ordres_fabrication;
+create trigger ordres_fabrication_record_suppression
+    after delete on ordres_fabrication
+    for each row execute function record_of_suppression();
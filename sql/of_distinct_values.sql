@@ -0,0 +1,22 @@
+-- Valeurs distinctes d'une colonne de filtre des ordres de fabrication,
+-- appelée par of_queries.fetch_distinct_values via supabase.rpc
+create or replace function of_distinct_values(col text)
+returns table (valeur text)
+language plpgsql stable
+as $$
+begin
+    if col not in ('statut', 'poste') then
+        raise exception 'Colonne non autorisée: %', col;
+    end if;
+    return query execute format(
+        'select distinct %I::text from ordres_fabrication where %I is not null order by 1',
+        col, col
+    );
+end;
+$$;
+
+-- Index utilisés par les filtres et le tri de la liste des OF
+create index if not exists ordres_fabrication_statut_poste_idx
+    on ordres_fabrication (statut, poste);
+create index if not exists ordres_fabrication_priorite_id_idx
+    on ordres_fabrication (priorite desc, id desc);
@@ -0,0 +1,21 @@
+-- Planning calculé par scheduler.Scheduler, écrit en une seule requête
+alter table ordres_fabrication
+    add column if not exists debut_planifie timestamptz,
+    add column if not exists fin_planifiee timestamptz;
+
+create or replace function apply_of_plan(plan jsonb)
+returns integer
+language sql
+as $$
+    with updated as (
+        update ordres_fabrication o
+        set id_operateur = p.id_operateur,
+            debut_planifie = p.debut_planifie,
+            fin_planifiee = p.fin_planifiee
+        from jsonb_to_recordset(plan)
+            as p(id bigint, id_operateur text, debut_planifie timestamptz, fin_planifiee timestamptz)
+        where o.id = p.id
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
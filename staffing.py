@@ -0,0 +1,121 @@
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from capacity import POSTES, skill_matrix
+from kpi import HOURS_PER_DAY
+
+ABSENCE_TABLE = "absences"
+MOTIFS = ["Maladie", "Congé", "Formation", "Autre"]
+LEVEL_LABELS = {1: "débutant", 2: "autonome", 3: "expert"}
+
+
+def _day(value):
+    # Jour ordinal (entier) d'une date, d'un datetime ou d'une chaîne ISO
+    return pd.Timestamp(value).date().toordinal()
+
+
+def of_days(date_debut, temps_standard):
+    """Jours (inclus) occupés par un OF : sa date de début et la durée du temps standard."""
+    days = max(int(np.ceil((temps_standard or 0) / HOURS_PER_DAY)), 1)
+    start = pd.Timestamp(date_debut).date()
+    return start, start + datetime.timedelta(days=days - 1)
+
+
+class OperatorIndex:
+    """Compétences et absences des opérateurs, pour savoir qui peut tenir un poste.
+
+    Les niveaux (0 à 3) forment une matrice opérateur × poste ; pour chaque
+    poste, les opérateurs qualifiés sont pré-triés par niveau et résumés
+    par un masque de bits (bit i = opérateur i). Le calendrier des absences
+    associe à chaque jour le masque des opérateurs absents : une requête sur
+    une plage de dates combine quelques entiers par OU puis filtre la liste
+    triée, sans parcourir la table des opérateurs.
+    """
+
+    def __init__(self, names, levels, postes=POSTES):
+        self.names = list(names)
+        self.postes = list(postes)
+        self.levels = np.asarray(levels, dtype=np.int8)
+        self._position = {name: i for i, name in enumerate(self.names)}
+        self._ranked = {}
+        self._qualified = {}
+        for p, poste in enumerate(self.postes):
+            column = self.levels[:, p]
+            ranked = [int(i) for i in np.lexsort((np.arange(len(self.names)), -column)) if column[i] > 0]
+            self._ranked[poste] = ranked
+            self._qualified[poste] = sum(1 << i for i in ranked)
+        self._absent = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frames(cls, operators, absences=None):
+        names, levels = skill_matrix(operators)
+        index = cls(names, levels)
+        if absences is not None and not absences.empty:
+            for row in absences[["operateur", "debut", "fin"]].itertuples(index=False):
+                if row.operateur in index._position and pd.notna(row.debut):
+                    index.add_absence(row.operateur, row.debut, row.fin if pd.notna(row.fin) else row.debut)
+        return index
+
+    def level(self, name, poste):
+        i = self._position.get(name)
+        if i is None or poste not in self.postes:
+            return 0
+        return int(self.levels[i, self.postes.index(poste)])
+
+    def add_absence(self, name, start, end):
+        """Marque l'opérateur absent du jour start au jour end inclus."""
+        bit = 1 << self._position[name]
+        with self._lock:
+            for day in range(_day(start), _day(end) + 1):
+                self._absent[day] = self._absent.get(day, 0) | bit
+
+    def remove_absence(self, name, start, end):
+        bit = 1 << self._position[name]
+        with self._lock:
+            for day in range(_day(start), _day(end) + 1):
+                mask = self._absent.get(day, 0) & ~bit
+                if mask:
+                    self._absent[day] = mask
+                else:
+                    self._absent.pop(day, None)
+
+    def absent_mask(self, start, end):
+        mask = 0
+        absent = self._absent
+        for day in range(_day(start), _day(end) + 1):
+            mask |= absent.get(day, 0)
+        return mask
+
+    def is_available(self, name, start, end):
+        return not (self.absent_mask(start, end) >> self._position[name]) & 1
+
+    def available(self, poste, start, end, min_level=1):
+        """Opérateurs qualifiés sur le poste et présents sur toute la plage, meilleurs niveaux d'abord.
+
+        Renvoie une liste de (nom, niveau).
+        """
+        ranked = self._ranked.get(poste, [])
+        free = self._qualified.get(poste, 0) & ~self.absent_mask(start, end)
+        if not free:
+            return []
+        p = self.postes.index(poste)
+        result = []
+        for i in ranked:
+            level = int(self.levels[i, p])
+            if level < min_level:
+                break
+            if (free >> i) & 1:
+                result.append((self.names[i], level))
+        return result
+
+    def absent(self, day):
+        """Noms des opérateurs absents ce jour-là."""
+        mask = self._absent.get(_day(day), 0)
+        return [name for i, name in enumerate(self.names) if (mask >> i) & 1]
+
+    def matrix(self):
+        return pd.DataFrame(self.levels, index=pd.Index(self.names, name="Opérateur"), columns=self.postes)
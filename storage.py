@@ -0,0 +1,533 @@
+import datetime
+import os
+import re
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+
+from of_bulk import read_of_csv
+from of_sync import fetch_by_ids, fetch_paginated
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Schéma de la base embarquée (mêmes tables et colonnes que Supabase)
+LOCAL_SCHEMA = """
+create table if not exists ordres_fabrication (
+    id integer primary key autoincrement,
+    numero_of text unique,
+    description text,
+    poste text,
+    machine text,
+    id_operateur text,
+    statut text,
+    priorite integer,
+    progression real,
+    date_debut text,
+    date_fin text,
+    temps_standard real,
+    temps_reel real,
+    quantite integer,
+    quantite_realisee integer,
+    debut_planifie text,
+    fin_planifiee text,
+    updated_at text
+);
+create index if not exists ordres_fabrication_statut_poste_idx on ordres_fabrication (statut, poste);
+create index if not exists ordres_fabrication_priorite_id_idx on ordres_fabrication (priorite desc, id desc);
+create index if not exists ordres_fabrication_date_debut_idx on ordres_fabrication (date_debut);
+create index if not exists ordres_fabrication_updated_at_idx on ordres_fabrication (updated_at);
+
+create table if not exists ordres_fabrication_suppressions (
+    id integer primary key,
+    supprime_le text
+);
+
+create trigger if not exists ordres_fabrication_insert_updated_at
+after insert on ordres_fabrication
+begin
+    update ordres_fabrication set updated_at = mes_now() where id = new.id;
+end;
+create trigger if not exists ordres_fabrication_update_updated_at
+after update on ordres_fabrication
+when new.updated_at is old.updated_at
+begin
+    update ordres_fabrication set updated_at = mes_now() where id = new.id;
+end;
+create trigger if not exists ordres_fabrication_record_suppression
+after delete on ordres_fabrication
+begin
+    insert or replace into ordres_fabrication_suppressions (id, supprime_le)
+    values (old.id, mes_now());
+end;
+
+create table if not exists ressources_humaines (
+    id integer primary key autoincrement,
+    nom text,
+    poste text
+);
+
+create table if not exists defauts (
+    id integer primary key autoincrement,
+    date text,
+    numero_of text,
+    poste text,
+    type_defaut text,
+    gravite text,
+    description text,
+    action_corrective text,
+    cle text
+);
+create unique index if not exists defauts_cle_idx on defauts (cle);
+create index if not exists defauts_date_idx on defauts (date);
+create index if not exists defauts_numero_of_idx on defauts (numero_of);
+
+create table if not exists equipements (
+    id integer primary key autoincrement,
+    nom text,
+    poste text,
+    statut text
+);
+
+create table if not exists evenements (
+    id integer primary key autoincrement,
+    "timestamp" text not null,
+    "OF" text not null,
+    evenement text not null,
+    type_arret text,
+    commentaire text,
+    quantite integer,
+    recu_le text default (mes_now())
+);
+create unique index if not exists evenements_dedup_idx on evenements ("timestamp", "OF", evenement);
+
+create table if not exists maintenances (
+    id integer primary key autoincrement,
+    machine text not null,
+    type text not null,
+    debut text not null,
+    fin text,
+    commentaire text,
+    cree_le text default (mes_now())
+);
+create index if not exists maintenances_machine_debut_idx on maintenances (machine, debut);
+
+create table if not exists absences (
+    id integer primary key autoincrement,
+    operateur text not null,
+    debut text not null,
+    fin text not null,
+    motif text,
+    cree_le text default (mes_now())
+);
+create index if not exists absences_operateur_debut_idx on absences (operateur, debut);
+
+create table if not exists change_log (
+    id integer primary key autoincrement,
+    table_name text not null,
+    row_id integer,
+    operation text not null,
+    changed_at text default (mes_now())
+);
+""" + "".join(
+    # Journal des modifications (changes.ChangeFeed), comme sql/change_log.sql ;
+    # l'horodatage updated_at posé par trigger n'est pas journalisé une seconde fois
+    f"""
+create trigger if not exists {table}_log_{operation}
+after {operation} on {table}{" when new.updated_at is old.updated_at" if (table, operation) == ("ordres_fabrication", "update") else ""}
+begin
+    insert into change_log (table_name, row_id, operation) values ('{table}', {row}.id, '{operation}');
+end;
+"""
+    for table in ("ordres_fabrication", "defauts", "equipements", "maintenances", "absences")
+    for operation, row in (("insert", "new"), ("update", "new"), ("delete", "old"))
+)
+
+_IDENTIFIER = re.compile(r"^[^\W\d]\w*$")
+# Opérateurs acceptés dans LocalQuery.or_
+_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_IS_VALUES = {"null": "null", "true": "1", "false": "0"}
+
+
+def _quote(name):
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Identifiant invalide: {name!r}")
+    return f'"{name}"'
+
+
+class LocalQuery:
+    """Sous-ensemble du constructeur de requêtes PostgREST, exécuté sur SQLite.
+
+    Couvre les appels faits par l'application (select/insert/update/upsert/
+    delete, filtres eq/neq/in_/gt/gte/lt/lte/or_, order, range/limit).
+    """
+
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.offset = None
+        self.limit_ = None
+
+    def select(self, columns="*", count=None):
+        self.columns, self.count = columns, count
+        return self
+
+    def _filter(self, column, operator, value):
+        self.where.append(f"{_quote(column)} {operator} ?")
+        self.params.append(value)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "=", value)
+
+    def neq(self, column, value):
+        # PostgREST : neq exclut aussi les NULL
+        return self._filter(column, "<>", value)
+
+    def gt(self, column, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column, value):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "<=", value)
+
+    def or_(self, filters):
+        # Syntaxe PostgREST "colonne.opérateur.valeur,..." (valeurs sans virgule)
+        clauses = []
+        for condition in filters.split(","):
+            column, operator, value = condition.strip().split(".", 2)
+            if operator == "is":
+                clauses.append(f"{_quote(column)} is {_IS_VALUES[value]}")
+            else:
+                clauses.append(f"{_quote(column)} {_OPERATORS[operator]} ?")
+                self.params.append(value)
+        self.where.append(f"({' or '.join(clauses)})")
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.where.append("0")
+            return self
+        self.where.append(f"{_quote(column)} in ({', '.join('?' * len(values))})")
+        self.params.extend(values)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        # Ordre des NULL identique à PostgreSQL (derniers en ASC, premiers en
+        # DESC) ; inutile sur une colonne non nulle, dont l'index sert alors au tri
+        if column in self.engine._not_null(self.table):
+            self.orders.append(f"{_quote(column)} desc" if desc else _quote(column))
+        elif desc:
+            self.orders.append(f"{_quote(column)} is null desc, {_quote(column)} desc")
+        else:
+            self.orders.append(f"{_quote(column)} is null, {_quote(column)}")
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_ = start, end - start + 1
+        return self
+
+    def limit(self, n):
+        self.limit_ = n
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.operation, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.operation, self.payload = "upsert", rows
+        self.on_conflict, self.ignore_duplicates = on_conflict or "id", ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.operation, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def _where_sql(self):
+        return f" where {' and '.join(self.where)}" if self.where else ""
+
+    def execute(self):
+        return self.engine.execute(self)
+
+
+class LocalClient:
+    """Client embarqué compatible avec les appels Supabase de l'application."""
+
+    def __init__(self, path=":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        # Horodatages au format de PostgREST (UTC, microsecondes), comparables
+        # aux watermarks de DeltaSync
+        self.connection.create_function("mes_now", 0, _now)
+        self.connection.execute("pragma journal_mode = wal")
+        self.connection.executescript(LOCAL_SCHEMA)
+        self._lock = threading.RLock()
+        self._columns = {}
+        self._required = {}
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def _table_columns(self, table):
+        if table not in self._columns:
+            rows = self.connection.execute(f"pragma table_info({_quote(table)})").fetchall()
+            self._columns[table] = [row["name"] for row in rows]
+        return self._columns[table]
+
+    def _not_null(self, table):
+        if table not in self._required:
+            rows = self.connection.execute(f"pragma table_info({_quote(table)})").fetchall()
+            self._required[table] = {row["name"] for row in rows if row["notnull"] or row["pk"]}
+        return self._required[table]
+
+    def _ensure_columns(self, table, columns):
+        # Une colonne inconnue est ajoutée à la volée, comme une migration
+        known = self._table_columns(table)
+        for column in columns:
+            if column not in known:
+                self.connection.execute(f"alter table {_quote(table)} add column {_quote(column)}")
+                known.append(column)
+
+    def _select(self, query, where=None):
+        columns = "*" if query.columns.strip() == "*" else ", ".join(
+            _quote(c.strip()) for c in query.columns.split(",")
+        )
+        sql = f"select {columns} from {_quote(query.table)}{where if where is not None else query._where_sql()}"
+        if query.orders:
+            sql += " order by " + ", ".join(query.orders)
+        if query.limit_ is not None:
+            sql += f" limit {int(query.limit_)}"
+            if query.offset:
+                sql += f" offset {int(query.offset)}"
+        return [dict(row) for row in self.connection.execute(sql, query.params)]
+
+    def execute(self, query):
+        with self._lock, self.connection:
+            if query.operation == "select":
+                data = self._select(query)
+                count = None
+                if query.count:
+                    count = self.connection.execute(
+                        f"select count(*) from {_quote(query.table)}{query._where_sql()}", query.params
+                    ).fetchone()[0]
+                return SimpleNamespace(data=data, count=count)
+            if query.operation in ("insert", "upsert"):
+                return SimpleNamespace(data=self._write_rows(query), count=None)
+            if query.operation == "update":
+                self._ensure_columns(query.table, query.payload)
+                ids = [r[0] for r in self.connection.execute(
+                    f"select id from {_quote(query.table)}{query._where_sql()}", query.params)]
+                if ids:
+                    assignments = ", ".join(f"{_quote(c)} = ?" for c in query.payload)
+                    self.connection.execute(
+                        f"update {_quote(query.table)} set {assignments} where id in ({', '.join('?' * len(ids))})",
+                        [_sql_value(v) for v in query.payload.values()] + ids,
+                    )
+                return SimpleNamespace(data=self._rows_by_id(query.table, ids), count=None)
+            if query.operation == "delete":
+                data = self._select(query)
+                self.connection.execute(f"delete from {_quote(query.table)}{query._where_sql()}", query.params)
+                return SimpleNamespace(data=data, count=None)
+        raise ValueError(f"Opération inconnue: {query.operation}")
+
+    def _rows_by_id(self, table, ids):
+        if not ids:
+            return []
+        rows = self.connection.execute(
+            f"select * from {_quote(table)} where id in ({', '.join('?' * len(ids))})", ids
+        )
+        return [dict(row) for row in rows]
+
+    def _write_rows(self, query):
+        rows = query.payload if isinstance(query.payload, list) else [query.payload]
+        if not rows:
+            return []
+        columns = list(dict.fromkeys(c for row in rows for c in row))
+        self._ensure_columns(query.table, columns)
+        sql = f"insert into {_quote(query.table)} ({', '.join(map(_quote, columns))}) values ({', '.join('?' * len(columns))})"
+        if query.operation == "upsert":
+            keys = [c.strip() for c in query.on_conflict.split(",")]
+            if query.ignore_duplicates:
+                sql += f" on conflict ({', '.join(map(_quote, keys))}) do nothing"
+            else:
+                updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in columns if c not in keys)
+                sql += f" on conflict ({', '.join(map(_quote, keys))}) do " + (f"update set {updates}" if updates else "nothing")
+        sql += " returning id"
+        ids = []
+        for row in rows:
+            result = self.connection.execute(sql, [_sql_value(row.get(c)) for c in columns]).fetchone()
+            if result is not None:
+                ids.append(result[0])
+        return self._rows_by_id(query.table, ids)
+
+    def bulk_insert(self, table, df):
+        # Chargement en masse : une seule transaction, sans relire les lignes.
+        # Les dates doivent déjà être des chaînes ISO
+        if df.empty:
+            return 0
+        columns = list(df.columns)
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        with self._lock, self.connection:
+            self._ensure_columns(table, columns)
+            self.connection.executemany(
+                f"insert into {_quote(table)} ({', '.join(map(_quote, columns))}) values ({', '.join('?' * len(columns))})",
+                rows,
+            )
+        return len(df)
+
+    # Fonctions SQL appelées par supabase.rpc (voir sql/)
+    def rpc(self, name, params=None):
+        params = params or {}
+        if name == "of_distinct_values":
+            column = params["col"]
+            if column not in ("statut", "poste"):
+                raise ValueError(f"Colonne non autorisée: {column}")
+            def run():
+                rows = self.connection.execute(
+                    f"select distinct {_quote(column)} as valeur from ordres_fabrication "
+                    f"where {_quote(column)} is not null order by 1"
+                )
+                return [dict(row) for row in rows]
+        elif name == "apply_of_plan":
+            def run():
+                plan = params["plan"]
+                with self.connection:
+                    self.connection.executemany(
+                        "update ordres_fabrication set id_operateur = ?, debut_planifie = ?, fin_planifiee = ? where id = ?",
+                        [(p["id_operateur"], p["debut_planifie"], p["fin_planifiee"], p["id"]) for p in plan],
+                    )
+                return len(plan)
+        else:
+            raise ValueError(f"Fonction inconnue: {name}")
+        return _Rpc(self._lock, run)
+
+
+class _Rpc:
+    def __init__(self, lock, run):
+        self._lock, self._run = lock, run
+
+    def execute(self):
+        with self._lock:
+            return SimpleNamespace(data=self._run(), count=None)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="microseconds")
+
+
+def _sql_value(value):
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if isinstance(value, (pd.Timestamp,)):
+        return value.isoformat()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class Repository:
+    """Accès aux tables de l'atelier, indépendant du moteur de stockage.
+
+    ``client`` expose l'interface de requêtes Supabase (table().select()...)
+    utilisée par les modules spécialisés ; les méthodes ci-dessous couvrent
+    les lectures et écritures simples de l'application.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def fetch_table(self, table):
+        # Pagination par range : PostgREST plafonne chaque réponse (1000 lignes)
+        data = fetch_paginated(lambda: self.client.table(table).select("*").order("id"))
+        return pd.DataFrame(data) if data else pd.DataFrame()
+
+    def fetch_rows(self, table, row_ids):
+        # Par paquets d'ids : URL courte et réponses sous le plafond de lignes
+        return fetch_by_ids(lambda: self.client.table(table).select("*"), row_ids)
+
+    def insert(self, table, rows):
+        return self.client.table(table).insert(rows).execute().data
+
+    def update(self, table, row_id, values):
+        return self.client.table(table).update(values).eq("id", row_id).execute().data
+
+    def delete(self, table, row_ids):
+        return self.client.table(table).delete().in_("id", list(row_ids)).execute().data
+
+
+class SupabaseRepository(Repository):
+    pass
+
+
+class LocalRepository(Repository):
+    """Base SQLite embarquée, initialisée à partir des CSV de data/.
+
+    Permet de faire tourner l'application et les benchmarks sans base
+    distante, et d'exécuter des analyses SQL (group by, jointures OF ×
+    défauts, plages de dates) sur les index locaux via ``sql``.
+    """
+
+    def __init__(self, path=":memory:", data_dir=DATA_DIR, seed=True):
+        super().__init__(LocalClient(path))
+        if seed:
+            self.seed(data_dir)
+
+    def seed(self, data_dir=DATA_DIR):
+        # Les CSV ne sont chargés que dans une base vide
+        if self.client.table("ordres_fabrication").select("id").limit(1).execute().data:
+            return
+        of_csv = os.path.join(data_dir, "of_list.csv")
+        if os.path.exists(of_csv):
+            self.insert("ordres_fabrication", read_of_csv(of_csv))
+        events_csv = os.path.join(data_dir, "events.csv")
+        if os.path.exists(events_csv):
+            from events import validate_frame
+
+            events, _ = validate_frame(pd.read_csv(events_csv, dtype=str, keep_default_na=False))
+            if events:
+                self.client.table("evenements").upsert(
+                    [e._asdict() for e in events], on_conflict="timestamp,OF,evenement", ignore_duplicates=True
+                ).execute()
+
+    def load_frame(self, table, df):
+        """Charge un DataFrame dans une table locale (jeux de données de test, benchmarks)."""
+        return self.client.bulk_insert(table, df)
+
+    def sql(self, query, params=()):
+        """Requête SQL libre sur la base locale, renvoyée en DataFrame."""
+        with self.client._lock:
+            return pd.read_sql_query(query, self.client.connection, params=params)
+
+
+def open_repository(backend=None, **kwargs):
+    """Ouvre le dépôt choisi par MES_STORAGE (supabase par défaut, ou local)."""
+    backend = backend or os.environ.get("MES_STORAGE", "supabase")
+    if backend == "local":
+        path = kwargs.pop("path", os.environ.get("MES_LOCAL_DB", os.path.join(DATA_DIR, "atelier.db")))
+        return LocalRepository(path, **kwargs)
+    if backend == "supabase":
+        return SupabaseRepository(kwargs["client"])
+    raise ValueError(f"Stockage inconnu: {backend}")
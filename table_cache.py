@@ -0,0 +1,205 @@
+import itertools
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+# Les instantanés partagés reposent sur le copy-on-write : toujours actif à
+# partir de pandas 3 (requirements.txt), à activer explicitement avant
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Durée de validité (en secondes) des tables mises en cache
+TABLE_TTLS = {
+    "ordres_fabrication": 30,
+    "ressources_humaines": 300,
+    "defauts": 60,
+    "equipements": 300,
+    "evenements": 60,
+    "maintenances": 60,
+    "absences": 300,
+}
+DEFAULT_TTL = 60
+
+
+class TableCache:
+    """Cache partagé entre toutes les sessions Streamlit.
+
+    Chaque entrée est identifiée par (table, clé) : la clé ``None`` désigne
+    la table complète, les autres clés servent aux requêtes paramétrées.
+    Une écriture sur une table invalide toutes ses entrées, sauf la table
+    complète qui peut être corrigée en place via ``patch``.
+
+    ``versions(table)`` renvoie, si elle est connue, la version de la table
+    publiée par un autre processus (snapshots.SnapshotStore) : les entrées
+    de la table restent alors valides jusqu'au changement de version, au
+    lieu d'expirer au bout du TTL.
+
+    Chaque table a une génération, incrémentée par ``patch`` et
+    ``invalidate`` : un chargement commencé avant une écriture renvoie son
+    résultat mais ne l'enregistre pas, il écraserait la correction.
+    """
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL, versions=None):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.versions = versions
+        self._entries = {}
+        # Révision de chaque entrée : change à chaque chargement ou patch
+        self._revisions = {}
+        self._next_revision = itertools.count(1)
+        # Génération par table, et globale pour invalidate() sans table
+        self._generations = Counter()
+        self._epoch = 0
+        self._lock = threading.Lock()
+        # Un verrou par table pour éviter que 30 sessions rechargent la
+        # même table en même temps à l'expiration du TTL (réentrant : un
+        # chargeur peut lui-même lire une autre entrée de la même table)
+        self._load_locks = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def _ttl(self, table):
+        return self.ttls.get(table, self.default_ttl)
+
+    def _version(self, table):
+        return self.versions(table) if self.versions is not None else None
+
+    def _fresh(self, table, entry):
+        if entry is None:
+            return False
+        if entry[2] is not None:
+            return entry[2] == self._version(table)
+        return time.monotonic() - entry[0] < self._ttl(table)
+
+    def _load_lock(self, table):
+        with self._lock:
+            return self._load_locks.setdefault(table, threading.RLock())
+
+    def get(self, table, loader, key=None):
+        entry = self._entries.get((table, key))
+        if self._fresh(table, entry):
+            self.hits[table] += 1
+            return _copy(entry[1])
+
+        with self._load_lock(table):
+            # Une autre session a peut-être rechargé pendant l'attente
+            entry = self._entries.get((table, key))
+            if self._fresh(table, entry):
+                self.hits[table] += 1
+                return _copy(entry[1])
+
+            self.misses[table] += 1
+            # Version lue avant le chargement : une publication pendant
+            # celui-ci provoquera un nouveau chargement
+            version = self._version(table)
+            with self._lock:
+                generation = self._generation(table)
+            value = loader()
+            with self._lock:
+                # Écriture pendant le chargement : résultat peut-être antérieur
+                if generation == self._generation(table):
+                    self._entries[(table, key)] = (time.monotonic(), value, version)
+                    self._revisions[(table, key)] = next(self._next_revision)
+            return _copy(value)
+
+    def _generation(self, table):
+        return self._epoch, self._generations[table]
+
+    def revision(self, table, key=None):
+        """Révision de l'entrée en cache, None si elle n'est pas chargée.
+
+        Deux lectures de même révision renvoient les mêmes données : un
+        consommateur peut sauter son recalcul tant qu'elle ne change pas.
+        """
+        return self._revisions.get((table, key))
+
+    def invalidate(self, table=None, keep_full=False):
+        with self._lock:
+            if table is None:
+                self._epoch += 1
+            else:
+                self._generations[table] += 1
+            for entry_key in list(self._entries):
+                if table is not None and entry_key[0] != table:
+                    continue
+                if keep_full and entry_key[1] is None:
+                    continue
+                del self._entries[entry_key]
+                self._revisions.pop(entry_key, None)
+
+    def patch(self, table, func):
+        # Applique func au DataFrame complet en cache (s'il existe) sans
+        # repartir en base, et invalide les requêtes paramétrées de la table
+        with self._lock:
+            entry = self._entries.get((table, None))
+            if entry is not None:
+                self._entries[(table, None)] = (entry[0], func(entry[1]), entry[2])
+                self._revisions[(table, None)] = next(self._next_revision)
+        self.invalidate(table, keep_full=True)
+
+    def stats(self):
+        tables = sorted(set(self.hits) | set(self.misses))
+        rows = []
+        for table in tables:
+            hits, misses = self.hits[table], self.misses[table]
+            entry = self._entries.get((table, None))
+            memory = entry[1].memory_usage(deep=True).sum() if entry is not None and isinstance(entry[1], pd.DataFrame) else 0
+            rows.append({
+                "table": table,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "memoire_mo": round(memory / 2**20, 2),
+            })
+        return pd.DataFrame(rows, columns=["table", "hits", "misses", "hit_ratio", "memoire_mo"])
+
+
+def _copy(value):
+    # Chaque session reçoit un instantané partagé : copie superficielle, les
+    # données ne sont dupliquées (copy-on-write de pandas) que pour les
+    # colonnes qu'une session modifie
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if hasattr(value, "copy"):
+        return value.copy()
+    return value
+
+
+# Fonctions de correction du cache à partir des lignes renvoyées par Supabase
+def upsert_rows(df, rows, key="id"):
+    if not rows:
+        return df
+    new_rows = pd.DataFrame(rows)
+    if df.empty or key not in df.columns or key not in new_rows.columns:
+        return pd.concat([df, new_rows], ignore_index=True)
+    kept = df[~df[key].isin(new_rows[key])]
+    return pd.concat([kept, new_rows], ignore_index=True)
+
+
+def drop_rows(df, ids, key="id"):
+    if df.empty or key not in df.columns:
+        return df
+    return df[~df[key].isin(list(ids))].reset_index(drop=True)
+
+
+def fill_category(values, default):
+    # fillna valable aussi pour une colonne catégorielle (voir schemas.py)
+    if isinstance(values.dtype, pd.CategoricalDtype) and default not in values.cat.categories:
+        values = values.cat.add_categories([default])
+    return values.fillna(default)
+
+
+def diff_rows(df, old_hashes, key="id"):
+    """Compare chaque ligne (par clé) à l'empreinte du passage précédent.
+
+    Renvoie (empreintes courantes, clés ajoutées ou modifiées, clés dont
+    l'ancienne version doit être retirée).
+    """
+    hashes = pd.util.hash_pandas_object(df.set_index(key), index=False)
+    common = hashes.index.intersection(old_hashes.index)
+    unchanged = common[hashes.loc[common].to_numpy() == old_hashes.loc[common].to_numpy()]
+    return hashes, hashes.index.difference(unchanged), old_hashes.index.difference(unchanged)
@@ -0,0 +1,104 @@
+import datetime
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from capacity import POSTES, capacity_per_poste
+from services import get_tables, init_charge_model, run_simulation
+from simulation import SCENARIOS, build_workshop
+
+def analysis_page():
+    st.title("Analyses et Simulations")
+    
+    st.subheader("Charge vs Capacité")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        horizon = st.slider("Horizon (jours)", 7, 365, 31)
+    with col2:
+        poste = st.selectbox("Poste", ["Tous"] + POSTES)
+    with col3:
+        granularite = st.radio("Granularité", ["Jour", "Semaine"], horizontal=True)
+    
+    # Charge répartie à partir des OF (seuls les OF modifiés sont recalculés)
+    ofs_df, operators_df, equipment_df = get_tables("ordres_fabrication", "ressources_humaines", "equipements")
+    charge_model = init_charge_model(datetime.date.today())
+    charge_model.sync(ofs_df)
+    charge_model.set_capacity(capacity_per_poste(operators_df, equipment_df, charge_model.postes))
+    dates, charge, capacite = charge_model.series(
+        horizon,
+        poste=None if poste == "Tous" else poste,
+        freq="W" if granularite == "Semaine" else "D",
+    )
+    
+    df = pd.DataFrame({
+        'Date': dates,
+        'Capacité (h)': capacite,
+        'Charge (h)': charge
+    })
+    
+    fig = px.line(df, x='Date', y=['Capacité (h)', 'Charge (h)'])
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Section de simulation
+    st.subheader("Simulation \"Et si...\"")
+    
+    st.write("Simulez l'impact d'un changement sur votre production")
+    
+    # Hors du formulaire pour que les champs du scénario suivent la sélection
+    scenario = st.selectbox("Type de scénario", SCENARIOS)
+    workshop = build_workshop(ofs_df, operators_df, equipment_df)
+    
+    with st.form("simulation_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            duree = st.slider("Durée (jours)", 1, 14, 5)
+        with col2:
+            n_replications = st.select_slider("Nombre de réplications", [100, 200, 500, 1000, 2000, 5000], value=500)
+        
+        params = {'duree': duree}
+        if scenario == "Absence d'un opérateur clé":
+            params['target'] = st.selectbox("Opérateur absent", workshop['operators'])
+        elif scenario == "Panne machine":
+            params['target'] = st.selectbox("Machine en panne", workshop['machines'])
+        elif scenario == "Ajout d'un opérateur":
+            params['poste'] = st.selectbox("Poste renforcé", workshop['postes'])
+        elif scenario == "Commande urgente":
+            params['volume'] = st.number_input("Volume (heures)", min_value=1, value=24)
+            params['poste'] = st.selectbox("Poste", workshop['postes'])
+        
+        submit = st.form_submit_button("Simuler")
+        
+        if submit:
+            progress_bar = st.progress(0.0, text="Simulation en cours...")
+            result = run_simulation(
+                workshop, scenario, params, n_replications,
+                progress=lambda done: progress_bar.progress(done, text=f"Simulation en cours... {done:.0%}"),
+            )
+            progress_bar.empty()
+            
+            impact = result['impact']
+            summary = result['summary']
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric(
+                    "Impact sur le retard moyen",
+                    f"{impact.loc['retard_moyen_j', 'moyenne']:+.2f} jours",
+                    help=f"IC 95 % : [{impact.loc['retard_moyen_j', 'ic95_bas']:+.2f} ; {impact.loc['retard_moyen_j', 'ic95_haut']:+.2f}]",
+                    delta_color="off",
+                )
+            with col2:
+                st.metric(
+                    "Taux d'occupation",
+                    f"{summary.loc['occupation', 'moyenne']:.0f}%",
+                    f"{impact.loc['occupation', 'moyenne']:+.1f}%",
+                    help=f"IC 95 % : [{summary.loc['occupation', 'ic95_bas']:.1f} ; {summary.loc['occupation', 'ic95_haut']:.1f}]",
+                )
+            
+            # Distribution de l'impact sur l'ensemble des réplications
+            delays = pd.DataFrame({
+                "Écart de retard moyen (jours)": result['scenario'][:, 0] - result['baseline'][:, 0],
+            })
+            st.plotly_chart(px.histogram(delays, x="Écart de retard moyen (jours)", nbins=40), use_container_width=True)
+            st.dataframe(impact.round(2), use_container_width=True)
@@ -0,0 +1,80 @@
+import pandas as pd
+import streamlit as st
+
+from kpi import HOURS_PER_DAY, PERIODS, overrun_alerts
+from services import LIVE_REFRESH_SECONDS, get_tables, init_kpi_engine, table_revisions
+
+# Alertes détaillées une à une, les suivantes dans un tableau
+MAX_ALERTS = 5
+
+def format_kpi(value):
+    return "-" if value is None else f"{value:.1f}%"
+
+def format_kpi_delta(current, previous):
+    if current is None or previous is None:
+        return None
+    # Écart de deux pourcentages : en points
+    return f"{current - previous:+.1f} pts"
+
+# Tuiles KPI : fragment rafraîchi seul, les modifications arrivent par le flux
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def kpi_tiles(period, capacity):
+    # Mise à jour incrémentale des agrégats, sautée tant que les tables en
+    # cache n'ont pas changé (seules les lignes modifiées sont relues sinon)
+    revision = table_revisions("ordres_fabrication", "defauts")
+    ofs_df, defects_df = get_tables("ordres_fabrication", "defauts")
+    kpi_engine = init_kpi_engine()
+    kpi_engine.update(ofs_df, defects_df, revision)
+    
+    end = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+    current, previous = kpi_engine.compare(end, PERIODS[period], capacity)
+    
+    # Métriques clés (écart par rapport à la période précédente)
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Productivité", format_kpi(current['productivite']),
+                  format_kpi_delta(current['productivite'], previous['productivite']))
+    with col2:
+        st.metric("Respect délais", format_kpi(current['respect_delais']),
+                  format_kpi_delta(current['respect_delais'], previous['respect_delais']))
+    with col3:
+        st.metric("Taux retouche", format_kpi(current['taux_retouche']),
+                  format_kpi_delta(current['taux_retouche'], previous['taux_retouche']),
+                  delta_color="inverse")
+    with col4:
+        st.metric("Taux occupation", format_kpi(current['taux_occupation']),
+                  format_kpi_delta(current['taux_occupation'], previous['taux_occupation']))
+
+def dashboard_page():
+    st.title("Tableau de bord - Pilotage d'Atelier")
+    
+    revision = table_revisions("ordres_fabrication", "defauts")
+    ofs_df, defects_df, equipment_df = get_tables("ordres_fabrication", "defauts", "equipements")
+    kpi_engine = init_kpi_engine()
+    kpi_engine.update(ofs_df, defects_df, revision)
+    capacity = len(equipment_df) * HOURS_PER_DAY if not equipment_df.empty else None
+    
+    period = st.radio("Période", list(PERIODS), index=1, horizontal=True)
+    end = pd.Timestamp.now().normalize() + pd.Timedelta(days=1)
+    kpi_tiles(period, capacity)
+    
+    # Graphiques
+    st.subheader("Productivité par poste")
+    by_poste = kpi_engine.productivity_by_poste(end - pd.Timedelta(days=PERIODS[period]), end)
+    if not by_poste.empty:
+        st.bar_chart(by_poste.rename_axis('Poste').rename('Productivité'))
+    else:
+        st.info("Aucun OF terminé avec un temps réel sur la période.")
+    
+    # Alertes
+    st.subheader("Alertes actives")
+    alerts = overrun_alerts(ofs_df)
+    if alerts.empty:
+        st.info("Aucune alerte active.")
+    for _, row in alerts.head(MAX_ALERTS).iterrows():
+        st.warning(f"⚠️ Retard sur {row.get('numero_of', row.get('id'))}: temps réel à {row['depassement']:.0%} du standard")
+    if len(alerts) > MAX_ALERTS:
+        with st.expander(f"{len(alerts) - MAX_ALERTS} autre(s) OF au-delà de 125% du standard"):
+            columns = [c for c in ['numero_of', 'poste', 'statut', 'temps_standard', 'temps_reel', 'depassement'] if c in alerts.columns]
+            st.dataframe(alerts.iloc[MAX_ALERTS:][columns], hide_index=True, use_container_width=True)
@@ -0,0 +1,157 @@
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from dates import utc_now
+from services import (
+    OEE_WINDOW_DAYS, close_failure, declare_failure, get_all_equipment, get_maintenance_log,
+    get_oee_model, plan_maintenance,
+)
+
+STATUTS_MACHINE = ["En production", "En maintenance", "Arrêtée"]
+STATUT_ICONS = {"En production": "🟢", "En maintenance": "🟠", "Arrêtée": "🔴"}
+
+# Colonnes de la grille des machines
+EQUIPMENT_GRID_CONFIG = {
+    'Taux utilisation': st.column_config.ProgressColumn("Taux utilisation", format="%.0f%%", min_value=0, max_value=100),
+    'Dernière maintenance': st.column_config.DateColumn("Dernière maintenance", format="YYYY-MM-DD"),
+    'Prochaine maintenance': st.column_config.DateColumn("Prochaine maintenance", format="YYYY-MM-DD"),
+    'MTBF (h)': st.column_config.NumberColumn("MTBF (h)", format="%.0f"),
+    'MTTR (h)': st.column_config.NumberColumn("MTTR (h)", format="%.1f"),
+}
+
+def equipment_table(equipment_df, reliability, utilisation):
+    # Une ligne par machine : état, fiabilité et utilisation
+    machines = equipment_df['nom'].astype(str)
+    stats = reliability.reindex(machines)
+    return pd.DataFrame({
+        'Machine': machines.to_numpy(),
+        'Poste': equipment_df['poste'].astype(object).to_numpy() if 'poste' in equipment_df.columns else None,
+        'Statut': [f"{STATUT_ICONS.get(s, '⚪')} {s}" for s in equipment_df['statut'].astype(object)] if 'statut' in equipment_df.columns else None,
+        'Dernière maintenance': stats[['derniere_maintenance', 'derniere_panne']].max(axis=1).to_numpy(),
+        'Prochaine maintenance': stats['prochaine_maintenance'].to_numpy(),
+        'Pannes': stats['n_pannes'].fillna(0).astype(int).to_numpy(),
+        'MTBF (h)': stats['mtbf_h'].to_numpy(),
+        'MTTR (h)': stats['mttr_h'].to_numpy(),
+        'Taux utilisation': utilisation.reindex(machines).to_numpy(),
+    })
+
+def machine_panel(machine, log):
+    st.subheader(machine)
+    tab_history, tab_failure, tab_plan = st.tabs(["Voir historique", "Déclarer panne", "Planifier maintenance"])
+
+    with tab_history:
+        today = datetime.date.today()
+        period = st.date_input("Période", (today - datetime.timedelta(days=365), today), key="maintenance_period")
+        if isinstance(period, (tuple, list)) and len(period) == 2:
+            history = log.history(machine, pd.Timestamp(period[0]), pd.Timestamp(period[1]) + pd.Timedelta(days=1))
+            if history.empty:
+                st.info("Aucune panne ni maintenance sur la période.")
+            else:
+                duree = (history['fin'] - history['debut']).dt.total_seconds() / 3600
+                st.dataframe(
+                    history[['type', 'debut', 'fin', 'commentaire']].assign(duree_h=duree.round(1)).iloc[::-1],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+    with tab_failure:
+        open_failures = log.open_failures()
+        if machine in open_failures.index:
+            failure = open_failures.loc[machine]
+            st.warning(f"Panne en cours depuis le {failure['debut']:%Y-%m-%d %H:%M}")
+            if st.button("Remettre en service"):
+                close_failure(failure['id'], machine)
+                st.rerun()
+        else:
+            with st.form("failure_form", clear_on_submit=True):
+                commentaire = st.text_input("Commentaire")
+                if st.form_submit_button("Déclarer panne"):
+                    declare_failure(machine, commentaire)
+                    st.rerun()
+
+    with tab_plan:
+        with st.form("maintenance_form", clear_on_submit=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                date = st.date_input("Date", datetime.date.today() + datetime.timedelta(days=7))
+                heure = st.time_input("Heure", datetime.time(6, 0))
+            with col2:
+                duree = st.number_input("Durée (heures)", min_value=0.5, value=4.0, step=0.5)
+                commentaire = st.text_input("Commentaire")
+            if st.form_submit_button("Planifier maintenance"):
+                plan_maintenance(machine, datetime.datetime.combine(date, heure), duree, commentaire)
+                st.success(f"Maintenance planifiée le {date:%Y-%m-%d} à {heure:%H:%M}")
+
+def equipment_page():
+    st.title("Gestion des Équipements")
+
+    equipment_df = get_all_equipment()
+    log = get_maintenance_log()
+
+    # Taux d'utilisation calculé sur 7 jours à partir des événements d'arrêt
+    end = utc_now()
+    start = end - pd.Timedelta(days=OEE_WINDOW_DAYS)
+    oee_model = get_oee_model()
+
+    # État des machines
+    st.subheader("État des machines")
+    if equipment_df.empty or 'nom' not in equipment_df.columns:
+        st.info("Aucun équipement enregistré.")
+    else:
+        reliability = log.reliability(end)
+        table = equipment_table(equipment_df, reliability, oee_model.utilisation(start, end).round(0))
+
+        statuts = equipment_df['statut'].astype(object) if 'statut' in equipment_df.columns else pd.Series(dtype=object)
+        due = table['Prochaine maintenance'] <= end + pd.Timedelta(days=7)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("En production", int((statuts == "En production").sum()))
+        col2.metric("En maintenance", int((statuts == "En maintenance").sum()))
+        col3.metric("Arrêtées", int((statuts == "Arrêtée").sum()))
+        col4.metric("Maintenances à 7 jours", int(due.sum()))
+
+        # Filtres, puis une grille unique quel que soit le nombre de machines
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            statut_filter = st.multiselect("Statut", STATUTS_MACHINE)
+        with col2:
+            poste_filter = st.multiselect("Poste", sorted(table['Poste'].dropna().unique()))
+        with col3:
+            search = st.text_input("Rechercher une machine")
+        mask = pd.Series(True, index=table.index)
+        if statut_filter:
+            mask &= statuts.isin(statut_filter).to_numpy()
+        if poste_filter:
+            mask &= table['Poste'].isin(poste_filter)
+        if search:
+            mask &= table['Machine'].str.contains(search, case=False, regex=False)
+        if st.checkbox("Maintenances à 7 jours seulement"):
+            mask &= due
+        grid_df = table[mask].reset_index(drop=True)
+
+        selection = st.dataframe(
+            grid_df,
+            hide_index=True,
+            use_container_width=True,
+            column_config=EQUIPMENT_GRID_CONFIG,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="equipment_grid",
+        )
+        if selection.selection.rows:
+            machine_panel(grid_df.iloc[selection.selection.rows[0]]['Machine'], log)
+        else:
+            st.caption("Sélectionnez une machine pour voir son historique, déclarer une panne ou planifier une maintenance.")
+
+    # TRS = disponibilité × performance × qualité
+    st.subheader(f"TRS ({OEE_WINDOW_DAYS} derniers jours)")
+    maille = st.radio("Maille", ["Jour", "Équipe"], horizontal=True)
+    if maille == "Jour":
+        trs = oee_model.daily(start, end + pd.Timedelta(days=1))
+    else:
+        trs = oee_model.by_shift(start, end + pd.Timedelta(days=1))
+    if trs.empty:
+        st.info("Aucun événement machine sur la période.")
+    else:
+        st.dataframe(trs.round(dict.fromkeys(trs.select_dtypes('number').columns, 3)), hide_index=True, use_container_width=True)
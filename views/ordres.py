@@ -0,0 +1,457 @@
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from connection import fetch_concurrently
+from of_bulk import read_of_csv
+from scheduler import write_plan
+from services import (
+    LIVE_REFRESH_SECONDS, absence_periods, bulk_delete_ofs, bulk_terminate_ofs, bulk_upsert_ofs, cache,
+    create_new_of, get_all_ofs, get_client, get_of_filter_values, get_of_page, get_operator_index,
+    get_planner, init_change_feed, init_ingestor, update_of,
+)
+from staffing import of_days
+from table_cache import TABLE_TTLS
+
+def operator_selectbox(poste, start, end, current=None):
+    # Opérateurs qualifiés et présents sur la période, meilleurs niveaux
+    # d'abord ; à défaut, tous les opérateurs
+    index = get_operator_index()
+    operateurs = [name for name, _ in index.available(poste, start, end)]
+    if not operateurs:
+        st.caption(f"Aucun opérateur qualifié disponible sur {poste} pour cette période.")
+        operateurs = list(index.names)
+    if current and current not in operateurs:
+        operateurs.insert(0, current)
+
+    def label(name):
+        level = index.level(name, poste)
+        text = f"{name} (niveau {level})" if level else f"{name} (non qualifié)"
+        return text if name not in index.names or index.is_available(name, start, end) else f"{text} - absent"
+
+    return st.selectbox("Opérateur", operateurs, index=operateurs.index(current) if current in operateurs else 0, format_func=label)
+
+# Colonnes affichées dans la grille des OF
+OF_GRID_COLUMNS = [
+    'numero_of', 'poste', 'statut', 'priorite', 'progression',
+    'id_operateur', 'date_debut', 'date_fin', 'temps_standard', 'temps_reel',
+]
+OF_GRID_CONFIG = {
+    'maj': st.column_config.TextColumn("", width="small", help="Mis à jour depuis le dernier affichage"),
+    'numero_of': st.column_config.TextColumn("OF"),
+    'poste': st.column_config.TextColumn("Poste"),
+    'statut': st.column_config.TextColumn("Statut"),
+    'priorite': st.column_config.NumberColumn("Priorité", format="%d"),
+    'progression': st.column_config.ProgressColumn("Progression", min_value=0, max_value=100, format="%d%%"),
+    'id_operateur': st.column_config.TextColumn("Opérateur"),
+    'date_debut': st.column_config.TextColumn("Date de début"),
+    'date_fin': st.column_config.TextColumn("Date de fin"),
+    'temps_standard': st.column_config.NumberColumn("Temps standard (h)"),
+    'temps_reel': st.column_config.NumberColumn("Temps réel (h)"),
+}
+
+def of_detail_panel(row):
+    with st.container(border=True):
+        st.subheader(f"{row.get('numero_of', 'OF')} - {row.get('poste', 'Non spécifié')} ({row.get('statut', 'Non spécifié')})")
+        if 'progression' in row and pd.notna(row['progression']):
+            st.progress(row['progression'] / 100)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**Opérateur:** {row.get('id_operateur', 'Non assigné')}")
+            st.write(f"**Date de début:** {row.get('date_debut', 'Non définie')}")
+            if 'temps_standard' in row:
+                st.write(f"**Temps standard:** {row['temps_standard']} heures")
+        with col2:
+            st.write(f"**Priorité:** {row.get('priorite', 'Non définie')}")
+            if 'date_fin' in row and pd.notna(row['date_fin']):
+                st.write(f"**Date de fin:** {row['date_fin']}")
+            if 'temps_reel' in row and pd.notna(row['temps_reel']):
+                st.write(f"**Temps réel:** {row['temps_reel']} heures")
+
+def show_bulk_result(result):
+    n_ok = int(result['ok'].sum())
+    if n_ok:
+        st.success(f"{n_ok} OF traité(s) : {result.loc[result['ok'], 'message'].iloc[0]}.")
+    failed = result[~result['ok']]
+    if not failed.empty:
+        st.warning(f"{len(failed)} OF non traité(s)")
+        st.dataframe(failed, hide_index=True)
+
+def of_page():
+    st.title("Gestion des Ordres de Fabrication")
+    
+    tab1, tab2, tab3, tab4 = st.tabs(["Liste des OF", "Nouvel OF", "Événements", "Planning"])
+    
+    with tab1:
+        of_list()
+        of_list_watcher()
+    
+    with tab2:
+        new_of_form()
+    
+    with tab3:
+        events_tab()
+    
+    with tab4:
+        planning_tab()
+
+def of_list_marker(feed):
+    # Change quand la liste doit être redessinée : version des OF dans le flux,
+    # ou, sans journal des modifications, à chaque expiration du cache
+    if feed.enabled:
+        return feed.version("ordres_fabrication")
+    return int(time.monotonic() // TABLE_TTLS["ordres_fabrication"])
+
+# Surveillance légère : la liste n'est redessinée que si des OF ont changé
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def of_list_watcher():
+    if st.session_state.get("of_list_marker") != of_list_marker(init_change_feed()):
+        st.rerun()
+
+# Liste des OF : fragment redessiné seul après chaque action
+@st.fragment
+def of_list():
+    # OF modifiés (par cette session ou ailleurs) depuis le dernier rendu de la liste
+    feed = init_change_feed()
+    st.session_state.of_list_marker = of_list_marker(feed)
+    changed_ids = feed.changed_ids("ordres_fabrication", st.session_state.get("of_feed_position", feed.position))
+    st.session_state.of_feed_position = feed.position
+    
+    if 'edit_of' in st.session_state:
+        edit_of_form()
+    
+    # Valeurs possibles des filtres, sans télécharger toute la table
+    filter_values = fetch_concurrently({
+        column: lambda column=column: get_of_filter_values(column)
+        for column in ("statut", "poste")
+    })
+    statut_options = filter_values["statut"]
+    poste_options = filter_values["poste"]
+    
+    if statut_options or poste_options:
+        # Filtres
+        col1, col2 = st.columns(2)
+        with col1:
+            statut_filter = st.multiselect(
+                "Filtrer par statut", 
+                statut_options, 
+                default=statut_options
+            )
+        with col2:
+            poste_filter = st.multiselect(
+                "Filtrer par poste", 
+                poste_options, 
+                default=poste_options
+            )
+        
+        # Filtres, tri par priorité et pagination exécutés par la base
+        page_size = st.session_state.get("of_page_size", 500)
+        page_num = st.session_state.get("of_page_num", 1)
+        filtered_df, total = get_of_page(statut_filter, poste_filter, page_num - 1, page_size)
+        n_pages = max(1, -(-total // page_size))
+        if page_num > n_pages:
+            st.session_state.of_page_num = n_pages
+            filtered_df, total = get_of_page(statut_filter, poste_filter, n_pages - 1, page_size)
+        
+        if 'date_debut' in filtered_df.columns and pd.api.types.is_datetime64_any_dtype(filtered_df['date_debut']):
+            filtered_df['date_debut'] = filtered_df['date_debut'].dt.strftime('%Y-%m-%d')
+        
+        # Résultat de la dernière action groupée
+        if 'of_bulk_result' in st.session_state:
+            show_bulk_result(st.session_state.pop('of_bulk_result'))
+        
+        # Grille unique (virtualisée côté navigateur) : seules les lignes
+        # visibles sont dessinées, la sélection alimente le panneau détail
+        grid_columns = [c for c in OF_GRID_COLUMNS if c in filtered_df.columns]
+        grid_df = filtered_df[grid_columns].reset_index(drop=True)
+        if 'id' in filtered_df.columns:
+            updated = filtered_df['id'].isin(changed_ids).to_numpy()
+            grid_df.insert(0, 'maj', np.where(updated, "🔄", ""))
+            if updated.any():
+                st.caption(f"🔄 {int(updated.sum())} OF de la page mis à jour depuis le dernier affichage")
+        # La sélection est mémorisée par position : dès que la page change
+        # (écriture d'un autre utilisateur, tri par priorité), nouvelle grille
+        # et sélection vide, pour qu'une position ne désigne jamais un autre OF
+        page_ids = tuple(filtered_df['id'].tolist()) if 'id' in filtered_df.columns else ()
+        if st.session_state.get('of_grid_ids') != page_ids:
+            st.session_state.of_grid_ids = page_ids
+            st.session_state.of_grid_version = st.session_state.get('of_grid_version', 0) + 1
+        selection = st.dataframe(
+            grid_df,
+            hide_index=True,
+            use_container_width=True,
+            column_config=OF_GRID_CONFIG,
+            on_select="rerun",
+            selection_mode="multi-row",
+            key=f"of_grid_{st.session_state.get('of_grid_version', 0)}",
+        )
+        selected_df = filtered_df.iloc[selection.selection.rows]
+        
+        if not selected_df.empty:
+            if len(selected_df) == 1:
+                of_detail_panel(selected_df.iloc[0])
+            else:
+                st.caption(f"{len(selected_df)} OF sélectionnés")
+            
+            # Actions sur la sélection
+            action_col1, action_col2, action_col3 = st.columns(3)
+            with action_col1:
+                if st.button("Modifier", disabled=len(selected_df) != 1):
+                    st.session_state.edit_of = selected_df.iloc[0].get('id')
+                    st.rerun(scope="fragment")
+            
+            # Terminer et supprimer passent par une confirmation hors du
+            # rafraîchissement automatique, sur les ids sélectionnés
+            with action_col2:
+                to_close = selected_df[selected_df['statut'] != "Terminé"] if 'statut' in selected_df.columns else selected_df
+                if st.button(f"Terminer ({len(to_close)})", disabled=to_close.empty):
+                    confirm_bulk_action("terminer", to_close['id'].tolist())
+            
+            with action_col3:
+                if st.button(f"Supprimer ({len(selected_df)})"):
+                    confirm_bulk_action("supprimer", selected_df['id'].tolist())
+        
+        # Pagination
+        page_col1, page_col2, page_col3 = st.columns([1, 1, 2])
+        with page_col1:
+            st.number_input("Page", min_value=1, max_value=n_pages, key="of_page_num")
+        with page_col2:
+            st.selectbox("OF par page", [100, 500, 1000, 5000], index=1, key="of_page_size")
+        with page_col3:
+            st.caption(f"{total} OF correspondant aux filtres - page {st.session_state.of_page_num}/{n_pages}")
+    else:
+        st.info("Aucun ordre de fabrication trouvé. Créez-en un avec l'onglet 'Nouvel OF'.")
+
+@st.dialog("Confirmer l'action groupée", width="large")
+def confirm_bulk_action(action, of_ids):
+    # Les OF sont relus par id : la liste affichée est exactement celle traitée
+    ofs = get_all_ofs()
+    targets = ofs[ofs['id'].isin(of_ids)] if 'id' in ofs.columns else ofs.iloc[:0]
+    if action == "terminer" and 'statut' in targets.columns:
+        targets = targets[targets['statut'] != "Terminé"]
+    if len(targets) < len(of_ids):
+        st.caption(f"{len(of_ids) - len(targets)} OF sélectionné(s) déjà {'terminé(s) ou ' if action == 'terminer' else ''}supprimé(s) entre-temps.")
+    if targets.empty:
+        st.info("Aucun OF à traiter.")
+    else:
+        st.write(f"{len(targets)} OF à {action} :")
+        st.dataframe(targets.reindex(columns=['numero_of', 'poste', 'statut', 'id_operateur']), hide_index=True, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Confirmer", type="primary", disabled=targets.empty):
+            ids = targets['id'].tolist()
+            st.session_state.of_bulk_result = bulk_terminate_ofs(ids) if action == "terminer" else bulk_delete_ofs(ids)
+            st.session_state.of_grid_version = st.session_state.get('of_grid_version', 0) + 1
+            st.rerun()
+    with col2:
+        if st.button("Annuler", key="bulk_cancel"):
+            st.rerun()
+
+# Création d'OF et import CSV : fragment indépendant de la liste
+@st.fragment
+def new_of_form():
+    st.subheader("Créer un nouvel ordre de fabrication")
+    # Poste, date et durée hors du formulaire : ils filtrent la liste des opérateurs
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        postes = ["Assemblage", "Peinture", "Usinage", "Contrôle", "Emballage"]
+        poste = st.selectbox("Poste", postes)
+    with col2:
+        date_debut = st.date_input("Date de début")
+    with col3:
+        temps_standard = st.number_input("Temps standard (heures)", min_value=0.1, value=1.0)
+    
+    with st.form("new_of_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            of_num = st.text_input("Numéro OF")
+        
+        with col2:
+            operateur = operator_selectbox(poste, *of_days(date_debut, temps_standard))
+            priorite = st.slider("Priorité", 1, 5, 3)
+        
+        submit = st.form_submit_button("Créer OF")
+        if submit:
+            # Créer un nouvel OF dans la base de données
+            new_of = {
+                'numero_of': of_num,
+                'poste': poste,
+                'id_operateur': operateur,
+                'date_debut': date_debut.isoformat(),
+                'temps_standard': temps_standard,
+                'statut': 'Planifié',
+                'priorite': priorite,
+                'progression': 0
+            }
+            
+            # La liste le montrera à son prochain rafraîchissement (flux des modifications)
+            create_new_of(new_of)
+            st.success(f"OF {of_num} créé avec succès!")
+    
+    # Import groupé d'OF planifiés (format data/of_list.csv)
+    st.subheader("Importer des OF planifiés")
+    uploaded = st.file_uploader("Fichier CSV", type="csv", key="of_import")
+    if uploaded is not None and st.button("Importer les OF"):
+        try:
+            rows = read_of_csv(uploaded)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            show_bulk_result(bulk_upsert_ofs(rows))
+
+
+def planning_tab():
+    st.subheader("Planning à capacité finie")
+    planner = get_planner()
+    if not planner.operators:
+        st.warning("Aucun opérateur enregistré : renseignez les ressources humaines avant de planifier.")
+        return
+    
+    if st.button("Calculer le planning"):
+        with st.spinner("Ordonnancement des OF ouverts..."):
+            planner.schedule(get_all_ofs(), absence_periods(datetime.date.today()))
+    
+    plan = planner.plan()
+    if plan.empty:
+        st.info("Aucun planning calculé.")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("OF planifiés", len(plan))
+    with col2:
+        st.metric("OF en retard", int((plan['retard_h'] > 0).sum()))
+    with col3:
+        st.metric("OF sans opérateur qualifié", len(planner.unplanned()))
+    
+    # Diagramme de Gantt des prochains jours uniquement
+    horizon = st.slider("Jours affichés", 1, 30, 5)
+    end = pd.Timestamp(datetime.date.today()) + pd.Timedelta(days=horizon)
+    gantt = plan[plan['debut_planifie'] < end]
+    if not gantt.empty:
+        fig = px.timeline(gantt, x_start='debut_planifie', x_end='fin_planifiee', y='id_operateur', color='poste', hover_data=['id'])
+        st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(plan, hide_index=True, use_container_width=True)
+    
+    if st.button("Appliquer le planning"):
+        write_plan(get_client(), plan)
+        cache.invalidate("ordres_fabrication")
+        st.success(f"Planning de {len(plan)} OF enregistré.")
+
+def events_tab():
+    ingestor = init_ingestor()
+    st.subheader("Déclarer un événement")
+    with st.form("event_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            event_of = st.text_input("Numéro OF")
+            evenement = st.selectbox("Événement", ["debut", "fin", "arret", "reprise", "production"])
+            type_arret = st.text_input("Type d'arrêt")
+        with col2:
+            quantite = st.number_input("Quantité", min_value=0, value=0)
+            commentaire = st.text_input("Commentaire")
+        
+        if st.form_submit_button("Enregistrer"):
+            try:
+                accepted = ingestor.submit({
+                    'timestamp': pd.Timestamp.now().isoformat(),
+                    'OF': event_of,
+                    'evenement': evenement,
+                    'type_arret': type_arret,
+                    'commentaire': commentaire,
+                    'quantite': quantite,
+                })
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                if accepted:
+                    st.success("Événement enregistré.")
+                else:
+                    st.warning("Événement ignoré (doublon ou file d'écriture pleine).")
+    
+    st.subheader("Importer un fichier d'événements")
+    uploaded = st.file_uploader("Fichier CSV (format data/events.csv)", type="csv")
+    if uploaded is not None and st.button("Importer"):
+        try:
+            accepted, rejected = ingestor.ingest_file(uploaded)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success(f"{accepted} événements mis en file d'écriture.")
+            if not rejected.empty:
+                st.warning(f"{len(rejected)} lignes rejetées")
+                st.dataframe(rejected, hide_index=True)
+    
+    stats = ingestor.stats
+    st.caption(
+        f"En attente: {ingestor.pending()} - écrits: {stats['written']} - doublons: {stats['duplicates']}"
+        f" - rejetés: {stats['rejected']} - échecs: {stats['failed']} - perdus: {stats['lost']}"
+    )
+    if ingestor.failed and st.button(f"Réessayer les {len(ingestor.failed)} événements en échec"):
+        st.success(f"{ingestor.retry_failed()} événements remis en file d'écriture.")
+
+# Formulaire d'édition de l'OF choisi dans la liste, affiché au-dessus de la grille
+def edit_of_form():
+    of_id = st.session_state.edit_of
+    # Récupérer les données de l'OF depuis la copie synchronisée
+    ofs_df = get_all_ofs()
+    of_data = []
+    if not ofs_df.empty:
+        of_rows = ofs_df[ofs_df['id'] == of_id]
+        of_data = of_rows.astype(object).where(of_rows.notna(), None).to_dict('records')
+    
+    if of_data:
+        of = of_data[0]
+        st.subheader(f"Modifier OF {of.get('numero_of')}")
+        
+        with st.form("edit_of_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                poste = st.selectbox("Poste", ["Assemblage", "Peinture", "Usinage", "Contrôle", "Emballage"], index=["Assemblage", "Peinture", "Usinage", "Contrôle", "Emballage"].index(of.get('poste', "Assemblage")))
+                
+                # Opérateurs classés pour le poste actuel de l'OF, sur ses jours restants
+                start = max(pd.Timestamp(of.get('date_debut') or pd.Timestamp.now()).date(), datetime.date.today())
+                remaining = float(of.get('temps_standard') or 0) * (1 - float(of.get('progression') or 0) / 100)
+                operateur = operator_selectbox(of.get('poste'), *of_days(start, remaining), current=of.get('id_operateur'))
+            
+            with col2:
+                priorite = st.slider("Priorité", 1, 5, int(of.get('priorite') or 3))
+                progression = st.slider("Progression", 0, 100, int(of.get('progression') or 0))
+            
+            temps_standard = st.number_input("Temps standard (heures)", min_value=0.1, value=float(of.get('temps_standard') or 1.0))
+            temps_reel = st.number_input("Temps réel (heures)", min_value=0.0, value=float(of.get('temps_reel') or 0.0))
+            
+            statut = st.selectbox("Statut", ["Planifié", "En cours", "Terminé"], index=["Planifié", "En cours", "Terminé"].index(of.get('statut', "Planifié")))
+            
+            save = st.form_submit_button("Enregistrer")
+            if save:
+                update_data = {
+                    'poste': poste,
+                    'id_operateur': operateur,
+                    'priorite': priorite,
+                    'progression': progression,
+                    'temps_standard': temps_standard,
+                    'temps_reel': temps_reel,
+                    'statut': statut,
+                }
+                
+                # Si l'OF est marqué comme terminé, ajouter la date de fin
+                if statut == "Terminé" and of.get('statut') != "Terminé":
+                    update_data['date_fin'] = pd.Timestamp.now().isoformat()
+                
+                update_of(of_id, update_data)
+                st.success(f"OF {of.get('numero_of')} mis à jour avec succès!")
+                
+                # Réinitialiser l'état d'édition et rafraîchir la liste seule
+                del st.session_state.edit_of
+                st.rerun(scope="fragment")
+        
+        if st.button("Annuler"):
+            del st.session_state.edit_of
+            st.rerun(scope="fragment")
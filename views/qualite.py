@@ -0,0 +1,146 @@
+import datetime
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from capacity import POSTES
+from quality import GRAVITES, PARETO_DIMENSIONS, RULES
+from services import get_tables, init_defect_writer, init_quality_engine
+
+# Taille des sous-groupes des cartes de contrôle
+CHART_FREQUENCIES = {"Jour": "D", "Semaine": "W-MON", "Mois": "MS"}
+
+def pareto_figure(pareto, label):
+    fig = go.Figure()
+    fig.add_bar(x=pareto.index.astype(str), y=pareto['n_defauts'], name="Défauts",
+                marker_color=["#d62728" if vital else "#7f7f7f" for vital in pareto['vital']])
+    fig.add_scatter(x=pareto.index.astype(str), y=pareto['cumul'], name="% cumulé", yaxis="y2", mode="lines+markers")
+    fig.update_layout(
+        xaxis_title=label,
+        yaxis_title="Nombre de défauts",
+        yaxis2=dict(title="% cumulé", overlaying="y", side="right", range=[0, 105]),
+        legend=dict(orientation="h"),
+    )
+    return fig
+
+def control_figure(chart, title):
+    fig = go.Figure()
+    fig.add_scatter(x=chart.index, y=chart['valeur'], name=title, mode="lines+markers")
+    fig.add_scatter(x=chart.index, y=chart['lcs'], name="LCS", line=dict(dash="dash", color="red"))
+    fig.add_scatter(x=chart.index, y=chart['lci'], name="LCI", line=dict(dash="dash", color="red"))
+    fig.add_scatter(x=chart.index, y=chart['centre'], name="Moyenne", line=dict(color="green"))
+    alerts = chart[chart['regles'] != ""]
+    if not alerts.empty:
+        fig.add_scatter(x=alerts.index, y=alerts['valeur'], name="Hors contrôle", mode="markers",
+                        marker=dict(color="red", size=11, symbol="x"), text=alerts['regles'])
+    fig.update_layout(legend=dict(orientation="h"))
+    return fig
+
+def quality_page():
+    st.title("Suivi Qualité")
+    st.write("Suivi des défauts et des retouches")
+
+    # Mise à jour incrémentale des agrégats (seuls les défauts et OF modifiés sont relus)
+    defects_df, ofs_df = get_tables("defauts", "ordres_fabrication")
+    engine = init_quality_engine()
+    engine.update(defects_df, ofs_df)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        today = datetime.date.today()
+        period = st.date_input("Période", (today - datetime.timedelta(days=90), today))
+    with col2:
+        poste_filter = st.selectbox("Poste", ["Tous"] + POSTES)
+    if not isinstance(period, (tuple, list)) or len(period) != 2:
+        st.info("Choisissez une date de début et une date de fin.")
+        return
+    start, end = pd.Timestamp(period[0]), pd.Timestamp(period[1]) + pd.Timedelta(days=1)
+    poste = None if poste_filter == "Tous" else poste_filter
+
+    # Pareto des défauts
+    st.subheader("Pareto des défauts")
+    label = st.radio("Répartition par", list(PARETO_DIMENSIONS), horizontal=True)
+    pareto = engine.pareto(PARETO_DIMENSIONS[label], start, end, poste)
+    if pareto.empty:
+        st.info("Aucun défaut déclaré sur la période.")
+    else:
+        st.plotly_chart(pareto_figure(pareto, label), use_container_width=True)
+
+    # Cartes de contrôle
+    st.subheader("Cartes de contrôle")
+    col1, col2 = st.columns(2)
+    with col1:
+        kind = st.radio("Carte", ["p", "u"], horizontal=True,
+                        format_func=lambda k: "p : part d'unités défectueuses" if k == "p" else "u : défauts par OF")
+    with col2:
+        frequency = st.radio("Sous-groupe", list(CHART_FREQUENCIES), index=1, horizontal=True)
+    chart = engine.control_chart(kind, start, end, CHART_FREQUENCIES[frequency], poste)
+    if chart.empty:
+        st.info("Aucun OF terminé sur la période.")
+    else:
+        st.plotly_chart(control_figure(chart, "Proportion" if kind == "p" else "Défauts par OF"), use_container_width=True)
+        alerts = chart[chart['regles'] != ""]
+        if alerts.empty:
+            st.success("Procédé sous contrôle sur la période.")
+        else:
+            st.warning(f"{len(alerts)} sous-groupe(s) hors contrôle")
+            st.dataframe(
+                alerts[['valeur', 'lci', 'lcs', 'regles']].rename_axis("Période"),
+                use_container_width=True,
+            )
+            with st.expander("Règles"):
+                for rule, text in RULES.items():
+                    st.write(f"**{rule}.** {text}")
+
+    # Taux de défauts par OF
+    st.subheader("Taux de défauts par OF")
+    rates = engine.defect_rate_by_of()
+    if rates.empty:
+        st.info("Aucun défaut rattaché à un OF terminé.")
+    else:
+        st.dataframe(
+            rates.rename_axis("OF").rename(columns={'n_defauts': 'Défauts', 'unites': 'Unités', 'defauts_pour_100': 'Défauts / 100 unités'}),
+            use_container_width=True,
+        )
+
+    # Formulaire de déclaration de défaut
+    st.subheader("Déclarer un nouveau défaut")
+    with st.form("defect_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            of = st.text_input("Numéro OF")
+            poste_defaut = st.selectbox("Poste concerné", POSTES)
+        with col2:
+            type_defaut = st.text_input("Type de défaut")
+            gravite = st.select_slider("Gravité", options=GRAVITES)
+
+        description = st.text_area("Description du défaut")
+        action = st.text_area("Action corrective")
+
+        if st.form_submit_button("Enregistrer"):
+            # Écriture différée : le défaut part avec le prochain lot
+            try:
+                accepted = init_defect_writer().submit({
+                    'numero_of': of,
+                    'poste': poste_defaut,
+                    'type_defaut': type_defaut,
+                    'gravite': gravite,
+                    'description': description,
+                    'action_corrective': action,
+                })
+            except ValueError as e:
+                st.error(f"Défaut non enregistré : {e}")
+            else:
+                if accepted:
+                    st.success("Défaut enregistré")
+                else:
+                    st.warning("Défaut déjà déclaré ou file d'écriture saturée")
+
+    writer = init_defect_writer()
+    if writer.failed:
+        st.warning(f"{len(writer.failed)} défaut(s) non écrit(s) en base après plusieurs tentatives.")
+        if st.button("Réessayer l'écriture"):
+            st.success(f"{writer.retry_failed()} défaut(s) remis en file d'écriture.")
+    if writer.stats["lost"]:
+        st.error(f"{writer.stats['lost']} défaut(s) abandonné(s) : trop d'échecs d'écriture en attente (voir les journaux).")
@@ -0,0 +1,87 @@
+import datetime
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from services import absence_periods, get_all_absences, get_operator_index, get_planner, record_absence
+from staffing import LEVEL_LABELS, MOTIFS
+
+# Au-delà, la heatmap devient illisible : tableau simple
+HEATMAP_MAX_OPERATORS = 40
+
+def rh_page():
+    st.title("Gestion des Ressources Humaines")
+    index = get_operator_index()
+    today = datetime.date.today()
+
+    # Tableau de polyvalence
+    st.subheader("Tableau de polyvalence")
+    matrix = index.matrix()
+    if len(matrix) <= HEATMAP_MAX_OPERATORS:
+        fig = px.imshow(matrix,
+                        text_auto=True,
+                        color_continuous_scale='Blues',
+                        labels=dict(x="Poste", y="Opérateur", color="Niveau"))
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.dataframe(matrix, use_container_width=True)
+
+    # Opérateurs qualifiés et présents sur un poste
+    st.subheader("Qui peut tenir un poste ?")
+    col1, col2 = st.columns(2)
+    with col1:
+        poste = st.selectbox("Poste", index.postes)
+    with col2:
+        period = st.date_input("Période", (today, today), key="coverage_period")
+    if isinstance(period, (tuple, list)) and len(period) == 2:
+        available = index.available(poste, period[0], period[1])
+        if available:
+            st.dataframe(
+                pd.DataFrame([(name, level, LEVEL_LABELS.get(level, "")) for name, level in available],
+                             columns=["Opérateur", "Niveau", "Compétence"]),
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.warning("Aucun opérateur qualifié disponible sur la période.")
+
+    # Gestion des absences
+    st.subheader("Déclarer une absence")
+    with st.form("absence_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            operateur = st.selectbox("Opérateur", index.names)
+            date_debut = st.date_input("Date de début", today)
+        with col2:
+            motif = st.selectbox("Motif", MOTIFS)
+            date_fin = st.date_input("Date de fin", today + datetime.timedelta(days=1))
+
+        if st.form_submit_button("Enregistrer"):
+            if date_fin < date_debut:
+                st.error("La date de fin précède la date de début.")
+            else:
+                planner = get_planner()
+                record_absence(operateur, date_debut, date_fin, motif)
+                st.success(f"Absence de {operateur} enregistrée du {date_debut:%d/%m} au {date_fin:%d/%m}.")
+                # Les OF planifiés de l'opérateur sur la période sont replacés
+                displaced = planner.sync_absences(absence_periods(today))
+                if planner.assignment:
+                    st.info(f"{len(displaced)} OF replanifié(s).")
+
+    # Absences en cours et à venir
+    absences = get_all_absences()
+    if not absences.empty and {'operateur', 'debut', 'fin'}.issubset(absences.columns):
+        upcoming = absences[absences['fin'] >= pd.Timestamp(today)].sort_values('debut')
+        if not upcoming.empty:
+            st.subheader("Absences en cours et à venir")
+            st.dataframe(
+                upcoming.reindex(columns=['operateur', 'debut', 'fin', 'motif']).rename(
+                    columns={'operateur': 'Opérateur', 'debut': 'Début', 'fin': 'Fin', 'motif': 'Motif'}),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'Début': st.column_config.DateColumn("Début", format="YYYY-MM-DD"),
+                    'Fin': st.column_config.DateColumn("Fin", format="YYYY-MM-DD"),
+                },
+            )
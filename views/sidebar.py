@@ -0,0 +1,59 @@
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from exports import EXPORT_FORMATS, EXPORT_TABLES, export_table
+from services import cache, get_client, metrics
+
+def add_exports_to_sidebar():
+    with st.sidebar.expander("Exporter des données"):
+        export_type = st.selectbox(
+            "Type de données à exporter",
+            list(EXPORT_TABLES)
+        )
+        
+        date_range = st.date_input(
+            "Période (optionnel)",
+            value=(datetime.datetime.now() - datetime.timedelta(days=30), datetime.datetime.now()),
+            help="Laissez vide pour tout exporter"
+        )
+        # Tant qu'une seule date est choisie, on exporte tout
+        if not isinstance(date_range, (tuple, list)) or len(date_range) != 2:
+            date_range = None
+        
+        export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+        table, basename = EXPORT_TABLES[export_type]
+        extension, mime = EXPORT_FORMATS[export_format]
+        
+        # Génération différée : l'export n'est lu (par tranches) qu'au clic
+        st.download_button(
+            label="Exporter",
+            data=lambda: export_table(get_client(), table, export_format, date_range),
+            file_name=f"{basename}.{extension}",
+            mime=mime,
+            on_click="ignore",
+        )
+
+# Statistiques du cache partagé (succès / échecs par table)
+def add_cache_stats_to_sidebar():
+    with st.sidebar.expander("Cache des données"):
+        st.dataframe(cache.stats(), hide_index=True)
+
+# Panneau d'administration : temps par page et par requête
+def add_metrics_to_sidebar():
+    with st.sidebar.expander("Performances"):
+        st.caption("Pages")
+        st.dataframe(pd.DataFrame(metrics.summary("page")).round(1), hide_index=True)
+        st.caption("Requêtes Supabase")
+        st.dataframe(pd.DataFrame(metrics.summary("supabase")).round(1), hide_index=True)
+        st.caption("Premier rendu depuis le démarrage")
+        st.dataframe(pd.DataFrame(metrics.summary("startup")).round(1), hide_index=True)
+        st.caption("Mesures les plus lentes")
+        st.dataframe(pd.DataFrame(metrics.slowest()).round(1), hide_index=True)
+        st.download_button(
+            "Export Prometheus",
+            data=metrics.to_prometheus(),
+            file_name="mes_metrics.prom",
+            mime="text/plain",
+        )